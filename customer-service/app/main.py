@@ -1,38 +1,42 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Response
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-import time, uuid
+from fastapi import FastAPI, Response
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST
+from app.metrics import MetricsMiddleware, latency_buckets, mark_worker_dead, render_metrics
+from app.tracing import setup_tracing
 
 # Import routers (they already carry /v1/... in their own prefixes)
 from app.routers import customers
 from app.routers import addresses
+from app.routers import imports
 
 REQUEST_COUNT = Counter("customer_service_http_requests_total", "Total HTTP requests", ["method", "path", "status"])
-REQUEST_LATENCY = Histogram("customer_service_http_request_latency_seconds", "Request latency", ["method", "path"])
+REQUEST_LATENCY = Histogram("customer_service_http_request_latency_seconds", "Request latency", ["method", "path"], buckets=latency_buckets())
+REQUESTS_IN_FLIGHT = Gauge("customer_service_http_requests_in_flight", "Requests currently being served", multiprocess_mode="livesum")
 
 # --- optional: create tables on startup ---
-from app.database import engine
+from app.database import create_schema, engine, read_engine, ReadYourWritesMiddleware
 from app.models import Base
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    create_schema(Base.metadata)
     yield
+    mark_worker_dead()
 
 app = FastAPI(title="customer-service", version="1.0.0", lifespan=lifespan)
 
-# Correlation ID + metrics
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next):
-    corr = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-    start = time.time()
-    response: Response = await call_next(request)
-    duration = time.time() - start
-    path = request.url.path
-    REQUEST_COUNT.labels(request.method, path, str(response.status_code)).inc()
-    REQUEST_LATENCY.labels(request.method, path).observe(duration)
-    response.headers["X-Correlation-ID"] = corr
-    return response
+# Correlation ID + metrics (pure ASGI, labelled by route template)
+app.add_middleware(
+    MetricsMiddleware,
+    request_count=REQUEST_COUNT,
+    request_latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+)
+# Read-your-writes routing for ReadSessionLocal (no-op without DATABASE_READ_URL)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Tracing (W3C traceparent in/out; exporter chosen by TRACING_EXPORTER)
+setup_tracing(app, "customer-service", engines=[engine, read_engine])
 
 @app.get("/health")
 async def health():
@@ -40,9 +44,10 @@ async def health():
 
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 # ⚠️ IMPORTANT: no extra prefix here, because routers already have /v1/...
 app.include_router(customers.router)   # exposes /v1/customers
 app.include_router(addresses.router)   # expose whatever its router prefix defines
+app.include_router(imports.router)     # /v1/customers:bulk, /v1/customers/addresses:bulk
 
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, ForeignKey, func
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -40,3 +40,9 @@ class Address(Base):
 
     # Relationship
     customer: Mapped["Customer"] = relationship("Customer", back_populates="addresses")
+
+# One row per distinct address of a customer: imports and retried creates
+# insert with ON CONFLICT DO NOTHING against it. Text is compared
+# case-insensitively; whitespace is collapsed on the way in (AddressIn).
+Index("uq_addresses_customer_address", Address.customer_id, func.lower(Address.line1),
+      func.lower(Address.area), func.lower(Address.city), Address.pincode, unique=True)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query
-from sqlalchemy import select
-from pydantic import BaseModel
-from app.database import SessionLocal, engine
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from pydantic import BaseModel, field_validator
+from app.database import SessionLocal, ReadSessionLocal, engine
 from app.models import Base, Customer, Address
 
 Base.metadata.create_all(bind=engine)
@@ -13,6 +14,16 @@ class AddressIn(BaseModel):
     city: str
     pincode: str
 
+    @field_validator("line1", "area", "city", "pincode")
+    @classmethod
+    def _collapse_whitespace(cls, v: str) -> str:
+        return " ".join(v.split())
+
+
+def address_key(customer_id: int, line1: str, area: str, city: str, pincode: str) -> tuple:
+    """What uq_addresses_customer_address compares: text fields case-insensitively."""
+    return (customer_id, line1.lower(), area.lower(), city.lower(), pincode)
+
 class AddressOut(AddressIn):
     address_id: int
     class Config:
@@ -20,12 +31,12 @@ class AddressOut(AddressIn):
 
 @router.get("", response_model=dict)
 def list_addresses(customer_id: int, page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=100)):
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         if not db.get(Customer, customer_id):
             raise HTTPException(status_code=404, detail="Customer not found")
         stmt = select(Address).where(Address.customer_id==customer_id)
-        total = db.scalar(stmt.count())
-        items = db.execute(stmt.offset((page-1)*page_size).limit(page_size)).scalars().all()
+        total = db.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+        items = db.execute(stmt.order_by(Address.address_id).offset((page-1)*page_size).limit(page_size)).scalars().all()
         return {"items": [AddressOut.model_validate(i).model_dump() for i in items], "page": page, "page_size": page_size, "total": total}
 
 @router.post("", response_model=AddressOut, status_code=201)
@@ -35,6 +46,10 @@ def create_address(customer_id: int, payload: AddressIn):
             raise HTTPException(status_code=404, detail="Customer not found")
         addr = Address(customer_id=customer_id, **payload.model_dump())
         db.add(addr)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Address already exists")
         db.refresh(addr)
         return AddressOut.model_validate(addr)
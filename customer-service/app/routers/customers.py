@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy import select, func
-from app.database import SessionLocal, engine
+from app.database import SessionLocal, ReadSessionLocal, engine
 from app.models import Base, Customer
 from pydantic import BaseModel, EmailStr
+from app.streaming import ndjson_response, wants_ndjson
+import os
 
 
 # IMPORTANT:
@@ -11,6 +14,11 @@ from pydantic import BaseModel, EmailStr
 
 router = APIRouter(prefix="/v1/customers", tags=["customers"])
 
+CUSTOMER_BATCH_GET_MAX = int(os.getenv("CUSTOMER_BATCH_GET_MAX", "500"))
+
+# Same normalisation as CustomerIn.email, so lookups match stored values
+_email = TypeAdapter(EmailStr)
+
 
 # ---------- Pydantic Schemas ----------
 
@@ -31,9 +39,19 @@ class CustomerOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class BatchGetIn(BaseModel):
+    customer_ids: list[int]
+
+
+class BatchGetOut(BaseModel):
+    items: list[CustomerOut]   # request order, duplicates collapsed
+    not_found: list[int]
+
+
 # ---------- Endpoints ----------
 @router.get("", response_model=dict)
 def list_customers(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
 ):
@@ -41,8 +59,11 @@ def list_customers(
     Paginated list of customers.
 
     SQLAlchemy 2.x no longer supports `Select.count()`. Use `select(func.count(...))`.
+    With `Accept: application/x-ndjson` every customer is streamed instead.
     """
-    with SessionLocal() as db:
+    if wants_ndjson(request):
+        return ndjson_response(ReadSessionLocal, select(Customer).order_by(Customer.customer_id), CustomerOut)
+    with ReadSessionLocal() as db:
         # Total rows
         total = db.scalar(select(func.count(Customer.customer_id))) or 0
 
@@ -78,9 +99,48 @@ def create_customer(payload: CustomerIn):
 
 
 
+# Lookups by the unique email/phone indexes (declared before /{customer_id})
+@router.get("/by-email/{email}", response_model=CustomerOut)
+def get_customer_by_email(email: str):
+    try:
+        email = _email.validate_python(email)
+    except ValidationError:
+        raise HTTPException(status_code=422, detail="Invalid email")
+    with ReadSessionLocal() as db:
+        c = db.execute(select(Customer).where(Customer.email == email)).scalar_one_or_none()
+        if not c:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return CustomerOut.model_validate(c)
+
+
+@router.get("/by-phone/{phone}", response_model=CustomerOut)
+def get_customer_by_phone(phone: str):
+    with ReadSessionLocal() as db:
+        c = db.execute(select(Customer).where(Customer.phone == phone.strip())).scalar_one_or_none()
+        if not c:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return CustomerOut.model_validate(c)
+
+
+@router.post(":batchGet", response_model=BatchGetOut)
+def batch_get_customers(payload: BatchGetIn):
+    """Many customers by id in one IN query; unknown ids are listed in not_found."""
+    ids = list(dict.fromkeys(payload.customer_ids))
+    if len(ids) > CUSTOMER_BATCH_GET_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {CUSTOMER_BATCH_GET_MAX} customer_ids per request")
+    if not ids:
+        return BatchGetOut(items=[], not_found=[])
+    with ReadSessionLocal() as db:
+        found = {c.customer_id: c for c in db.execute(select(Customer).where(Customer.customer_id.in_(ids))).scalars()}
+        return BatchGetOut(
+            items=[CustomerOut.model_validate(found[i]) for i in ids if i in found],
+            not_found=[i for i in ids if i not in found],
+        )
+
+
 @router.get("/{customer_id}", response_model=CustomerOut)
 def get_customer(customer_id: int):
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         c = db.get(Customer, customer_id)
         if not c:
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -0,0 +1,251 @@
+# customer-service/app/routers/imports.py
+
+from typing import Any, Literal
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import SessionLocal
+from app.models import Address, Customer
+from app.routers.addresses import AddressIn, address_key
+from app.routers.customers import CustomerIn
+import os
+
+# Bulk import for migrating customer bases from partner platforms. Rows are
+# validated one by one, deduped within the batch and against the table, and
+# written with multi-row INSERTs in one transaction. Every input row gets a
+# result at its index; bad rows never fail the rest of the batch.
+router = APIRouter(prefix="/v1/customers", tags=["import"])
+
+IMPORT_MAX_ROWS   = int(os.getenv("CUSTOMER_IMPORT_MAX_ROWS", "10000"))
+IMPORT_CHUNK_ROWS = int(os.getenv("CUSTOMER_IMPORT_CHUNK_ROWS", "1000"))
+
+
+# ---------- Schemas ----------
+
+class CustomersBulkIn(BaseModel):
+    customers: list[dict[str, Any]]
+
+
+class AddressBulkRow(AddressIn):
+    customer_id: int
+
+
+class AddressesBulkIn(BaseModel):
+    addresses: list[dict[str, Any]]
+
+
+class BulkRowResult(BaseModel):
+    index: int
+    status: Literal["created", "duplicate", "invalid"]
+    id: int | None = None        # new row, or the existing one for duplicates
+    error: str | None = None
+
+
+class BulkImportOut(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    results: list[BulkRowResult]
+
+
+# ---------- Helpers ----------
+
+def _insert(db, model):
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(model)
+    if name == "sqlite":
+        return sqlite.insert(model)
+    return insert(model)
+
+
+def _chunks(rows: list, size: int):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _validate(schema: type[BaseModel], raw: dict, model) -> tuple[dict | None, str | None]:
+    """Schema validation plus column lengths, so one row can't fail a whole INSERT."""
+    try:
+        row = schema.model_validate(raw).model_dump()
+    except ValidationError as exc:
+        err = exc.errors()[0]
+        return None, f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+    for name, value in row.items():
+        length = getattr(model.__table__.c[name].type, "length", None)
+        if length and isinstance(value, str) and len(value) > length:
+            return None, f"{name}: longer than {length} characters"
+    return row, None
+
+
+def _check_size(n: int):
+    if n > IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=422, detail=f"At most {IMPORT_MAX_ROWS} rows per request")
+
+
+def _link_batch_duplicates(results: list[BulkRowResult], first_of: dict[int, int]):
+    """Point in-batch duplicates at whatever the first copy resolved to."""
+    for i, first in first_of.items():
+        results[i].id = results[first].id
+
+
+def _summary(results: list[BulkRowResult]) -> BulkImportOut:
+    count = lambda s: sum(r.status == s for r in results)  # noqa: E731
+    return BulkImportOut(created=count("created"), duplicates=count("duplicate"),
+                         invalid=count("invalid"), results=results)
+
+
+# ---------- Endpoints ----------
+
+@router.post(":bulk", response_model=BulkImportOut)
+def bulk_create_customers(payload: CustomersBulkIn):
+    """
+    Create many customers. Email and phone are unique: rows repeating an
+    earlier row of the batch, or an existing customer, come back as
+    `duplicate` with the id they collide with.
+    """
+    _check_size(len(payload.customers))
+    results: list[BulkRowResult | None] = [None] * len(payload.customers)
+    pending: list[tuple[int, dict]] = []
+    seen: dict[tuple[str, str], int] = {}
+    first_of: dict[int, int] = {}
+
+    for i, raw in enumerate(payload.customers):
+        row, error = _validate(CustomerIn, raw, Customer)
+        if error:
+            results[i] = BulkRowResult(index=i, status="invalid", error=error)
+            continue
+        first = seen.get(("email", row["email"]), seen.get(("phone", row["phone"])))
+        if first is not None:
+            results[i] = BulkRowResult(index=i, status="duplicate", error=f"Same email or phone as row {first}")
+            first_of[i] = first
+            continue
+        seen[("email", row["email"])] = seen[("phone", row["phone"])] = i
+        pending.append((i, row))
+
+    with SessionLocal() as db:
+        created: dict[str, int] = {}
+        for chunk in _chunks([row for _, row in pending], IMPORT_CHUNK_ROWS):
+            stmt = (
+                _insert(db, Customer).values(chunk)
+                .on_conflict_do_nothing()
+                .returning(Customer.customer_id, Customer.email)
+            )
+            created.update({email: cid for cid, email in db.execute(stmt)})
+        db.commit()
+
+        # Rows skipped by ON CONFLICT: report the customer they collide with
+        skipped = [row for _, row in pending if row["email"] not in created]
+        existing_email: dict[str, int] = {}
+        existing_phone: dict[str, int] = {}
+        for chunk in _chunks(skipped, IMPORT_CHUNK_ROWS):
+            found = db.execute(
+                select(Customer.customer_id, Customer.email, Customer.phone).where(or_(
+                    Customer.email.in_([r["email"] for r in chunk]),
+                    Customer.phone.in_([r["phone"] for r in chunk]),
+                ))
+            )
+            for cid, email, phone in found:
+                existing_email[email] = cid
+                existing_phone[phone] = cid
+
+    for i, row in pending:
+        if row["email"] in created:
+            results[i] = BulkRowResult(index=i, status="created", id=created[row["email"]])
+        elif row["email"] in existing_email:
+            results[i] = BulkRowResult(index=i, status="duplicate", id=existing_email[row["email"]],
+                                       error="Email already exists")
+        else:
+            results[i] = BulkRowResult(index=i, status="duplicate", id=existing_phone.get(row["phone"]),
+                                       error="Phone already exists")
+    _link_batch_duplicates(results, first_of)
+    return _summary(results)
+
+
+@router.post("/addresses:bulk", response_model=BulkImportOut)
+def bulk_create_addresses(payload: AddressesBulkIn):
+    """
+    Create many addresses, each naming its customer_id. Rows for unknown
+    customers are `invalid`; rows matching an earlier row or an existing
+    address of the same customer (case-insensitively, whitespace collapsed)
+    are `duplicate`, so re-running an import, even concurrently, is safe.
+    """
+    _check_size(len(payload.addresses))
+    results: list[BulkRowResult | None] = [None] * len(payload.addresses)
+    valid: list[tuple[int, dict]] = []
+    for i, raw in enumerate(payload.addresses):
+        row, error = _validate(AddressBulkRow, raw, Address)
+        if error:
+            results[i] = BulkRowResult(index=i, status="invalid", error=error)
+        else:
+            valid.append((i, row))
+
+    def key(row) -> tuple:
+        return address_key(row["customer_id"], row["line1"], row["area"], row["city"], row["pincode"])
+
+    with SessionLocal() as db:
+        # One IN query for the customers and one for their current addresses
+        customer_ids = list({row["customer_id"] for _, row in valid})
+        known: set[int] = set()
+        existing: dict[tuple, int] = {}
+        for chunk in _chunks(customer_ids, IMPORT_CHUNK_ROWS):
+            known.update(db.execute(select(Customer.customer_id).where(Customer.customer_id.in_(chunk))).scalars())
+            found = db.execute(
+                select(Address.address_id, Address.customer_id, Address.line1,
+                       Address.area, Address.city, Address.pincode)
+                .where(Address.customer_id.in_(chunk))
+            )
+            for address_id, *fields in found:
+                existing.setdefault(address_key(*fields), address_id)
+
+        pending: list[tuple[int, dict]] = []
+        batch: dict[tuple, int] = {}
+        first_of: dict[int, int] = {}
+        for i, row in valid:
+            k = key(row)
+            if row["customer_id"] not in known:
+                results[i] = BulkRowResult(index=i, status="invalid", error="Customer not found")
+            elif k in existing:
+                results[i] = BulkRowResult(index=i, status="duplicate", id=existing[k],
+                                           error="Address already exists")
+            elif k in batch:
+                results[i] = BulkRowResult(index=i, status="duplicate", error=f"Same address as row {batch[k]}")
+                first_of[i] = batch[k]
+            else:
+                batch[k] = i
+                pending.append((i, row))
+
+        # A concurrent import of the same rows may have inserted some of them
+        # since the read above: ON CONFLICT skips those
+        created: dict[tuple, int] = {}
+        for chunk in _chunks([row for _, row in pending], IMPORT_CHUNK_ROWS):
+            stmt = (
+                _insert(db, Address).values(chunk)
+                .on_conflict_do_nothing()
+                .returning(Address.address_id, Address.customer_id, Address.line1,
+                           Address.area, Address.city, Address.pincode)
+            )
+            created.update({address_key(*fields): address_id for address_id, *fields in db.execute(stmt)})
+        db.commit()
+
+        skipped = list({row["customer_id"] for _, row in pending if key(row) not in created})
+        for chunk in _chunks(skipped, IMPORT_CHUNK_ROWS):
+            found = db.execute(
+                select(Address.address_id, Address.customer_id, Address.line1,
+                       Address.area, Address.city, Address.pincode)
+                .where(Address.customer_id.in_(chunk))
+            )
+            for address_id, *fields in found:
+                existing.setdefault(address_key(*fields), address_id)
+
+    for i, row in pending:
+        k = key(row)
+        if k in created:
+            results[i] = BulkRowResult(index=i, status="created", id=created[k])
+        else:
+            results[i] = BulkRowResult(index=i, status="duplicate", id=existing.get(k),
+                                       error="Address already exists")
+
+    _link_batch_duplicates(results, first_of)
+    return _summary(results)
@@ -0,0 +1,32 @@
+# customer-service/tests/conftest.py
+# Runs the app against a throwaway SQLite file.
+# Run from customer-service/: python -m pytest tests
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="customer-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/customers.db"
+os.environ["DATABASE_READ_URL"] = ""
+os.environ["TRACING_EXPORTER"] = "none"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.database import engine
+from app.main import app
+from app.models import Base
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
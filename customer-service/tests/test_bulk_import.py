@@ -0,0 +1,156 @@
+# customer-service/tests/test_bulk_import.py
+
+from sqlalchemy import event, func, insert, select
+from app.database import SessionLocal, engine
+from app.models import Address
+
+def _customer(n: int, **overrides) -> dict:
+    row = {"name": f"Customer {n}", "email": f"c{n}@example.com", "phone": f"90000000{n:02d}"}
+    row.update(overrides)
+    return row
+
+
+def _address(customer_id: int, line1: str = "12 MG Road", **overrides) -> dict:
+    row = {"customer_id": customer_id, "line1": line1, "area": "Kothrud", "city": "Pune", "pincode": "411038"}
+    row.update(overrides)
+    return row
+
+
+def _import(client, customers: list[dict]) -> dict:
+    r = client.post("/v1/customers:bulk", json={"customers": customers})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _statuses(body: dict) -> list[str]:
+    return [r["status"] for r in body["results"]]
+
+
+def test_customers_are_created_in_order(client):
+    body = _import(client, [_customer(1), _customer(2)])
+    assert (body["created"], body["duplicates"], body["invalid"]) == (2, 0, 0)
+    assert [r["index"] for r in body["results"]] == [0, 1]
+    ids = [r["id"] for r in body["results"]]
+    assert client.get(f"/v1/customers/{ids[1]}").json()["email"] == "c2@example.com"
+
+
+def test_in_batch_duplicates_point_at_the_first_copy(client):
+    body = _import(client, [
+        _customer(1),
+        _customer(2, email="c1@example.com"),   # same email as row 0
+        _customer(3, phone="9000000001"),       # same phone as row 0
+        _customer(4),
+    ])
+    assert _statuses(body) == ["created", "duplicate", "duplicate", "created"]
+    first_id = body["results"][0]["id"]
+    assert body["results"][1]["id"] == body["results"][2]["id"] == first_id
+    assert "row 0" in body["results"][1]["error"]
+
+
+def test_existing_customers_are_duplicates(client):
+    existing = _import(client, [_customer(1), _customer(2)])["results"]
+    body = _import(client, [
+        _customer(1),                           # re-run of the same row
+        _customer(5, phone="9000000002"),       # phone of customer 2
+        _customer(6),
+    ])
+    assert _statuses(body) == ["duplicate", "duplicate", "created"]
+    assert body["results"][0]["id"] == existing[0]["id"]
+    assert body["results"][0]["error"] == "Email already exists"
+    assert body["results"][1]["id"] == existing[1]["id"]
+    assert body["results"][1]["error"] == "Phone already exists"
+
+
+def test_invalid_rows_do_not_fail_the_batch(client):
+    body = _import(client, [
+        _customer(1, email="not-an-email"),
+        {"name": "No phone", "email": "c2@example.com"},
+        _customer(3, phone="9" * 21),           # longer than the column
+        _customer(4),
+    ])
+    assert _statuses(body) == ["invalid", "invalid", "invalid", "created"]
+    assert body["results"][1]["error"].startswith("phone")
+    assert body["results"][2]["error"] == "phone: longer than 20 characters"
+
+
+def test_too_many_rows_is_422(client, monkeypatch):
+    from app.routers import imports
+    monkeypatch.setattr(imports, "IMPORT_MAX_ROWS", 2)
+    r = client.post("/v1/customers:bulk", json={"customers": [_customer(n) for n in range(3)]})
+    assert r.status_code == 422
+
+
+def test_addresses_are_deduped(client):
+    cid = _import(client, [_customer(1)])["results"][0]["id"]
+    first = client.post("/v1/customers/addresses:bulk", json={"addresses": [
+        _address(cid),
+        _address(cid),                          # same as row 0
+        _address(cid, "14 MG Road"),
+    ]}).json()
+    assert _statuses(first) == ["created", "duplicate", "created"]
+    assert first["results"][1]["id"] == first["results"][0]["id"]
+
+    # Re-running the import creates nothing new
+    again = client.post("/v1/customers/addresses:bulk", json={"addresses": [
+        _address(cid), _address(cid, "14 MG Road"),
+    ]}).json()
+    assert _statuses(again) == ["duplicate", "duplicate"]
+    assert [r["id"] for r in again["results"]] == [first["results"][0]["id"], first["results"][2]["id"]]
+
+
+def test_addresses_for_unknown_customers_are_invalid(client):
+    cid = _import(client, [_customer(1)])["results"][0]["id"]
+    body = client.post("/v1/customers/addresses:bulk", json={"addresses": [
+        _address(cid + 100),
+        _address(cid, pincode=None),
+        _address(cid),
+    ]}).json()
+    assert _statuses(body) == ["invalid", "invalid", "created"]
+    assert body["results"][0]["error"] == "Customer not found"
+
+
+def _address_count() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Address))
+
+
+def test_addresses_are_compared_normalised(client):
+    cid = _import(client, [_customer(1)])["results"][0]["id"]
+    body = client.post("/v1/customers/addresses:bulk", json={"addresses": [
+        _address(cid, "12  MG Road "),
+        _address(cid, "12 mg road", city="PUNE"),
+    ]}).json()
+    assert _statuses(body) == ["created", "duplicate"]
+    assert client.get(f"/customers/{cid}/addresses").json()["items"][0]["line1"] == "12 MG Road"
+
+
+def test_address_inserted_concurrently_is_a_duplicate(client):
+    cid = _import(client, [_customer(1)])["results"][0]["id"]
+    raced = []
+
+    # Another import inserts row 0 between this one's read and its INSERT
+    def race(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO addresses") and not raced:
+            raced.append(None)
+            with engine.begin() as other:
+                raced[0] = other.execute(insert(Address).values(_address(cid))).inserted_primary_key[0]
+
+    event.listen(engine, "before_cursor_execute", race)
+    try:
+        body = client.post("/v1/customers/addresses:bulk", json={"addresses": [
+            _address(cid), _address(cid, "14 MG Road"),
+        ]}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", race)
+    assert _statuses(body) == ["duplicate", "created"]
+    assert body["results"][0]["id"] == raced[0]
+    assert _address_count() == 2
+
+
+def test_creating_an_existing_address_is_409(client):
+    cid = _import(client, [_customer(1)])["results"][0]["id"]
+    payload = {k: v for k, v in _address(cid).items() if k != "customer_id"}
+    assert client.post(f"/customers/{cid}/addresses", json=payload).status_code == 201
+    r = client.post(f"/customers/{cid}/addresses", json={**payload, "area": "KOTHRUD"})
+    assert r.status_code == 409
+    assert _address_count() == 1
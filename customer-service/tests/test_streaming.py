@@ -0,0 +1,46 @@
+# customer-service/tests/test_streaming.py
+
+import json
+from app import streaming
+
+
+def _seed(client, n: int):
+    customers = [{"name": f"Customer {i}", "email": f"c{i}@example.com", "phone": f"9000000{i:03d}"}
+                 for i in range(n)]
+    assert client.post("/v1/customers:bulk", json={"customers": customers}).json()["created"] == n
+
+
+def test_ndjson_streams_every_customer(client, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_BATCH_ROWS", 7)  # several chunks
+    _seed(client, 25)
+    r = client.get("/v1/customers", params={"page_size": 5},
+                   headers={"Accept": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.headers["vary"] == "Accept"
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["email"] for row in rows] == [f"c{i}@example.com" for i in range(25)]
+    assert set(rows[0]) == {"customer_id", "name", "email", "phone"}
+
+
+def test_ndjson_of_an_empty_table(client):
+    r = client.get("/v1/customers", headers={"Accept": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert r.text == ""
+
+
+def test_json_pages_are_unchanged(client):
+    _seed(client, 3)
+    body = client.get("/v1/customers", params={"page_size": 2},
+                      headers={"Accept": "application/json"}).json()
+    assert (body["total"], len(body["items"]), body["page"]) == (3, 2, 1)
+
+
+def test_accept_header_matching():
+    class Req:
+        def __init__(self, accept):
+            self.headers = {"accept": accept}
+
+    assert streaming.wants_ndjson(Req("application/json, application/x-ndjson;q=0.9"))
+    assert not streaming.wants_ndjson(Req("application/json"))
+    assert not streaming.wants_ndjson(Req("application/x-ndjson-seq"))
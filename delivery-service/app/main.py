@@ -1,30 +1,37 @@
-from fastapi import FastAPI, Request, Response
+import logging
+from fastapi import FastAPI, Response
 from fastapi.responses import JSONResponse
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-import time, uuid
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST
+from app.metrics import MetricsMiddleware, latency_buckets, mark_worker_dead, render_metrics
+from app.tracing import setup_tracing
+from app.database import create_schema, engine, read_engine, ReadYourWritesMiddleware
+from app.models import Base
+
+log = logging.getLogger("delivery-service")
 
 app = FastAPI(title="delivery-service", version="1.0.0")
 
 # Import routers
-from app.routers import deliveries
+from app.routers import deliveries, drivers
 
 
 # Metrics
 REQUEST_COUNT = Counter("delivery_service_http_requests_total", "Total HTTP requests", ["method", "path", "status"])
-REQUEST_LATENCY = Histogram("delivery_service_http_request_latency_seconds", "Request latency", ["method", "path"])
-
-# Correlation ID middleware
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next):
-    corr = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-    start = time.time()
-    response: Response = await call_next(request)
-    duration = time.time() - start
-    path = request.url.path
-    REQUEST_COUNT.labels(request.method, path, str(response.status_code)).inc()
-    REQUEST_LATENCY.labels(request.method, path).observe(duration)
-    response.headers["X-Correlation-ID"] = corr
-    return response
+REQUEST_LATENCY = Histogram("delivery_service_http_request_latency_seconds", "Request latency", ["method", "path"], buckets=latency_buckets())
+REQUESTS_IN_FLIGHT = Gauge("delivery_service_http_requests_in_flight", "Requests currently being served", multiprocess_mode="livesum")
+
+# Correlation ID + metrics (pure ASGI, labelled by route template)
+app.add_middleware(
+    MetricsMiddleware,
+    request_count=REQUEST_COUNT,
+    request_latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+)
+# Read-your-writes routing for ReadSessionLocal (no-op without DATABASE_READ_URL)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Tracing (W3C traceparent in/out; exporter chosen by TRACING_EXPORTER)
+setup_tracing(app, "delivery-service", engines=[engine, read_engine])
 
 @app.get("/health")
 async def health():
@@ -32,6 +39,17 @@ async def health():
 
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 app.include_router(deliveries.router, prefix='/v1')
+app.include_router(drivers.router, prefix='/v1')
+
+
+@app.on_event("startup")
+def on_startup():
+    create_schema(Base.metadata)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    mark_worker_dead()
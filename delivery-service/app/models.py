@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Boolean, func
+from sqlalchemy import String, Integer, DateTime, Boolean, Index, func, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -30,4 +30,17 @@ class Delivery(Base):
     picked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     delivered_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
-
+    # Dispatcher views only care about deliveries still in flight; indexing
+    # just the non-DELIVERED rows keeps these small as history grows.
+    __table_args__ = (
+        Index(
+            "ix_deliveries_active_status", "status", "assigned_at", "delivery_id",
+            postgresql_where=text("status <> 'DELIVERED'"),
+            sqlite_where=text("status <> 'DELIVERED'"),
+        ),
+        Index(
+            "ix_deliveries_driver_active", "driver_id", "assigned_at", "delivery_id",
+            postgresql_where=text("status <> 'DELIVERED'"),
+            sqlite_where=text("status <> 'DELIVERED'"),
+        ),
+    )
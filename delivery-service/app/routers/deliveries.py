@@ -1,13 +1,28 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
-from app.database import SessionLocal, engine
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy import DateTime, bindparam, select, and_, or_, text
+from app.database import SessionLocal, ReadSessionLocal, engine
 from app.models import Base, Driver, Delivery
-from datetime import datetime
+from app.tracing import traced_client
+from datetime import datetime, timezone
+import base64, httpx, logging, os
 
 Base.metadata.create_all(bind=engine)
 router = APIRouter(prefix="/deliveries", tags=["deliveries"])
 
+DELIVERY_STATUS_BATCH_MAX = int(os.getenv("DELIVERY_STATUS_BATCH_MAX", "1000"))
+# Status changes are pushed to order-service's live stream (best effort)
+ORDER_URL = os.getenv("ORDER_SERVICE_URL", "http://order-service:80")
+# Must match order-service's INTERNAL_API_TOKEN
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
+log = logging.getLogger("delivery-service")
+_client = traced_client(httpx.Client(timeout=2.0))
+
+# A delivery only moves forward: ASSIGNED -> PICKED -> DELIVERED.
+NEXT_STATUS = {"ASSIGNED": "PICKED", "PICKED": "DELIVERED"}
+STATUSES = ("ASSIGNED", "PICKED", "DELIVERED")
+
 class AssignIn(BaseModel):
     order_id: int
     city: str
@@ -17,11 +32,87 @@ class DeliveryOut(BaseModel):
     order_id: int
     driver_id: int
     status: str
+    assigned_at: datetime | None = None
+    picked_at: datetime | None = None
+    delivered_at: datetime | None = None
     class Config:
         from_attributes = True
 
+
+class StatusUpdateIn(BaseModel):
+    delivery_id: int
+    status: str
+    at: datetime | None = None  # when it happened on the device; defaults to now
+
+class StatusBatchIn(BaseModel):
+    updates: list[StatusUpdateIn] = Field(min_length=1)
+
+class StatusOutcome(BaseModel):
+    delivery_id: int
+    status: str
+    outcome: str  # applied | unchanged | not_found | invalid_status | invalid_transition | conflict
+
+
+# ---------- Keyset cursor ----------
+# Opaque token for the last row of a page: "<assigned_at iso>|<delivery_id>".
+
+def _encode_cursor(d: Delivery) -> str:
+    raw = f"{d.assigned_at.isoformat()}|{d.delivery_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        assigned_at, delivery_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(assigned_at), int(delivery_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def list_deliveries_page(
+    *filters,
+    status: list[str] | None,
+    assigned_from: datetime | None,
+    assigned_to: datetime | None,
+    cursor: str | None,
+    page_size: int,
+) -> dict:
+    """
+    Newest-first page of deliveries matching filters. Shared by the
+    /deliveries and /drivers/{id}/deliveries listings.
+    """
+    stmt = select(Delivery).where(*filters)
+    if status:
+        stmt = stmt.where(Delivery.status.in_(status))
+        if "DELIVERED" not in status:
+            # Spelled out so Postgres can match the partial (active-only) indexes
+            stmt = stmt.where(Delivery.status != "DELIVERED")
+    if assigned_from:
+        stmt = stmt.where(Delivery.assigned_at >= assigned_from)
+    if assigned_to:
+        stmt = stmt.where(Delivery.assigned_at < assigned_to)
+    if cursor:
+        after_assigned, after_id = _decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                Delivery.assigned_at < after_assigned,
+                and_(Delivery.assigned_at == after_assigned, Delivery.delivery_id < after_id),
+            )
+        )
+    # Both columns descending: a plain backward scan of (..., assigned_at, delivery_id)
+    stmt = stmt.order_by(Delivery.assigned_at.desc(), Delivery.delivery_id.desc()).limit(page_size + 1)
+
+    with ReadSessionLocal() as db:
+        rows = db.execute(stmt).scalars().all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "items": [DeliveryOut.model_validate(d).model_dump(mode="json") for d in rows],
+        "page_size": page_size,
+        "next_cursor": _encode_cursor(rows[-1]) if has_more else None,
+    }
+
 @router.post("/assign", response_model=DeliveryOut, status_code=201)
-def assign(payload: AssignIn):
+def assign(payload: AssignIn, background: BackgroundTasks):
     with SessionLocal() as db:
         # naive: pick first active driver
         drv = db.execute(select(Driver).where(Driver.is_active==True)).scalars().first()
@@ -29,17 +120,152 @@ def assign(payload: AssignIn):
             raise HTTPException(status_code=503, detail="No drivers available")
         d = Delivery(order_id=payload.order_id, driver_id=drv.driver_id, status="ASSIGNED")
         db.add(d); db.commit(); db.refresh(d)
+        background.add_task(_publish, [_event(d)])
         return DeliveryOut.model_validate(d)
 
 @router.post("/{delivery_id}/status")
-def update_status(delivery_id: int, status: str):
+def update_status(delivery_id: int, status: str, background: BackgroundTasks):
     with SessionLocal() as db:
-        d = db.get(Delivery, delivery_id)
+        d = db.get(Delivery, delivery_id, with_for_update=True)
         if not d: raise HTTPException(status_code=404, detail="Delivery not found")
-        if status not in ["ASSIGNED","PICKED","DELIVERED"]:
+        if status not in STATUSES:
             raise HTTPException(status_code=400, detail="Invalid status")
+        if status == d.status:
+            return { "delivery_id": d.delivery_id, "status": d.status }  # retried request
+        if NEXT_STATUS.get(d.status) != status:
+            raise HTTPException(status_code=409, detail=f"Cannot move delivery from {d.status} to {status}")
         d.status = status
         if status == "PICKED": d.picked_at = datetime.utcnow()
         if status == "DELIVERED": d.delivered_at = datetime.utcnow()
         db.commit()
+        background.add_task(_publish, [_event(d)])
         return { "delivery_id": d.delivery_id, "status": d.status }
+
+def _publish(events: list[dict]):
+    """Runs as a background task, after the response has been sent."""
+    try:
+        _client.post(
+            f"{ORDER_URL}/internal/orders/delivery-events", json={"events": events},
+            headers={"X-Internal-Token": INTERNAL_API_TOKEN} if INTERNAL_API_TOKEN else None,
+        ).raise_for_status()
+    except httpx.HTTPError as exc:
+        log.warning("Delivery events not published: %s", exc)
+
+def _event(d) -> dict:
+    return {"order_id": d.order_id, "delivery_id": d.delivery_id, "driver_id": d.driver_id, "status": d.status}
+
+def _ts(db, name: str) -> str:
+    # Postgres types an all-NULL VALUES column as text; SQLite must not cast
+    return f"CAST(:{name} AS timestamptz)" if db.get_bind().dialect.name == "postgresql" else f":{name}"
+
+@router.post("/status:batch", response_model=list[StatusOutcome])
+def update_status_batch(payload: StatusBatchIn, background: BackgroundTasks):
+    """
+    Apply many driver-app transitions (e.g. an offline shift's worth) at once.
+
+    Updates for the same delivery are applied in request order and must each
+    be the next step of ASSIGNED -> PICKED -> DELIVERED; repeats are
+    `unchanged`. The surviving transitions go out as one
+    UPDATE ... FROM (VALUES ...) guarded by the status we validated against,
+    so a delivery changed meanwhile comes back as `conflict` instead of being
+    overwritten. Outcomes are returned per entry, in request order.
+    """
+    updates = payload.updates
+    if len(updates) > DELIVERY_STATUS_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {DELIVERY_STATUS_BATCH_MAX} updates per batch")
+
+    with SessionLocal() as db:
+        current = dict(db.execute(
+            select(Delivery.delivery_id, Delivery.status)
+            .where(Delivery.delivery_id.in_({u.delivery_id for u in updates}))
+        ).all())
+
+        outcomes: list[str] = []
+        # delivery_id -> [expected, status, picked_at, delivered_at, entry indexes]
+        plan: dict[int, list] = {}
+        now = datetime.now(timezone.utc)
+        for i, u in enumerate(updates):
+            if u.delivery_id not in current:
+                outcomes.append("not_found")
+                continue
+            if u.status not in STATUSES:
+                outcomes.append("invalid_status")
+                continue
+            step = plan.get(u.delivery_id)
+            state = step[1] if step else current[u.delivery_id]
+            if u.status == state:
+                outcomes.append("unchanged")
+                continue
+            if NEXT_STATUS.get(state) != u.status:
+                outcomes.append("invalid_transition")
+                continue
+            if step is None:
+                step = plan[u.delivery_id] = [state, state, None, None, []]
+            step[1] = u.status
+            step[2 if u.status == "PICKED" else 3] = u.at or now
+            step[4].append(i)
+            outcomes.append("applied")
+
+        if plan:
+            rows, params, ts_params = [], {}, []
+            for n, (delivery_id, (expected, status, picked_at, delivered_at, _)) in enumerate(plan.items()):
+                rows.append(f"(:id{n}, :exp{n}, :st{n}, {_ts(db, f'pa{n}')}, {_ts(db, f'da{n}')})")
+                params.update({
+                    f"id{n}": delivery_id, f"exp{n}": expected, f"st{n}": status,
+                    f"pa{n}": picked_at, f"da{n}": delivered_at,
+                })
+                ts_params += [bindparam(f"pa{n}", type_=DateTime(timezone=True)),
+                              bindparam(f"da{n}", type_=DateTime(timezone=True))]
+            updated = {row.delivery_id: row for row in db.execute(text(f"""
+                WITH v(delivery_id, expected, status, picked_at, delivered_at) AS (
+                    VALUES {", ".join(rows)}
+                )
+                UPDATE deliveries SET
+                    status = v.status,
+                    picked_at = COALESCE(v.picked_at, deliveries.picked_at),
+                    delivered_at = COALESCE(v.delivered_at, deliveries.delivered_at)
+                FROM v
+                WHERE deliveries.delivery_id = v.delivery_id
+                  AND deliveries.status = v.expected
+                RETURNING deliveries.delivery_id, deliveries.order_id, deliveries.driver_id, deliveries.status
+            """).bindparams(*ts_params), params)}
+            db.commit()
+            if updated:
+                background.add_task(_publish, [_event(row) for row in updated.values()])
+            for delivery_id, step in plan.items():
+                if delivery_id not in updated:
+                    for i in step[4]:
+                        outcomes[i] = "conflict"
+
+    return [
+        StatusOutcome(delivery_id=u.delivery_id, status=u.status, outcome=o)
+        for u, o in zip(updates, outcomes)
+    ]
+
+@router.get("", response_model=dict)
+def list_deliveries(
+    order_id: int | None = None,
+    status: list[str] | None = Query(None, description="Filter by status (repeatable), e.g. ASSIGNED&status=PICKED"),
+    assigned_from: datetime | None = Query(None, description="assigned_at >= this"),
+    assigned_to: datetime | None = Query(None, description="assigned_at < this"),
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=200),
+):
+    """
+    Deliveries for an order, or active deliveries by status for dispatch.
+    Keyset-paginated newest first; pass `next_cursor` to continue.
+    """
+    if order_id is None and not status:
+        raise HTTPException(status_code=422, detail="Filter by order_id or status")
+    filters = [Delivery.order_id == order_id] if order_id is not None else []
+    return list_deliveries_page(
+        *filters, status=status, assigned_from=assigned_from, assigned_to=assigned_to,
+        cursor=cursor, page_size=page_size,
+    )
+
+@router.get("/{delivery_id}", response_model=DeliveryOut)
+def get_delivery(delivery_id: int):
+    with ReadSessionLocal() as db:
+        d = db.get(Delivery, delivery_id)
+        if not d: raise HTTPException(status_code=404, detail="Delivery not found")
+        return DeliveryOut.model_validate(d)
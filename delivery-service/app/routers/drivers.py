@@ -0,0 +1,22 @@
+from datetime import datetime
+from fastapi import APIRouter, Query
+from app.models import Delivery
+from app.routers.deliveries import list_deliveries_page
+
+router = APIRouter(prefix="/drivers", tags=["drivers"])
+
+@router.get("/{driver_id}/deliveries", response_model=dict)
+def list_driver_deliveries(
+    driver_id: int,
+    status: list[str] | None = Query(None, description="Filter by status (repeatable)"),
+    assigned_from: datetime | None = Query(None, description="assigned_at >= this"),
+    assigned_to: datetime | None = Query(None, description="assigned_at < this"),
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=200),
+):
+    """A driver's deliveries, newest first; status=ASSIGNED&status=PICKED gives the active run."""
+    return list_deliveries_page(
+        Delivery.driver_id == driver_id,
+        status=status, assigned_from=assigned_from, assigned_to=assigned_to,
+        cursor=cursor, page_size=page_size,
+    )
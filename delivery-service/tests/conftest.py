@@ -0,0 +1,57 @@
+# delivery-service/tests/conftest.py
+# Runs the app against a throwaway SQLite file.
+# Run from delivery-service/: python -m pytest tests
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="delivery-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/deliveries.db"
+os.environ["DATABASE_READ_URL"] = ""
+os.environ["TRACING_EXPORTER"] = "none"
+
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.database import engine
+from app.main import app
+from app.models import Base
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+class OrderServiceSpy:
+    """Answers delivery-service's event post-backs to order-service and records them."""
+
+    def __init__(self):
+        self.posts: list[httpx.Request] = []
+        self.status_code = 202
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.posts.append(request)
+        return httpx.Response(self.status_code, json={})
+
+    def events(self) -> list[dict]:
+        return [e for r in self.posts for e in json.loads(r.content)["events"]]
+
+
+@pytest.fixture
+def order_service(monkeypatch):
+    from app.routers import deliveries
+    spy = OrderServiceSpy()
+    monkeypatch.setattr(deliveries._client, "_transport", httpx.MockTransport(spy))
+    return spy
@@ -0,0 +1,117 @@
+# delivery-service/tests/test_status_batch.py
+
+from datetime import datetime
+from sqlalchemy import event, update
+from app.database import SessionLocal, engine
+from app.models import Delivery
+from app.routers import deliveries
+
+
+def _seed(*statuses: str) -> list[int]:
+    with SessionLocal() as db:
+        rows = [Delivery(order_id=100 + n, driver_id=1, status=s) for n, s in enumerate(statuses)]
+        db.add_all(rows)
+        db.commit()
+        return [d.delivery_id for d in rows]
+
+
+def _batch(client, *updates):
+    return client.post("/v1/deliveries/status:batch", json={"updates": [
+        {"delivery_id": d, "status": s, **({"at": at} if at else {})} for d, s, at in
+        ((u + (None,))[:3] for u in updates)
+    ]})
+
+
+def _delivery(delivery_id: int) -> Delivery:
+    with SessionLocal() as db:
+        return db.get(Delivery, delivery_id)
+
+
+def test_mixed_batch(client, order_service):
+    a, b, c = _seed("ASSIGNED", "PICKED", "DELIVERED")
+    picked_at = "2026-01-01T12:00:00+00:00"
+    r = _batch(client,
+               (a, "PICKED", picked_at),
+               (a, "DELIVERED"),          # chains on the entry before it
+               (b, "PICKED"),             # already there: a retried update
+               (b, "ASSIGNED"),           # backwards
+               (c, "PICKED"),             # out of a final status
+               (a, "LOST"),
+               (999, "PICKED"))
+    assert r.status_code == 200
+    assert [o["outcome"] for o in r.json()] == [
+        "applied", "applied", "unchanged", "invalid_transition", "invalid_transition",
+        "invalid_status", "not_found",
+    ]
+    d = _delivery(a)
+    assert d.status == "DELIVERED"
+    assert d.picked_at.replace(tzinfo=None) == datetime(2026, 1, 1, 12, 0)
+    assert d.delivered_at is not None
+    assert (_delivery(b).status, _delivery(c).status) == ("PICKED", "DELIVERED")
+
+    # One post-back carrying the deliveries that actually changed
+    assert len(order_service.posts) == 1
+    assert order_service.events() == [{"order_id": 100, "delivery_id": a, "driver_id": 1, "status": "DELIVERED"}]
+
+
+def test_post_back_carries_the_internal_token(client, order_service, monkeypatch):
+    monkeypatch.setattr(deliveries, "INTERNAL_API_TOKEN", "s3cret")
+    a, = _seed("ASSIGNED")
+    _batch(client, (a, "PICKED"))
+    post, = order_service.posts
+    assert post.url.path == "/internal/orders/delivery-events"
+    assert post.headers["X-Internal-Token"] == "s3cret"
+
+
+def test_nothing_applied_posts_nothing(client, order_service):
+    a, = _seed("PICKED")
+    assert [o["outcome"] for o in _batch(client, (a, "PICKED")).json()] == ["unchanged"]
+    assert order_service.posts == []
+
+
+def test_stale_delivery_is_a_conflict(client, order_service):
+    a, b = _seed("ASSIGNED", "ASSIGNED")
+
+    # Another writer picks `a` up between the batch's read and its UPDATE
+    raced = []
+
+    def race(conn, cursor, statement, *args):
+        if statement.lstrip().startswith("WITH v(") and not raced:
+            raced.append(statement)
+            with engine.begin() as other:
+                other.execute(update(Delivery).where(Delivery.delivery_id == a).values(status="PICKED"))
+
+    event.listen(engine, "before_cursor_execute", race)
+    try:
+        r = _batch(client, (a, "PICKED"), (a, "DELIVERED"), (b, "PICKED"))
+    finally:
+        event.remove(engine, "before_cursor_execute", race)
+    assert raced
+    assert [o["outcome"] for o in r.json()] == ["conflict", "conflict", "applied"]
+    assert _delivery(a).status == "PICKED"      # the other writer's change stands
+    assert _delivery(a).delivered_at is None
+    assert [e["delivery_id"] for e in order_service.events()] == [b]
+
+
+def test_failed_post_back_does_not_fail_the_batch(client, order_service):
+    order_service.status_code = 503
+    a, = _seed("ASSIGNED")
+    r = _batch(client, (a, "PICKED"))
+    assert r.status_code == 200
+    assert _delivery(a).status == "PICKED"
+
+
+def test_batch_limit(client, monkeypatch):
+    monkeypatch.setattr(deliveries, "DELIVERY_STATUS_BATCH_MAX", 1)
+    a, b = _seed("ASSIGNED", "ASSIGNED")
+    assert _batch(client, (a, "PICKED"), (b, "PICKED")).status_code == 422
+    assert client.post("/v1/deliveries/status:batch", json={"updates": []}).status_code == 422
+
+
+def test_single_update_only_moves_forward(client, order_service):
+    a, = _seed("PICKED")
+    assert client.post(f"/v1/deliveries/{a}/status", params={"status": "ASSIGNED"}).status_code == 409
+    assert client.post(f"/v1/deliveries/{a}/status", params={"status": "PICKED"}).status_code == 200
+    assert client.post(f"/v1/deliveries/{a}/status", params={"status": "LOST"}).status_code == 400
+    assert client.post(f"/v1/deliveries/{a}/status", params={"status": "DELIVERED"}).json()["status"] == "DELIVERED"
+    assert [e["status"] for e in order_service.events()] == ["DELIVERED"]
@@ -0,0 +1,66 @@
+# delivery-service/tests/test_tracking.py
+
+from datetime import datetime, timedelta
+from app.database import SessionLocal
+from app.models import Delivery
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _seed(*specs: tuple[int, int, int, str]) -> list[int]:
+    """(order_id, driver_id, minutes after T0, status) per delivery; returns delivery_ids."""
+    with SessionLocal() as db:
+        rows = [
+            Delivery(order_id=order_id, driver_id=driver_id, status=status,
+                     assigned_at=T0 + timedelta(minutes=minutes))
+            for order_id, driver_id, minutes, status in specs
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [d.delivery_id for d in rows]
+
+
+def _walk(client, path: str, **params) -> list[int]:
+    seen, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        r = client.get(path, params=query)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        seen += [d["delivery_id"] for d in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_active_by_status_pages_newest_first(client):
+    # b and c share assigned_at: ties go by delivery_id, newest first
+    a, b, c, _, e = _seed((1, 1, 0, "ASSIGNED"), (2, 1, 5, "PICKED"), (3, 2, 5, "ASSIGNED"),
+                          (4, 2, 6, "DELIVERED"), (5, 3, 8, "ASSIGNED"))
+    status = ["ASSIGNED", "PICKED"]
+    assert _walk(client, "/v1/deliveries", status=status, page_size=2) == [e, c, b, a]
+    assert _walk(client, "/v1/deliveries", status=status, page_size=1) == [e, c, b, a]
+
+
+def test_driver_run_and_time_window(client):
+    a, b, _, d = _seed((1, 1, 0, "DELIVERED"), (2, 1, 5, "PICKED"), (3, 2, 6, "ASSIGNED"),
+                       (4, 1, 9, "ASSIGNED"))
+    assert _walk(client, "/v1/drivers/1/deliveries", page_size=1) == [d, b, a]
+    assert _walk(client, "/v1/drivers/1/deliveries", status=["ASSIGNED", "PICKED"]) == [d, b]
+    window = {"assigned_from": (T0 + timedelta(minutes=5)).isoformat(),
+              "assigned_to": (T0 + timedelta(minutes=9)).isoformat()}
+    assert _walk(client, "/v1/drivers/1/deliveries", **window) == [b]
+
+
+def test_by_order(client):
+    a, _ = _seed((7, 1, 0, "DELIVERED"), (8, 1, 1, "ASSIGNED"))
+    assert _walk(client, "/v1/deliveries", order_id=7) == [a]
+
+
+def test_listing_needs_a_filter(client):
+    assert client.get("/v1/deliveries").status_code == 422
+
+
+def test_bad_cursor_is_400(client):
+    r = client.get("/v1/deliveries", params={"status": "ASSIGNED", "cursor": "not-a-cursor"})
+    assert r.status_code == 400
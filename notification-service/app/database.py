@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.schema import CreateIndex
+
+log = logging.getLogger(__name__)
+
+# The notification queue; a local SQLite file unless pointed at Postgres.
+# Reads and writes both go here: the queue has no replica, so unlike the
+# other services there is no ReadSessionLocal or read-your-writes routing.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./notifications.db")
+
+# Pool sizing. Every uvicorn worker has its own pool, so one container opens up
+# to WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections and the
+# database sees that times the replica count. By default a container stays
+# within DB_CONNECTION_BUDGET (20), split evenly across its workers: keep
+# replicas x DB_CONNECTION_BUDGET under Postgres max_connections (100 by
+# default). Handlers beyond the pool queue for up to DB_POOL_TIMEOUT instead
+# of opening more connections.
+# DB_POOL_MODE=null hands pooling to PgBouncer: one connection per checkout.
+WEB_CONCURRENCY      = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "20"))
+_per_worker = max(2, DB_CONNECTION_BUDGET // WEB_CONCURRENCY)
+DB_POOL_MODE     = os.getenv("DB_POOL_MODE", "queue").lower()   # queue | null
+DB_POOL_SIZE     = int(os.getenv("DB_POOL_SIZE", str(_per_worker // 2)))
+DB_MAX_OVERFLOW  = int(os.getenv("DB_MAX_OVERFLOW", str(_per_worker - _per_worker // 2)))
+DB_POOL_TIMEOUT  = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE  = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Liveness: a pre-ping costs a round trip per checkout. By default rely on
+# recycling plus TCP keepalives instead; set DB_POOL_PRE_PING=1 to re-enable.
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "").lower() in {"1", "true", "yes"}
+DB_KEEPALIVE_IDLE = int(os.getenv("DB_KEEPALIVE_IDLE", "30"))
+
+# Bounds a connect to an unreachable host (libpq waits indefinitely by default)
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# Pool metrics, labelled by pool ("primary") like the other services.
+POOL_CHECKED_OUT = Gauge(
+    "notification_service_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_CAPACITY = Gauge(
+    "notification_service_db_pool_capacity",
+    "Maximum connections the pool will open (size + overflow)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "notification_service_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "notification_service_db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ["pool"],
+)
+
+def _timed_pool(base, label: str):
+    """Pool subclass that records how long each checkout waited."""
+    class _TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                POOL_CHECKOUT_TIMEOUTS.labels(label).inc()
+                raise
+            finally:
+                POOL_CHECKOUT_WAIT.labels(label).observe(time.perf_counter() - start)
+    return _TimedPool
+
+
+def _make_engine(url: str, label: str):
+    kwargs = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.startswith("postgresql"):
+        # Let the kernel notice dead peers instead of pinging on every checkout.
+        kwargs["connect_args"] = {
+            "keepalives": 1,
+            "keepalives_idle": DB_KEEPALIVE_IDLE,
+            "keepalives_interval": 10,
+            "keepalives_count": 3,
+            "connect_timeout": DB_CONNECT_TIMEOUT,
+        }
+    if DB_POOL_MODE == "null":
+        kwargs["poolclass"] = _timed_pool(NullPool, label)
+    else:
+        kwargs.update(
+            poolclass=_timed_pool(QueuePool, label),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_use_lifo=True,  # idle connections age out and get recycled
+        )
+        POOL_CAPACITY.labels(label).set(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+    eng = create_engine(url, **kwargs)
+
+    @event.listens_for(eng, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        POOL_CHECKED_OUT.labels(label).inc()
+
+    @event.listens_for(eng, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        POOL_CHECKED_OUT.labels(label).dec()
+
+    return eng
+
+
+engine = _make_engine(DATABASE_URL, "primary")
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+def create_schema(metadata):
+    """
+    create_all() plus the indexes declared on the models that an existing
+    table is missing: create_all() skips existing tables, indexes included.
+    """
+    metadata.create_all(bind=engine)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as exc:
+                log.warning("Index %s not created: %s", index.name, exc)
@@ -0,0 +1,182 @@
+# notification-service/app/ingest.py
+# Write path for accepted notifications.
+#
+# Coalescing: an (order_id, type, channel) already accepted within
+# NOTIFICATION_COALESCE_SECONDS is not queued again; the caller gets the
+# existing notification_id back. A lookup catches earlier rows in the window
+# and a unique dedupe_key per window bucket settles concurrent duplicates.
+#
+# Group commit: single POSTs arriving within NOTIFICATION_INGEST_LINGER_MS of
+# each other are written together, so a burst of order events is a few
+# multi-row INSERTs instead of one transaction each.
+#
+#   NOTIFICATION_COALESCE_SECONDS   dedupe window (0 disables coalescing)
+#   NOTIFICATION_INGEST_LINGER_MS   how long a single POST waits for company
+#   NOTIFICATION_INGEST_MAX_BATCH   flush early at this many pending POSTs
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from prometheus_client import Counter, Histogram
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import worker
+from app.database import SessionLocal
+from app.models import Notification
+
+NOTIFICATION_COALESCE_SECONDS = float(os.getenv("NOTIFICATION_COALESCE_SECONDS", "300"))
+NOTIFICATION_INGEST_LINGER_MS = float(os.getenv("NOTIFICATION_INGEST_LINGER_MS", "5"))
+NOTIFICATION_INGEST_MAX_BATCH = int(os.getenv("NOTIFICATION_INGEST_MAX_BATCH", "500"))
+
+NOTIFICATIONS_COALESCED = Counter(
+    "notification_service_coalesced_total",
+    "Notifications dropped as duplicates of one already accepted in the window",
+    ["channel"],
+)
+INGEST_BATCH_SIZE = Histogram(
+    "notification_service_ingest_batch_size",
+    "Notifications per ingest transaction",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+
+def _insert_ignore(db):
+    """INSERT ... ON CONFLICT (dedupe_key) DO NOTHING for the dialects we run on."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(Notification).on_conflict_do_nothing(index_elements=["dedupe_key"])
+    if name == "sqlite":
+        return sqlite.insert(Notification).on_conflict_do_nothing(index_elements=["dedupe_key"])
+    return insert(Notification)
+
+
+def ingest(items: list[dict]) -> list[tuple[int, bool]]:
+    """
+    Queue notifications (dicts of NotifIn fields) in one transaction.
+    Returns (notification_id, coalesced) per item, in order.
+    """
+    coalesce = NOTIFICATION_COALESCE_SECONDS > 0
+    now = datetime.now(timezone.utc)
+    bucket = int(time.time() // NOTIFICATION_COALESCE_SECONDS) if coalesce else 0
+    keys = [(n["order_id"], n["type"], n["channel"]) for n in items]
+    existing: dict[tuple, int] = {}
+
+    with SessionLocal() as db:
+        if coalesce:
+            # Rows already accepted in the window, one query for the whole batch
+            rows = db.execute(
+                select(Notification.notification_id, Notification.order_id, Notification.type, Notification.channel)
+                .where(
+                    Notification.order_id.in_({n["order_id"] for n in items}),
+                    Notification.created_at >= now - timedelta(seconds=NOTIFICATION_COALESCE_SECONDS),
+                )
+                .order_by(Notification.notification_id)
+            ).all()
+            wanted = set(keys)
+            for nid, *k in rows:
+                if tuple(k) in wanted:
+                    existing.setdefault(tuple(k), nid)
+
+        # Write the first occurrence of each key not already queued
+        to_write, seen = [], set()
+        for i, k in enumerate(keys):
+            if coalesce and (k in existing or k in seen):
+                continue
+            seen.add(k)
+            to_write.append(i)
+
+        written: dict[int, int] = {}  # item index -> new notification_id
+        if to_write:
+            params = [
+                {**items[i], "status": "QUEUED", "attempts": 0,
+                 "dedupe_key": f"{':'.join(map(str, keys[i]))}:{bucket}" if coalesce else None}
+                for i in to_write
+            ]
+            returned = db.execute(
+                _insert_ignore(db).returning(
+                    Notification.notification_id, Notification.dedupe_key, sort_by_parameter_order=True
+                ),
+                params,
+            ).all()
+            if not coalesce:
+                written = {i: nid for i, (nid, _) in zip(to_write, returned)}
+            else:
+                by_dk = {dk: nid for nid, dk in returned}
+                lost = []
+                for i, p in zip(to_write, params):
+                    if p["dedupe_key"] in by_dk:
+                        written[i] = by_dk[p["dedupe_key"]]
+                    else:
+                        lost.append(p["dedupe_key"])
+                if lost:
+                    # A concurrent request queued the same key first; point at its row
+                    for nid, dk in db.execute(
+                        select(Notification.notification_id, Notification.dedupe_key)
+                        .where(Notification.dedupe_key.in_(lost))
+                    ).all():
+                        order_id, rest = dk.split(":", 1)
+                        type_, channel, _ = rest.rsplit(":", 2)
+                        existing[(int(order_id), type_, channel)] = nid
+            db.commit()
+        INGEST_BATCH_SIZE.observe(len(items))
+
+    first_written = {keys[i]: nid for i, nid in written.items()}
+    results = []
+    for i, (k, n) in enumerate(zip(keys, items)):
+        if i in written:
+            results.append((written[i], False))
+            worker.NOTIFICATIONS_ENQUEUED.labels(n["channel"]).inc()
+        else:
+            results.append((existing.get(k) or first_written[k], True))
+            NOTIFICATIONS_COALESCED.labels(n["channel"]).inc()
+    if written:
+        worker.notify_enqueued()
+    return results
+
+
+# ---------- Group commit for single POSTs ----------
+
+_pending: list[tuple[dict, asyncio.Future]] = []
+_flush_handle: asyncio.TimerHandle | None = None
+
+
+def _take() -> list[tuple[dict, asyncio.Future]]:
+    """Detach the pending POSTs as one batch; later POSTs start the next."""
+    global _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    batch = _pending[:]
+    _pending.clear()
+    return batch
+
+
+async def _flush(batch: list[tuple[dict, asyncio.Future]]):
+    if not batch:
+        return
+    try:
+        results = await asyncio.to_thread(ingest, [item for item, _ in batch])
+    except Exception as exc:
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(exc)
+        return
+    for (_, fut), result in zip(batch, results):
+        if not fut.done():
+            fut.set_result(result)
+
+
+async def submit(item: dict) -> tuple[int, bool]:
+    """Queue one notification, sharing the write with concurrent callers."""
+    global _flush_handle
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    _pending.append((item, fut))
+    if len(_pending) >= NOTIFICATION_INGEST_MAX_BATCH:
+        asyncio.create_task(_flush(_take()))
+    elif _flush_handle is None:
+        _flush_handle = loop.call_later(
+            NOTIFICATION_INGEST_LINGER_MS / 1000, lambda: asyncio.create_task(_flush(_take()))
+        )
+    return await fut
@@ -1,30 +1,33 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Response
 from fastapi.responses import JSONResponse
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-import time, uuid
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST
+from app.metrics import MetricsMiddleware, latency_buckets, mark_worker_dead, render_metrics
+from app.tracing import setup_tracing
+from app.database import engine
+from app.models import Base
 
 app = FastAPI(title="notification-service", version="1.0.0")
 
 # Import routers
 from app.routers import notifications
+from app import worker
 
 
 # Metrics
 REQUEST_COUNT = Counter("notification_service_http_requests_total", "Total HTTP requests", ["method", "path", "status"])
-REQUEST_LATENCY = Histogram("notification_service_http_request_latency_seconds", "Request latency", ["method", "path"])
-
-# Correlation ID middleware
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next):
-    corr = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-    start = time.time()
-    response: Response = await call_next(request)
-    duration = time.time() - start
-    path = request.url.path
-    REQUEST_COUNT.labels(request.method, path, str(response.status_code)).inc()
-    REQUEST_LATENCY.labels(request.method, path).observe(duration)
-    response.headers["X-Correlation-ID"] = corr
-    return response
+REQUEST_LATENCY = Histogram("notification_service_http_request_latency_seconds", "Request latency", ["method", "path"], buckets=latency_buckets())
+REQUESTS_IN_FLIGHT = Gauge("notification_service_http_requests_in_flight", "Requests currently being served", multiprocess_mode="livesum")
+
+# Correlation ID + metrics (pure ASGI, labelled by route template)
+app.add_middleware(
+    MetricsMiddleware,
+    request_count=REQUEST_COUNT,
+    request_latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+)
+
+# Tracing (W3C traceparent in/out; exporter chosen by TRACING_EXPORTER)
+setup_tracing(app, "notification-service", engines=[engine])
 
 @app.get("/health")
 async def health():
@@ -32,6 +35,19 @@ async def health():
 
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 app.include_router(notifications.router, prefix='/v1')
+
+
+@app.on_event("startup")
+async def on_startup():
+    # The notifications table is the send queue; workers drain it in-process
+    Base.metadata.create_all(bind=engine)
+    await worker.start_workers()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await worker.stop_workers()
+    mark_worker_dead()
@@ -0,0 +1,32 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, func, Index
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Notification(Base):
+    """One message to send; the table doubles as the durable send queue (app/worker.py)."""
+    __tablename__ = "notifications"
+
+    notification_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    order_id: Mapped[int] = mapped_column(Integer, index=True)
+    type: Mapped[str] = mapped_column(String(40))                       # ORDER_CONFIRMED | ...
+    channel: Mapped[str] = mapped_column(String(10), default="EMAIL")   # EMAIL | SMS
+    recipient: Mapped[str | None] = mapped_column(String(120), nullable=True)
+    status: Mapped[str] = mapped_column(String(10), default="QUEUED")   # QUEUED | SENT | FAILED
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # Next time a worker may claim the row: lease expiry or retry backoff.
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    lease_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    # order_id:type:channel:window bucket; a second event in the window conflicts (app/ingest.py)
+    dedupe_key: Mapped[str | None] = mapped_column(String(120), nullable=True, unique=True)
+    last_error: Mapped[str | None] = mapped_column(String(300), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_notifications_claim", "status", "channel", "available_at"),
+    )
@@ -1,14 +1,69 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Literal
+import os
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from app import ingest
+from app.database import SessionLocal
+from app.models import Notification
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+NOTIFICATION_BATCH_MAX_SIZE = int(os.getenv("NOTIFICATION_BATCH_MAX_SIZE", "1000"))
+
 class NotifIn(BaseModel):
     order_id: int
     type: str
+    channel: Literal["EMAIL", "SMS"] = "EMAIL"
+    recipient: str | None = None
+
+class NotifBatchIn(BaseModel):
+    notifications: list[NotifIn] = Field(min_length=1)
+
+class NotifAccepted(BaseModel):
+    order_id: int
+    type: str
+    notification_id: int
+    coalesced: bool  # True when an identical notification was already queued
+
+class NotifOut(BaseModel):
+    notification_id: int
+    order_id: int
+    type: str
+    channel: str
+    status: str  # QUEUED | SENT | FAILED
+    attempts: int
+    last_error: str | None = None
+    created_at: datetime | None = None
+    sent_at: datetime | None = None
+
+    model_config = {"from_attributes": True}
 
 @router.post("", status_code=202)
-def notify(payload: NotifIn):
-    # For demo, just log to stdout; in real service we'd persist and send email/SMS
-    print(f"[NOTIFY] order={payload.order_id} type={payload.type}")
-    return {"accepted": True}
+async def notify(payload: NotifIn):
+    # Persist only (group-committed with concurrent POSTs); app/worker.py sends it
+    notification_id, coalesced = await ingest.submit(payload.model_dump())
+    return {"accepted": True, "notification_id": notification_id, "coalesced": coalesced}
+
+@router.post(":batch", status_code=202, response_model=list[NotifAccepted])
+def notify_batch(payload: NotifBatchIn):
+    """
+    Queue many notifications in one transaction. Duplicates of an
+    (order_id, type, channel) accepted within the coalescing window, in this
+    batch or earlier, are not queued again. Results are in request order.
+    """
+    if len(payload.notifications) > NOTIFICATION_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {NOTIFICATION_BATCH_MAX_SIZE} notifications per batch")
+    items = [n.model_dump() for n in payload.notifications]
+    return [
+        NotifAccepted(order_id=n["order_id"], type=n["type"], notification_id=nid, coalesced=coalesced)
+        for n, (nid, coalesced) in zip(items, ingest.ingest(items))
+    ]
+
+@router.get("/{notification_id}", response_model=NotifOut)
+def get_notification(notification_id: int):
+    with SessionLocal() as db:
+        n = db.get(Notification, notification_id)
+        if not n:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        return NotifOut.model_validate(n)
@@ -0,0 +1,57 @@
+# notification-service/app/senders.py
+# Channel senders. A sender gets a whole batch and reports per message, so a
+# real SMTP/SMS gateway client can reuse one connection per batch.
+#
+# The defaults are local stand-ins (nothing leaves the process); swap one in
+# with register_sender("EMAIL", MySmtpSender()).
+#
+#   NOTIFICATION_FAKE_LATENCY_MS       per-batch round trip of the fake gateways
+#   NOTIFICATION_FAKE_PER_MESSAGE_MS   extra cost per message in a batch
+#   NOTIFICATION_FAKE_FAILURE_RATE     probability a single message fails
+
+import asyncio
+import logging
+import os
+import random
+from abc import ABC, abstractmethod
+
+log = logging.getLogger("notification-service.senders")
+
+NOTIFICATION_FAKE_LATENCY_MS     = float(os.getenv("NOTIFICATION_FAKE_LATENCY_MS", "50"))
+NOTIFICATION_FAKE_PER_MESSAGE_MS = float(os.getenv("NOTIFICATION_FAKE_PER_MESSAGE_MS", "1"))
+NOTIFICATION_FAKE_FAILURE_RATE   = float(os.getenv("NOTIFICATION_FAKE_FAILURE_RATE", "0.02"))
+
+
+class Sender(ABC):
+    @abstractmethod
+    async def send_batch(self, messages: list[dict]) -> list[str | None]:
+        """Send messages; return None for each success or an error string."""
+
+
+class FakeGateway(Sender):
+    """Stand-in for an SMTP relay / SMS API: latency plus random per-message failures."""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    async def send_batch(self, messages):
+        delay = NOTIFICATION_FAKE_LATENCY_MS + NOTIFICATION_FAKE_PER_MESSAGE_MS * len(messages)
+        await asyncio.sleep(delay / 1000)
+        results = []
+        for m in messages:
+            if random.random() < NOTIFICATION_FAKE_FAILURE_RATE:
+                results.append(f"{self.channel} gateway rejected message")
+            else:
+                log.debug("[%s] order=%s type=%s to=%s", self.channel, m["order_id"], m["type"], m["recipient"])
+                results.append(None)
+        return results
+
+
+SENDERS: dict[str, Sender] = {
+    "EMAIL": FakeGateway("EMAIL"),
+    "SMS": FakeGateway("SMS"),
+}
+
+
+def register_sender(channel: str, sender: Sender):
+    SENDERS[channel] = sender
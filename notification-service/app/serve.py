@@ -0,0 +1,30 @@
+# app/serve.py
+# Container entry point: `python -m app.serve`.
+#
+# WEB_CONCURRENCY > 1 runs that many uvicorn workers and switches
+# prometheus_client to multiprocess mode, so /metrics aggregates all workers
+# (see app/metrics.render_metrics). Each worker has its own DB pool; by default
+# the pools split DB_CONNECTION_BUDGET between the workers (app/database.py).
+
+import os
+import shutil
+import uvicorn
+
+
+def main():
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Must be set before any worker imports prometheus_client.
+        mp_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+        shutil.rmtree(mp_dir, ignore_errors=True)  # stale files from a previous run
+        os.makedirs(mp_dir)
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "80")),
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
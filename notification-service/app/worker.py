@@ -0,0 +1,281 @@
+# notification-service/app/worker.py
+# asyncio worker pool draining the notifications table.
+#
+# Each worker claims up to NOTIFICATION_BATCH_SIZE due rows of one channel
+# (FOR UPDATE SKIP LOCKED plus a lease token, so replicas and uvicorn workers
+# can share the table), hands the batch to that channel's sender and records
+# the per-message outcome. Failures are retried with jittered exponential
+# backoff until NOTIFICATION_MAX_ATTEMPTS. DB calls run in threads so the
+# event loop keeps serving requests.
+#
+#   NOTIFICATION_WORKERS            worker tasks per process (0 disables)
+#   NOTIFICATION_BATCH_SIZE         max messages per send
+#   NOTIFICATION_BATCH_LINGER_MS    wait after a wakeup so bursts share a batch
+#   NOTIFICATION_POLL_SECONDS       idle poll interval
+#   NOTIFICATION_LEASE_SECONDS      a claimed row is retried after this long
+#   NOTIFICATION_MAX_ATTEMPTS       sends before a message is marked FAILED
+#   NOTIFICATION_RETRY_BASE_SECONDS / NOTIFICATION_RETRY_MAX_SECONDS  backoff
+
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import func, select, update
+from app.database import SessionLocal
+from app.models import Notification
+from app.senders import SENDERS
+
+log = logging.getLogger("notification-service.worker")
+
+NOTIFICATION_WORKERS            = int(os.getenv("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_BATCH_SIZE         = int(os.getenv("NOTIFICATION_BATCH_SIZE", "100"))
+NOTIFICATION_BATCH_LINGER_MS    = float(os.getenv("NOTIFICATION_BATCH_LINGER_MS", "10"))
+NOTIFICATION_POLL_SECONDS       = float(os.getenv("NOTIFICATION_POLL_SECONDS", "1"))
+NOTIFICATION_LEASE_SECONDS      = float(os.getenv("NOTIFICATION_LEASE_SECONDS", "60"))
+NOTIFICATION_MAX_ATTEMPTS       = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_BASE_SECONDS = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "2"))
+NOTIFICATION_RETRY_MAX_SECONDS  = float(os.getenv("NOTIFICATION_RETRY_MAX_SECONDS", "300"))
+NOTIFICATION_DEPTH_INTERVAL     = float(os.getenv("NOTIFICATION_DEPTH_INTERVAL", "5"))
+
+NOTIFICATIONS_ENQUEUED = Counter(
+    "notification_service_enqueued_total",
+    "Notifications accepted into the queue",
+    ["channel"],
+)
+NOTIFICATIONS_PROCESSED = Counter(
+    "notification_service_processed_total",
+    "Send attempts by outcome",
+    ["channel", "outcome"],  # sent | retry | failed
+)
+SEND_BATCH_SIZE = Histogram(
+    "notification_service_send_batch_size",
+    "Messages per sender call",
+    ["channel"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+SEND_SECONDS = Histogram(
+    "notification_service_send_seconds",
+    "Sender call duration per batch",
+    ["channel"],
+)
+DELIVERY_LAG = Histogram(
+    "notification_service_delivery_lag_seconds",
+    "Time from enqueue to successful send",
+    ["channel"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+QUEUE_DEPTH = Gauge(
+    "notification_service_queue_depth",
+    "Queued (unsent) notifications",
+    ["channel"],
+    multiprocess_mode="livemax",  # every process sees the same table
+)
+QUEUE_OLDEST_AGE = Gauge(
+    "notification_service_queue_oldest_age_seconds",
+    "Age of the oldest queued notification",
+    multiprocess_mode="livemax",
+)
+
+_loop: asyncio.AbstractEventLoop | None = None
+_wakeup: asyncio.Event | None = None
+_stopping = False
+_tasks: list[asyncio.Task] = []
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def notify_enqueued():
+    """Wake idle workers; safe to call from the sync handler threads."""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+# ---------- DB side (runs in threads) ----------
+
+def _claim() -> tuple[str, list[dict]] | None:
+    """Lease a batch of due notifications for the channel with the oldest one."""
+    now = _now()
+    due = (Notification.status == "QUEUED", Notification.available_at <= now)
+    with SessionLocal() as db:
+        channel = db.execute(
+            select(Notification.channel).where(*due).order_by(Notification.available_at).limit(1)
+        ).scalar_one_or_none()
+        if channel is None:
+            return None
+        ids = db.execute(
+            select(Notification.notification_id)
+            .where(*due, Notification.channel == channel)
+            .order_by(Notification.available_at)
+            .limit(NOTIFICATION_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        # The lease token tells us which rows we won, also without SKIP LOCKED
+        token = str(uuid.uuid4())
+        db.execute(
+            update(Notification)
+            .where(Notification.notification_id.in_(ids), *due)
+            .values(lease_id=token, available_at=now + timedelta(seconds=NOTIFICATION_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        rows = db.execute(select(Notification).where(Notification.lease_id == token)).scalars().all()
+        if not rows:
+            return None
+        return channel, [
+            {
+                "notification_id": n.notification_id,
+                "order_id": n.order_id,
+                "type": n.type,
+                "recipient": n.recipient,
+                "attempts": n.attempts,
+                "created_at": n.created_at,
+                "lease_id": token,
+            }
+            for n in rows
+        ]
+
+
+def _complete(channel: str, batch: list[dict], errors: list[str | None]):
+    """
+    Record the outcomes of a claimed batch. Rows whose lease expired and were
+    claimed again are left to the new holder: it sends them again, and its
+    outcome is the one recorded.
+    """
+    now = _now()
+    sent = [m["notification_id"] for m, err in zip(batch, errors) if err is None]
+    ours = Notification.lease_id == batch[0]["lease_id"]
+    with SessionLocal() as db:
+        if sent:
+            db.execute(
+                update(Notification)
+                .where(Notification.notification_id.in_(sent), ours)
+                .values(status="SENT", sent_at=now, lease_id=None, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+        for m, err in zip(batch, errors):
+            if err is None:
+                if m["created_at"] is not None:
+                    DELIVERY_LAG.labels(channel).observe((now - _aware(m["created_at"])).total_seconds())
+                continue
+            attempts = m["attempts"] + 1
+            values = {"attempts": attempts, "lease_id": None, "last_error": err[:300]}
+            if attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                values["status"] = "FAILED"
+                NOTIFICATIONS_PROCESSED.labels(channel, "failed").inc()
+            else:
+                backoff = min(NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1), NOTIFICATION_RETRY_MAX_SECONDS)
+                values["available_at"] = now + timedelta(seconds=backoff * random.uniform(0.5, 1.5))
+                NOTIFICATIONS_PROCESSED.labels(channel, "retry").inc()
+            db.execute(
+                update(Notification)
+                .where(Notification.notification_id == m["notification_id"], ours)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    if sent:
+        NOTIFICATIONS_PROCESSED.labels(channel, "sent").inc(len(sent))
+
+
+def _sample_depth():
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Notification.channel, func.count(), func.min(Notification.created_at))
+            .where(Notification.status == "QUEUED")
+            .group_by(Notification.channel)
+        ).all()
+    depth = {ch: 0 for ch in SENDERS}
+    oldest = None
+    for channel, count, created in rows:
+        depth[channel] = count
+        if created is not None and (oldest is None or _aware(created) < oldest):
+            oldest = _aware(created)
+    for channel, count in depth.items():
+        QUEUE_DEPTH.labels(channel).set(count)
+    QUEUE_OLDEST_AGE.set((_now() - oldest).total_seconds() if oldest else 0)
+
+
+# ---------- Event loop side ----------
+
+async def _send(channel: str, batch: list[dict]) -> list[str | None]:
+    sender = SENDERS.get(channel)
+    if sender is None:
+        return [f"No sender for channel {channel}"] * len(batch)
+    start = time.perf_counter()
+    try:
+        errors = await sender.send_batch(batch)
+    except Exception as exc:
+        log.warning("%s sender failed a batch of %d: %s", channel, len(batch), exc)
+        errors = [str(exc) or type(exc).__name__] * len(batch)
+    finally:
+        SEND_SECONDS.labels(channel).observe(time.perf_counter() - start)
+        SEND_BATCH_SIZE.labels(channel).observe(len(batch))
+    return errors
+
+
+async def _wait_for_work():
+    try:
+        await asyncio.wait_for(_wakeup.wait(), NOTIFICATION_POLL_SECONDS)
+    except asyncio.TimeoutError:
+        return
+    _wakeup.clear()
+    # Let the rest of a burst land so it goes out as one batch
+    await asyncio.sleep(NOTIFICATION_BATCH_LINGER_MS / 1000)
+
+
+async def _run():
+    while not _stopping:
+        try:
+            claimed = await asyncio.to_thread(_claim)
+            if claimed is None:
+                await _wait_for_work()
+                continue
+            channel, batch = claimed
+            errors = await _send(channel, batch)
+            await asyncio.to_thread(_complete, channel, batch, errors)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Notification worker error")
+            await asyncio.sleep(NOTIFICATION_POLL_SECONDS)
+
+
+async def _monitor():
+    while not _stopping:
+        try:
+            await asyncio.to_thread(_sample_depth)
+        except Exception as exc:
+            log.warning("Queue depth sample failed: %s", exc)
+        await asyncio.sleep(NOTIFICATION_DEPTH_INTERVAL)
+
+
+async def start_workers():
+    global _loop, _wakeup, _stopping
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _stopping = False
+    _tasks.append(asyncio.create_task(_monitor()))
+    for _ in range(NOTIFICATION_WORKERS):
+        _tasks.append(asyncio.create_task(_run()))
+
+
+async def stop_workers():
+    """Stop claiming; rows leased by an interrupted batch are retried after the lease."""
+    global _loop, _wakeup, _stopping
+    _stopping = True
+    for t in _tasks:
+        t.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    # The loop may be closed next; later enqueues must not schedule on it
+    _loop = _wakeup = None
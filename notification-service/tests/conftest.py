@@ -0,0 +1,36 @@
+# notification-service/tests/conftest.py
+# Runs the app against a throwaway SQLite file, with the in-process send
+# workers off: tests drive app/worker.py's claim/send/complete steps directly.
+# Run from notification-service/: python -m pytest tests
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="notification-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/notifications.db"
+os.environ["TRACING_EXPORTER"] = "none"
+os.environ["NOTIFICATION_WORKERS"] = "0"
+os.environ["NOTIFICATION_FAKE_LATENCY_MS"] = "0"
+os.environ["NOTIFICATION_FAKE_PER_MESSAGE_MS"] = "0"
+os.environ["NOTIFICATION_FAKE_FAILURE_RATE"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.database import engine
+from app.main import app
+from app.models import Base
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
@@ -0,0 +1,110 @@
+# notification-service/tests/test_ingest.py
+
+import asyncio
+import time
+from datetime import timedelta
+import pytest
+from sqlalchemy import func, select
+from app import ingest, worker
+from app.database import SessionLocal
+from app.models import Notification
+
+
+def _item(order_id: int = 1, type: str = "ORDER_CONFIRMED", channel: str = "EMAIL") -> dict:
+    return {"order_id": order_id, "type": type, "channel": channel, "recipient": None}
+
+
+def _count() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Notification))
+
+
+def _batch(client, *items) -> list[dict]:
+    r = client.post("/v1/notifications:batch", json={"notifications": list(items)})
+    assert r.status_code == 202, r.text
+    return r.json()
+
+
+def test_duplicates_in_a_batch_are_coalesced(client):
+    body = _batch(client, _item(1), _item(1), _item(1, channel="SMS"), _item(1, type="ORDER_DELIVERED"))
+    assert [n["coalesced"] for n in body] == [False, True, False, False]
+    assert body[1]["notification_id"] == body[0]["notification_id"]
+    assert _count() == 3
+
+
+def test_duplicates_of_earlier_requests_are_coalesced(client):
+    first = _batch(client, _item(1))[0]["notification_id"]
+    r = client.post("/v1/notifications", json=_item(1))
+    assert r.json() == {"accepted": True, "notification_id": first, "coalesced": True}
+    assert _batch(client, _item(1), _item(2))[0] == {
+        "order_id": 1, "type": "ORDER_CONFIRMED", "notification_id": first, "coalesced": True,
+    }
+    assert _count() == 2
+
+
+def test_concurrent_writer_in_the_same_bucket_wins():
+    # Another request queued the key in this bucket after our lookup: its row
+    # is not found by created_at, only by the dedupe_key conflict
+    bucket = int(time.time() // ingest.NOTIFICATION_COALESCE_SECONDS)
+    with SessionLocal() as db:
+        other = Notification(order_id=1, type="ORDER_CONFIRMED", channel="EMAIL", status="QUEUED",
+                             attempts=0, dedupe_key=f"1:ORDER_CONFIRMED:EMAIL:{bucket}",
+                             created_at=worker._now() - timedelta(seconds=ingest.NOTIFICATION_COALESCE_SECONDS + 1))
+        db.add(other)
+        db.commit()
+        other_id = other.notification_id
+
+    assert ingest.ingest([_item(1), _item(1), _item(2)]) == [(other_id, True), (other_id, True), (other_id + 1, False)]
+    assert _count() == 2
+
+
+def test_coalescing_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(ingest, "NOTIFICATION_COALESCE_SECONDS", 0)
+    results = ingest.ingest([_item(1), _item(1)])
+    assert [coalesced for _, coalesced in results] == [False, False]
+    assert results[0][0] != results[1][0]
+    assert _count() == 2
+
+
+@pytest.fixture
+def ingest_calls(monkeypatch):
+    calls: list[list[dict]] = []
+    real = ingest.ingest
+
+    def spy(items):
+        calls.append(items)
+        return real(items)
+
+    monkeypatch.setattr(ingest, "ingest", spy)
+    monkeypatch.setattr(ingest, "NOTIFICATION_INGEST_LINGER_MS", 20)
+    return calls
+
+
+def _submit_all(*items):
+    async def run():
+        return await asyncio.gather(*(ingest.submit(i) for i in items))
+    return asyncio.run(run())
+
+
+def test_concurrent_posts_share_one_write(ingest_calls):
+    results = _submit_all(_item(1), _item(2), _item(1))
+    assert [len(c) for c in ingest_calls] == [3]
+    assert [coalesced for _, coalesced in results] == [False, False, True]
+    assert results[2][0] == results[0][0]
+
+
+def test_full_batch_flushes_early(ingest_calls, monkeypatch):
+    monkeypatch.setattr(ingest, "NOTIFICATION_INGEST_MAX_BATCH", 2)
+    _submit_all(_item(1), _item(2), _item(3))
+    assert [len(c) for c in ingest_calls] == [2, 1]
+    assert _count() == 3
+
+
+def test_failed_write_fails_every_waiter(ingest_calls, monkeypatch):
+    def broken(items):
+        raise RuntimeError("db down")
+    monkeypatch.setattr(ingest, "ingest", broken)
+
+    async def run():
+        return await asyncio.gather(ingest.submit(_item(1)), ingest.submit(_item(2)), return_exceptions=True)
+    assert [type(r) for r in asyncio.run(run())] == [RuntimeError, RuntimeError]
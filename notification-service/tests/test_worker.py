@@ -0,0 +1,129 @@
+# notification-service/tests/test_worker.py
+
+import asyncio
+from datetime import timedelta
+import pytest
+from sqlalchemy import update
+from app import worker
+from app.database import SessionLocal
+from app.models import Notification
+from app.senders import Sender
+
+
+def _queue(*orders: int, channel: str = "EMAIL") -> list[int]:
+    with SessionLocal() as db:
+        rows = [Notification(order_id=o, type="ORDER_CONFIRMED", channel=channel, status="QUEUED",
+                             attempts=0, available_at=worker._now()) for o in orders]
+        db.add_all(rows)
+        db.commit()
+        return [n.notification_id for n in rows]
+
+
+def _get(notification_id: int) -> Notification:
+    with SessionLocal() as db:
+        return db.get(Notification, notification_id)
+
+
+def _expire_leases():
+    with SessionLocal() as db:
+        db.execute(update(Notification).values(available_at=worker._now() - timedelta(seconds=1)))
+        db.commit()
+
+
+class RecordingSender(Sender):
+    def __init__(self, fail: set[int] = frozenset()):
+        self.batches: list[list[int]] = []
+        self.fail = fail
+
+    async def send_batch(self, messages):
+        self.batches.append([m["order_id"] for m in messages])
+        return ["rejected" if m["order_id"] in self.fail else None for m in messages]
+
+
+@pytest.fixture
+def sender(monkeypatch):
+    s = RecordingSender()
+    monkeypatch.setitem(worker.SENDERS, "EMAIL", s)
+    return s
+
+
+def test_claim_leases_a_batch_of_one_channel(monkeypatch):
+    monkeypatch.setattr(worker, "NOTIFICATION_BATCH_SIZE", 2)
+    _queue(1, 2, 3)
+    _queue(4, channel="SMS")
+
+    channel, batch = worker._claim()
+    assert channel == "EMAIL"
+    assert [m["order_id"] for m in batch] == [1, 2]
+    assert len({m["lease_id"] for m in batch}) == 1
+
+    # Leased rows are not claimed again while the lease lasts
+    channel, batch = worker._claim()
+    assert [m["order_id"] for m in batch] == [3]
+    assert worker._claim()[0] == "SMS"
+    assert worker._claim() is None
+
+
+def test_expired_lease_is_taken_over():
+    nid, = _queue(1)
+    _, first = worker._claim()
+    assert worker._claim() is None
+
+    _expire_leases()    # the first worker died mid-send
+    _, second = worker._claim()
+    assert [m["notification_id"] for m in second] == [nid]
+    assert second[0]["lease_id"] != first[0]["lease_id"]
+    assert _get(nid).lease_id == second[0]["lease_id"]
+
+
+def test_stale_holder_does_not_overwrite_the_new_lease():
+    nid, = _queue(1)
+    _, first = worker._claim()
+    _expire_leases()
+    _, second = worker._claim()
+
+    # The first worker comes back and reports a failure: the row stays leased
+    worker._complete("EMAIL", first, ["timeout"])
+    n = _get(nid)
+    assert (n.status, n.attempts, n.lease_id) == ("QUEUED", 0, second[0]["lease_id"])
+
+    worker._complete("EMAIL", second, [None])
+    n = _get(nid)
+    assert (n.status, n.lease_id) == ("SENT", None)
+    assert n.sent_at is not None
+
+
+def test_failures_back_off_then_fail(monkeypatch):
+    monkeypatch.setattr(worker, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    ok, bad = _queue(1, 2)
+    _, batch = worker._claim()
+    worker._complete("EMAIL", batch, [None, "rejected"])
+    assert _get(ok).status == "SENT"
+    n = _get(bad)
+    assert (n.status, n.attempts, n.last_error, n.lease_id) == ("QUEUED", 1, "rejected", None)
+    assert worker._claim() is None     # backing off
+
+    _expire_leases()
+    _, batch = worker._claim()
+    worker._complete("EMAIL", batch, ["rejected"])
+    assert (_get(bad).status, _get(bad).attempts) == ("FAILED", 2)
+
+
+def test_workers_drain_the_queue(sender, monkeypatch):
+    monkeypatch.setattr(worker, "NOTIFICATION_WORKERS", 2)
+    monkeypatch.setattr(worker, "NOTIFICATION_POLL_SECONDS", 0.01)
+    ids = _queue(1, 2, 3)
+
+    async def run():
+        await worker.start_workers()
+        try:
+            for _ in range(200):
+                if all(_get(i).status == "SENT" for i in ids):
+                    return
+                await asyncio.sleep(0.01)
+        finally:
+            await worker.stop_workers()
+
+    asyncio.run(run())
+    assert [_get(i).status for i in ids] == ["SENT"] * 3
+    assert sorted(o for b in sender.batches for o in b) == [1, 2, 3]
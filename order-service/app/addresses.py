@@ -0,0 +1,183 @@
+# order-service/app/addresses.py
+# Delivery address checks for place_order, backed by customer-service.
+#
+# customer-service owns addresses; we keep a process-local LRU of
+# address_id -> (customer_id, normalised city) with a TTL. A miss fetches the
+# customer's address list once (which also warms their other addresses) and
+# runs concurrently with the restaurant fetch, so the common case adds no
+# network hop at all.
+#
+#   ADDRESS_VALIDATION          strict: reject orders when customer-service can't
+#                                       confirm the address (503 when it's down)
+#                               lenient: reject known mismatches, let orders
+#                                        through when customer-service is down
+#                               off: trust the client, as before
+#   ADDRESS_CACHE_SIZE          cached addresses per process
+#   ADDRESS_CACHE_TTL_SECONDS   how long an address is trusted without re-checking
+#   CITY_ALIASES                extra "alias=city,..." pairs for normalize_city()
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import httpx
+from prometheus_client import Counter
+from app import downstream
+from app.downstream import BreakerOpen, DeadlineExceeded
+
+CUSTOMER_URL = os.getenv("CUSTOMER_SERVICE_URL", "http://customer-service:80")
+
+ADDRESS_VALIDATION        = os.getenv("ADDRESS_VALIDATION", "lenient").lower()
+ADDRESS_CACHE_SIZE        = int(os.getenv("ADDRESS_CACHE_SIZE", "10000"))
+ADDRESS_CACHE_TTL_SECONDS = float(os.getenv("ADDRESS_CACHE_TTL_SECONDS", "300"))
+
+# Old names and common spellings -> the name used across our data
+_CITY_ALIASES = {
+    "bangalore": "bengaluru",
+    "bombay": "mumbai",
+    "madras": "chennai",
+    "calcutta": "kolkata",
+    "new delhi": "delhi",
+    "poona": "pune",
+    "gurgaon": "gurugram",
+    "amdavad": "ahmedabad",
+    "secunderabad": "hyderabad",
+}
+for pair in filter(None, os.getenv("CITY_ALIASES", "").split(",")):
+    alias, _, city = pair.partition("=")
+    _CITY_ALIASES[" ".join(alias.split()).casefold()] = " ".join(city.split()).casefold()
+
+ADDRESS_LOOKUPS = Counter(
+    "order_service_address_lookups_total",
+    "Address checks in place_order (hit, miss, error)",
+    ["result"],
+)
+
+
+class AddressNotFound(Exception):
+    """customer-service says the customer has no such address."""
+
+
+class AddressUnavailable(Exception):
+    """customer-service could not be asked (breaker open, timeout, 5xx, unreadable reply)."""
+
+
+def normalize_city(city: str | None) -> str:
+    """Case/whitespace-insensitive city key with aliases folded in."""
+    key = " ".join((city or "").split()).casefold()
+    return _CITY_ALIASES.get(key, key)
+
+
+def canonical_city(city: str | None) -> str:
+    """Display form of normalize_city(): "  BOMBAY " -> "Mumbai"."""
+    return normalize_city(city).title()
+
+
+# ---------- Cache ----------
+
+class _TTLCache:
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._items: OrderedDict[int, tuple[float, tuple[int, str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: int) -> tuple[int, str] | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key: int, value: tuple[int, str]):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_cache = _TTLCache(ADDRESS_CACHE_SIZE, ADDRESS_CACHE_TTL_SECONDS)
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="address-lookup")
+
+
+def _fetch(customer_id: int, address_id: int, deadline, headers: dict) -> tuple[int, str]:
+    """Cache all of the customer's addresses; return the requested one."""
+    page, seen = 1, 0
+    while True:
+        try:
+            resp = downstream.get(
+                "customer", f"{CUSTOMER_URL}/customers/{customer_id}/addresses?page_size=100&page={page}",
+                deadline, headers=headers,
+            )
+        except (BreakerOpen, DeadlineExceeded, httpx.HTTPError) as exc:
+            raise AddressUnavailable(str(exc) or type(exc).__name__)
+        if resp.status_code == 404:
+            raise AddressNotFound(address_id)
+        if resp.status_code != 200:
+            raise AddressUnavailable(f"customer-service returned {resp.status_code}")
+        try:
+            body = resp.json()
+            items = body.get("items", [])
+            for a in items:
+                _cache.put(a["address_id"], (customer_id, normalize_city(a.get("city"))))
+            total = int(body.get("total", 0))
+        except (AttributeError, KeyError, TypeError, ValueError) as exc:
+            # Malformed reply: the same as customer-service being unavailable
+            raise AddressUnavailable(f"unreadable customer-service response: {exc!r}")
+        found = _cache.get(address_id)
+        if found is not None:
+            return found
+        seen += len(items)
+        if not items or seen >= total:
+            raise AddressNotFound(address_id)
+        page += 1
+
+
+def lookup(customer_id: int, address_id: int, deadline, headers: dict) -> Future | None:
+    """
+    Start checking an address: a finished Future on a cache hit, a running
+    one on a miss, None when ADDRESS_VALIDATION=off. Pass it to resolve().
+    """
+    if ADDRESS_VALIDATION == "off":
+        return None
+    cached = _cache.get(address_id)
+    if cached is not None:
+        ADDRESS_LOOKUPS.labels("hit").inc()
+        fut: Future = Future()
+        fut.set_result(cached)
+        return fut
+    ADDRESS_LOOKUPS.labels("miss").inc()
+    # Carry the caller's context (trace span) into the pool thread
+    return _pool.submit(contextvars.copy_context().run, _fetch, customer_id, address_id, deadline, headers)
+
+
+def resolve(pending: Future | None, customer_id: int) -> str | None:
+    """
+    Normalised city of the address, or None when it could not be checked
+    (validation off, or lenient and customer-service unavailable). Raises
+    AddressNotFound if the address is not this customer's, and
+    AddressUnavailable in strict mode.
+    """
+    if pending is None:
+        return None
+    try:
+        owner, city = pending.result()
+    except AddressUnavailable:
+        ADDRESS_LOOKUPS.labels("error").inc()
+        if ADDRESS_VALIDATION == "strict":
+            raise
+        return None
+    if owner != customer_id:
+        raise AddressNotFound()
+    return city
@@ -0,0 +1,98 @@
+# order-service/app/analytics.py
+# Incrementally maintained order aggregates (order_daily_stats).
+#
+# Placing an order adds it to its (day, restaurant, city, status) bucket and
+# every status transition moves it from the old bucket to the new one, in the
+# same transaction as the order write. Buckets are upserted with
+# INSERT ... ON CONFLICT DO UPDATE, so concurrent writers just add deltas.
+#
+# Rebuild from orders (first deploy, or after manual data fixes):
+#
+#     python -m app.analytics backfill
+
+import logging
+import sys
+from sqlalchemy import Date, cast, delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import Order, OrderDailyStat
+
+log = logging.getLogger("order-service.analytics")
+
+_KEY = ("day", "restaurant_id", "city", "order_status")
+
+
+def _upsert(db, rows: list[dict]):
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        stmt = postgresql.insert(OrderDailyStat)
+    elif name == "sqlite":
+        stmt = sqlite.insert(OrderDailyStat)
+    else:
+        raise RuntimeError(f"order analytics needs Postgres or SQLite, not {name}")
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEY),
+        set_={
+            "order_count": OrderDailyStat.order_count + stmt.excluded.order_count,
+            "revenue": OrderDailyStat.revenue + stmt.excluded.revenue,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def _bucket(order, status: str, sign: int) -> dict:
+    return {
+        "day": order.created_at.date(),
+        "restaurant_id": order.restaurant_id,
+        "city": order.address_city or "",
+        "order_status": status,
+        "order_count": sign,
+        "revenue": sign * (order.order_total or 0.0),
+    }
+
+
+def record_placed(db, order):
+    """Count a new (flushed, uncommitted) order; commits with the caller."""
+    _upsert(db, [_bucket(order, order.order_status, 1)])
+
+
+def record_transition(db, order, old_status: str):
+    """Move an order between status buckets; commits with the caller."""
+    if old_status != order.order_status:
+        _upsert(db, [_bucket(order, old_status, -1), _bucket(order, order.order_status, 1)])
+
+
+def backfill(engine) -> int:
+    """Recompute order_daily_stats from orders in one transaction; returns bucket count."""
+    day = func.date(Order.created_at) if engine.dialect.name == "sqlite" else cast(Order.created_at, Date)
+    city = func.coalesce(Order.address_city, "")
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Hold off order writes so no delta lands between delete and insert
+            conn.execute(text("LOCK TABLE orders IN SHARE MODE"))
+        conn.execute(delete(OrderDailyStat))
+        conn.execute(
+            insert(OrderDailyStat).from_select(
+                list(_KEY) + ["order_count", "revenue"],
+                select(day, Order.restaurant_id, city, Order.order_status,
+                       func.count(), func.coalesce(func.sum(Order.order_total), 0.0))
+                .group_by(day, Order.restaurant_id, city, Order.order_status),
+            )
+        )
+        return conn.execute(select(func.count()).select_from(OrderDailyStat)).scalar_one()
+
+
+def main(argv: list[str]):
+    if argv[:1] != ["backfill"]:
+        print("usage: python -m app.analytics backfill", file=sys.stderr)
+        return 2
+    from app.database import create_schema, engine
+    from app.models import Base
+    create_schema(Base.metadata)
+    buckets = backfill(engine)
+    print(f"order_daily_stats rebuilt: {buckets} buckets")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
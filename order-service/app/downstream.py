@@ -0,0 +1,290 @@
+# order-service/app/downstream.py
+# Calls from order-service to the services it depends on.
+#
+# - One shared httpx.Client, so hops reuse keep-alive connections.
+# - One circuit breaker per downstream over a rolling window of calls: too many
+#   errors or slow calls open it, and callers then fail fast (503) instead of
+#   waiting out timeouts on worker threads. After BREAKER_OPEN_SECONDS a few
+#   half-open probes decide whether it closes again.
+# - Per-call timeouts adapt to the downstream's recent p99 and are capped by the
+#   request's Deadline, so all hops of one order share a single time budget.
+#   Non-idempotent calls (the payment charge) pass a fixed_timeout instead: a
+#   tight adaptive timeout there turns a slow success into an unknown outcome.
+# - Idempotent GETs can be hedged: if the first attempt is slower than the
+#   downstream's recent p95, a second one goes out and the first response wins.
+#   Hedges spend tokens from a process-wide RetryBudget, so a slow downstream
+#   sees at most ~RETRY_BUDGET_RATIO extra load rather than double.
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
+from prometheus_client import Counter, Gauge
+from app.tracing import traced_client
+
+ORDER_DEADLINE_SECONDS   = float(os.getenv("ORDER_DEADLINE_SECONDS", "8"))
+BREAKER_WINDOW_SECONDS   = float(os.getenv("BREAKER_WINDOW_SECONDS", "30"))
+BREAKER_MIN_CALLS        = int(os.getenv("BREAKER_MIN_CALLS", "20"))
+BREAKER_FAILURE_RATE     = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "2"))
+BREAKER_SLOW_CALL_RATE   = float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_OPEN_SECONDS     = float(os.getenv("BREAKER_OPEN_SECONDS", "10"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "3"))
+# Adaptive timeout = recent p99 x multiplier, clamped to [min, max].
+TIMEOUT_MIN_SECONDS      = float(os.getenv("DOWNSTREAM_TIMEOUT_MIN_SECONDS", "0.25"))
+TIMEOUT_MAX_SECONDS      = float(os.getenv("DOWNSTREAM_TIMEOUT_MAX_SECONDS", "5"))
+TIMEOUT_P99_MULTIPLIER   = float(os.getenv("DOWNSTREAM_TIMEOUT_P99_MULTIPLIER", "3"))
+# Hedged GETs (off by default) and the budget that bounds them.
+HEDGE_REQUESTS           = os.getenv("HEDGE_REQUESTS", "").lower() in {"1", "true", "yes"}
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "0.1"))
+HEDGE_MAX_THREADS        = int(os.getenv("HEDGE_MAX_THREADS", "64"))
+RETRY_BUDGET_RATIO       = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))
+
+# Remaining budget in milliseconds, read from callers and sent to downstreams.
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = Gauge(
+    "order_service_circuit_breaker_state",
+    "Circuit breaker state per downstream (0 closed, 1 half-open, 2 open)",
+    ["downstream"],
+    multiprocess_mode="livemax",
+)
+BREAKER_TRANSITIONS = Counter(
+    "order_service_circuit_breaker_transitions_total",
+    "Circuit breaker state changes",
+    ["downstream", "state"],
+)
+BREAKER_REJECTED = Counter(
+    "order_service_circuit_breaker_rejected_total",
+    "Calls failed fast because the breaker was open",
+    ["downstream"],
+)
+HEDGED_REQUESTS = Counter(
+    "order_service_hedged_requests_total",
+    "Hedge-eligible GETs by outcome (not_needed, primary_won, hedge_won, both_failed, budget_exhausted)",
+    ["downstream", "outcome"],
+)
+
+
+class BreakerOpen(Exception):
+    """The downstream's breaker is open; the call was not attempted."""
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before this hop."""
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float):
+        self.expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def from_headers(cls, headers) -> "Deadline":
+        """ORDER_DEADLINE_SECONDS, or less if the caller sent a tighter budget."""
+        budget = ORDER_DEADLINE_SECONDS
+        raw = headers.get(DEADLINE_HEADER)
+        if raw and raw.isdigit():
+            budget = min(budget, int(raw) / 1000)
+        return cls(budget)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def timeout(self, cap: float) -> float:
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded()
+        return min(cap, left)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: deque[tuple[float, bool, float]] = deque(maxlen=1000)  # (at, ok, seconds)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        BREAKER_STATE.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _transition(self, state: str):
+        # Caller holds the lock.
+        self._state = state
+        BREAKER_STATE.labels(self.name).set(_STATE_VALUE[state])
+        BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def _trip(self, now: float):
+        self._opened_at = now
+        self._calls.clear()
+        self._transition(OPEN)
+
+    def acquire(self):
+        """Raise BreakerOpen unless a call may go out now."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < BREAKER_OPEN_SECONDS:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise BreakerOpen(self.name)
+                self._probes = self._probe_successes = 0
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= BREAKER_HALF_OPEN_PROBES:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise BreakerOpen(self.name)
+                self._probes += 1
+
+    def record(self, ok: bool, seconds: float):
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not ok:
+                    self._trip(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= BREAKER_HALF_OPEN_PROBES:
+                        self._transition(CLOSED)
+                return
+            if self._state == OPEN:
+                return  # a call that started before the breaker opened
+
+            self._calls.append((now, ok, seconds))
+            while self._calls and now - self._calls[0][0] > BREAKER_WINDOW_SECONDS:
+                self._calls.popleft()
+            n = len(self._calls)
+            if n < BREAKER_MIN_CALLS:
+                return
+            failures = sum(1 for _, c_ok, _ in self._calls if not c_ok)
+            slow = sum(1 for _, _, s in self._calls if s >= BREAKER_SLOW_CALL_SECONDS)
+            if failures / n >= BREAKER_FAILURE_RATE or slow / n >= BREAKER_SLOW_CALL_RATE:
+                self._trip(now)
+
+    def percentile(self, q: float) -> float | None:
+        """Latency quantile of recent successful calls, None until there are enough."""
+        with self._lock:
+            latencies = sorted(s for _, ok, s in self._calls if ok)
+        if len(latencies) < BREAKER_MIN_CALLS:
+            return None
+        return latencies[int(q * (len(latencies) - 1))]
+
+    def timeout(self) -> float:
+        """Timeout for the next call, from the p99 of recent successful calls."""
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return TIMEOUT_MAX_SECONDS
+        return min(max(p99 * TIMEOUT_P99_MULTIPLIER, TIMEOUT_MIN_SECONDS), TIMEOUT_MAX_SECONDS)
+
+
+class RetryBudget:
+    """
+    Token bucket for extra attempts: every primary request deposits `ratio`
+    tokens, every hedge/retry spends one, plus a trickle of `min_per_second`
+    so low-traffic periods can still hedge.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, capacity: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.min_per_second)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+BREAKERS = {
+    name: CircuitBreaker(name)
+    for name in ("restaurant", "payment", "delivery", "notification", "customer")
+}
+
+RETRY_BUDGET = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND)
+
+_client = traced_client(httpx.Client(limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)))
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_MAX_THREADS, thread_name_prefix="hedge")
+
+
+def call(downstream: str, method: str, url: str, deadline: Deadline,
+         max_timeout: float | None = None, headers: dict | None = None,
+         fixed_timeout: float | None = None, **kwargs) -> httpx.Response:
+    """
+    One request to `downstream` through its breaker. Raises BreakerOpen,
+    DeadlineExceeded or httpx.HTTPError; 5xx responses count as breaker failures.
+    `fixed_timeout` replaces the adaptive timeout (still capped by the deadline).
+    """
+    breaker = BREAKERS[downstream]
+    if fixed_timeout is not None:
+        cap = fixed_timeout
+    else:
+        cap = breaker.timeout() if max_timeout is None else min(max_timeout, breaker.timeout())
+    timeout = deadline.timeout(cap)
+    breaker.acquire()
+    headers = {**(headers or {}), DEADLINE_HEADER: str(int(deadline.remaining() * 1000))}
+    start = time.perf_counter()
+    ok = False
+    try:
+        resp = _client.request(method, url, headers=headers, timeout=timeout, **kwargs)
+        ok = resp.status_code < 500
+        return resp
+    finally:
+        breaker.record(ok, time.perf_counter() - start)
+
+
+def _submit(fn, *args, **kwargs):
+    # Carry the caller's context (trace span) into the pool thread.
+    return _hedge_pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def get(downstream: str, url: str, deadline: Deadline, **kwargs) -> httpx.Response:
+    """
+    Idempotent GET through call(). With HEDGE_REQUESTS on, a second attempt is
+    sent once the first has taken longer than the downstream's recent p95 and
+    the retry budget allows it; whichever succeeds first is returned.
+    """
+    RETRY_BUDGET.deposit()
+    if not HEDGE_REQUESTS:
+        return call(downstream, "GET", url, deadline, **kwargs)
+
+    delay = BREAKERS[downstream].percentile(0.95) or HEDGE_DEFAULT_DELAY_SECONDS
+    primary = _submit(call, downstream, "GET", url, deadline, **kwargs)
+    done, _ = wait([primary], timeout=min(delay, max(deadline.remaining(), 0)))
+    if done:
+        HEDGED_REQUESTS.labels(downstream, "not_needed").inc()
+        return primary.result()
+    if deadline.remaining() <= 0 or not RETRY_BUDGET.try_spend():
+        HEDGED_REQUESTS.labels(downstream, "budget_exhausted").inc()
+        return primary.result()
+
+    hedge = _submit(call, downstream, "GET", url, deadline, **kwargs)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                HEDGED_REQUESTS.labels(downstream, "primary_won" if fut is primary else "hedge_won").inc()
+                return fut.result()
+    HEDGED_REQUESTS.labels(downstream, "both_failed").inc()
+    return primary.result()  # raises the primary's error
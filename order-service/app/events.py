@@ -0,0 +1,210 @@
+# order-service/app/events.py
+# Order/delivery status events for the SSE stream (routers/order_events.py).
+#
+# On Postgres, publish() is a pg_notify on ORDER_EVENTS_CHANNEL and every
+# worker process runs one listener thread (its own connection doing LISTEN),
+# so a subscriber on any worker or replica sees every transition. Elsewhere
+# (SQLite, ORDER_EVENTS_BACKEND=memory) events only fan out inside the
+# publishing process.
+#
+# Given the caller's session, events ride on its transaction: pg_notify runs
+# in it (Postgres delivers NOTIFYs at commit and drops them on rollback), and
+# in-process dispatch waits for its commit. So no extra connection, and no
+# event for a change that never committed.
+#
+# Each subscriber gets a bounded queue; when a slow client falls behind, the
+# oldest event is dropped. Events carry the full current status, so a client
+# never needs the ones it missed.
+#
+#   ORDER_EVENTS_BACKEND      auto | postgres | memory
+#   ORDER_EVENTS_CHANNEL      NOTIFY channel name
+#   ORDER_EVENTS_QUEUE_SIZE   per-connection buffer
+
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from prometheus_client import Counter, Gauge
+from sqlalchemy import event as sa_event, text
+from sqlalchemy.orm import Session
+from app.database import DATABASE_URL, engine
+
+log = logging.getLogger("order-service.events")
+
+ORDER_EVENTS_BACKEND    = os.getenv("ORDER_EVENTS_BACKEND", "auto").lower()
+ORDER_EVENTS_CHANNEL    = os.getenv("ORDER_EVENTS_CHANNEL", "order_events")
+ORDER_EVENTS_QUEUE_SIZE = int(os.getenv("ORDER_EVENTS_QUEUE_SIZE", "64"))
+
+EVENTS_PUBLISHED = Counter(
+    "order_service_events_published_total",
+    "Status events published",
+    ["event"],
+)
+EVENTS_DROPPED = Counter(
+    "order_service_events_dropped_total",
+    "Events dropped because a subscriber's queue was full",
+)
+SUBSCRIBERS = Gauge(
+    "order_service_event_subscribers",
+    "Open event-stream connections",
+    multiprocess_mode="livesum",
+)
+
+_use_pg = ORDER_EVENTS_BACKEND == "postgres" or (
+    ORDER_EVENTS_BACKEND == "auto" and engine.dialect.name == "postgresql"
+)
+_loop: asyncio.AbstractEventLoop | None = None
+_subscribers: dict[int, set[asyncio.Queue]] = {}
+_stop = threading.Event()
+_listener: threading.Thread | None = None
+
+
+# ---------- Subscribers (event loop only) ----------
+
+def subscribe(order_id: int) -> asyncio.Queue:
+    q: asyncio.Queue = asyncio.Queue(maxsize=ORDER_EVENTS_QUEUE_SIZE)
+    _subscribers.setdefault(order_id, set()).add(q)
+    SUBSCRIBERS.inc()
+    return q
+
+
+def unsubscribe(order_id: int, q: asyncio.Queue):
+    subs = _subscribers.get(order_id)
+    if subs is not None:
+        subs.discard(q)
+        if not subs:
+            del _subscribers[order_id]
+    SUBSCRIBERS.dec()
+
+
+def _dispatch(event: dict):
+    for q in _subscribers.get(event.get("order_id"), ()):
+        if q.full():
+            q.get_nowait()
+            EVENTS_DROPPED.inc()
+        q.put_nowait(event)
+
+
+def _dispatch_threadsafe(event: dict):
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_dispatch, event)
+
+
+# ---------- Publishing (any thread) ----------
+
+# Session.info key for events waiting on the session's commit (memory backend)
+_PENDING = "order_events.pending"
+
+# One statement for any number of events
+_NOTIFY = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"
+)
+
+
+def _notify(conn, batch: list[dict]):
+    conn.execute(_NOTIFY, {"channel": ORDER_EVENTS_CHANNEL,
+                           "payloads": [json.dumps(e, default=str) for e in batch]})
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _flush_pending(session):
+    for e in session.info.pop(_PENDING, ()):
+        _dispatch_threadsafe(e)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(_PENDING, None)
+
+
+def publish_many(batch: list[dict], db: Session | None = None):
+    """
+    Broadcast {"event": ..., "order_id": ..., ...} events. With `db` they go
+    out when its transaction commits (call before commit); without it, in one
+    short transaction of their own, best effort.
+    """
+    for e in batch:
+        EVENTS_PUBLISHED.labels(e["event"]).inc()
+    if not _use_pg:
+        if db is not None:
+            db.connection()  # begin, so a rollback before commit drops them
+            db.info.setdefault(_PENDING, []).extend(batch)
+        else:
+            for e in batch:
+                _dispatch_threadsafe(e)
+        return
+    if db is not None:
+        _notify(db, batch)  # part of the caller's transaction, so its errors are too
+        return
+    try:
+        with engine.begin() as conn:
+            _notify(conn, batch)
+    except Exception as exc:
+        log.warning("pg_notify failed, events only delivered locally: %s", exc)
+        for e in batch:
+            _dispatch_threadsafe(e)
+
+
+def publish(event: dict, db: Session | None = None):
+    publish_many([event], db)
+
+
+def publish_order(order, db: Session | None = None):
+    publish({
+        "event": "order_status",
+        "order_id": order.order_id,
+        "order_status": order.order_status,
+        "payment_status": order.payment_status,
+    }, db)
+
+
+# ---------- LISTEN thread (Postgres) ----------
+
+def _listen():
+    import psycopg2
+    backoff = 1.0
+    while not _stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN "{ORDER_EVENTS_CHANNEL}"')
+            backoff = 1.0
+            while not _stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        _dispatch_threadsafe(json.loads(note.payload))
+                    except ValueError:
+                        log.warning("Ignoring malformed event payload")
+        except Exception as exc:
+            log.warning("Event listener disconnected, retrying in %.0fs: %s", backoff, exc)
+            _stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def start():
+    """Bind to the running event loop and, on Postgres, start the listener."""
+    global _loop, _listener
+    _loop = asyncio.get_running_loop()
+    if _use_pg and _listener is None:
+        _stop.clear()
+        _listener = threading.Thread(target=_listen, name="order-events-listener", daemon=True)
+        _listener.start()
+
+
+def stop():
+    global _listener
+    _stop.set()
+    if _listener is not None:
+        _listener.join(timeout=2)
+        _listener = None
@@ -0,0 +1,216 @@
+# order-service/app/idempotency.py
+# Idempotency-Key handling for place_order.
+#
+# The first request with a key claims it (INSERT ... ON CONFLICT DO NOTHING
+# into order_idempotency_keys, status IN_PROGRESS with a lease) and runs the
+# saga; its response is stored when it finishes. A retry with the same key
+# and body costs one primary-key lookup and gets the stored response back.
+# A duplicate that arrives while the first is still running waits for it:
+# on a threading.Event when both are in this process, by polling the row
+# otherwise. If the first request died, its lease runs out and the next
+# retry takes the key over.
+#
+# 4xx outcomes are stored like successes (the same request would fail the
+# same way). 5xx and crashes release the key so a retry runs again, unless
+# the order row was already written (attach_order, in the same transaction
+# as the order): from then on every outcome is stored, since re-running would
+# create a second order. A request that takes over such a key resumes that
+# order's saga instead of starting a new one.
+#
+#   ORDER_IDEMPOTENCY_LOCK_SECONDS   lease of an in-flight request before takeover
+#   ORDER_IDEMPOTENCY_POLL_SECONDS   how often waiters in other processes re-read the row
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from prometheus_client import Counter
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import SessionLocal
+from app.models import OrderIdempotencyKey
+
+ORDER_IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("ORDER_IDEMPOTENCY_LOCK_SECONDS", "30"))
+ORDER_IDEMPOTENCY_POLL_SECONDS = float(os.getenv("ORDER_IDEMPOTENCY_POLL_SECONDS", "0.05"))
+
+IDEMPOTENCY_OUTCOMES = Counter(
+    "order_service_idempotency_total",
+    "place_order Idempotency-Key handling (claimed, replayed, waited, takeover, in_progress, mismatch)",
+    ["outcome"],
+)
+
+IN_PROGRESS, COMPLETED = "IN_PROGRESS", "COMPLETED"
+
+# key -> Event set when this process finishes the request holding the key
+_inflight: dict[str, threading.Event] = {}
+_inflight_lock = threading.Lock()
+
+
+class KeyReused(Exception):
+    """The key was first used with a different request body."""
+
+
+class StillInProgress(Exception):
+    """The original request with this key did not finish within our wait."""
+
+
+class ClaimLost(Exception):
+    """Our lease ran out and another request took the key over."""
+
+
+@dataclass
+class Claim:
+    key: str
+    lease_id: str
+    order_id: int | None = None  # set once the order row is committed
+
+
+@dataclass
+class Stored:
+    status_code: int
+    body: dict
+
+
+def request_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _insert(db):
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(OrderIdempotencyKey)
+    if name == "sqlite":
+        return sqlite.insert(OrderIdempotencyKey)
+    raise RuntimeError(f"order idempotency needs Postgres or SQLite, not {name}")
+
+
+def _claimed(key: str, lease_id: str, order_id: int | None = None) -> Claim:
+    with _inflight_lock:
+        _inflight[key] = threading.Event()
+    return Claim(key, lease_id, order_id)
+
+
+def _try_claim(key: str, req_hash: str, row: OrderIdempotencyKey | None) -> Claim | None:
+    """Insert a new key, or take over `row` if its lease ran out."""
+    lease_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=ORDER_IDEMPOTENCY_LOCK_SECONDS)
+    with SessionLocal() as db:
+        if row is None:
+            won = db.execute(
+                _insert(db).values(key=key, request_hash=req_hash, status=IN_PROGRESS,
+                                   lease_id=lease_id, locked_until=locked_until, created_at=now)
+                .on_conflict_do_nothing()
+                .returning(OrderIdempotencyKey.key)
+            ).first() is not None
+        else:
+            won = db.execute(
+                update(OrderIdempotencyKey)
+                .where(OrderIdempotencyKey.key == key,
+                       OrderIdempotencyKey.status == IN_PROGRESS,
+                       OrderIdempotencyKey.lease_id == row.lease_id)
+                .values(lease_id=lease_id, locked_until=locked_until)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+        db.commit()
+    if not won:
+        return None
+    IDEMPOTENCY_OUTCOMES.labels("claimed" if row is None else "takeover").inc()
+    # A takeover of a request that died after inserting its order keeps the
+    # order_id: the caller must finish that order, not place another
+    return _claimed(key, lease_id, row.order_id if row is not None else None)
+
+
+def begin(key: str, req_hash: str, wait_seconds: float) -> Claim | Stored:
+    """
+    Claim `key` for this request, or return the stored response of the
+    request that already used it. Waits up to `wait_seconds` for one that is
+    still running. Raises KeyReused or StillInProgress. A Claim that already
+    carries an order_id was taken over from a request that died after
+    creating that order.
+    """
+    give_up = time.monotonic() + max(wait_seconds, 0)
+    waited = False
+    while True:
+        with SessionLocal() as db:
+            row = db.get(OrderIdempotencyKey, key)
+        if row is not None and row.request_hash != req_hash:
+            IDEMPOTENCY_OUTCOMES.labels("mismatch").inc()
+            raise KeyReused(key)
+        if row is not None and row.status == COMPLETED:
+            IDEMPOTENCY_OUTCOMES.labels("waited" if waited else "replayed").inc()
+            return Stored(row.response_code, json.loads(row.response_body))
+        if row is None or row.locked_until is None or row.locked_until <= datetime.utcnow():
+            claim = _try_claim(key, req_hash, row)
+            if claim is not None:
+                return claim
+            continue  # someone else claimed or took over first; look again
+
+        # In progress elsewhere: wait for it to finish or its lease to run out
+        left = give_up - time.monotonic()
+        if left <= 0:
+            IDEMPOTENCY_OUTCOMES.labels("in_progress").inc()
+            raise StillInProgress(key)
+        waited = True
+        lease_left = (row.locked_until - datetime.utcnow()).total_seconds()
+        with _inflight_lock:
+            event = _inflight.get(key)
+        if event is not None:
+            event.wait(min(left, max(lease_left, 0)))
+        else:
+            time.sleep(min(left, max(lease_left, 0), ORDER_IDEMPOTENCY_POLL_SECONDS))
+
+
+def _finish(claim: Claim, stmt):
+    try:
+        with SessionLocal() as db:
+            db.execute(
+                stmt.where(OrderIdempotencyKey.key == claim.key,
+                           OrderIdempotencyKey.lease_id == claim.lease_id)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+    finally:
+        with _inflight_lock:
+            event = _inflight.pop(claim.key, None)
+        if event is not None:
+            event.set()
+
+
+def attach_order(db, claim: Claim, order_id: int):
+    """
+    Link the key to `order_id` in the caller's transaction, which must be the
+    one inserting the order: both commit or neither does. Raises ClaimLost if
+    our lease was taken over, so the caller rolls the order back. The caller
+    sets claim.order_id once it has committed.
+    """
+    linked = db.execute(
+        update(OrderIdempotencyKey)
+        .where(OrderIdempotencyKey.key == claim.key,
+               OrderIdempotencyKey.lease_id == claim.lease_id)
+        .values(order_id=order_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if linked != 1:
+        raise ClaimLost(claim.key)
+
+
+def complete(claim: Claim, status_code: int, body: dict):
+    """Store the response for replays (no-op if our lease was taken over)."""
+    _finish(claim, update(OrderIdempotencyKey).values(
+        status=COMPLETED,
+        response_code=status_code,
+        response_body=json.dumps(body, default=str),
+        order_id=claim.order_id or body.get("order_id"),
+        lease_id=None,
+        locked_until=None,
+    ))
+
+
+def release(claim: Claim):
+    """Forget the key so a retry runs the request again."""
+    _finish(claim, delete(OrderIdempotencyKey))
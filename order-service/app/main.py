@@ -1,10 +1,11 @@
 # order-service/app/main.py
-from fastapi import FastAPI, Request, Response
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from fastapi import FastAPI, Response
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST
+from app.metrics import MetricsMiddleware, latency_buckets, mark_worker_dead, render_metrics
+from app.tracing import setup_tracing
 from sqlalchemy import text
-from app.database import engine
+from app.database import create_schema, engine, read_engine, ReadYourWritesMiddleware
 from app.models import Base
-import time, uuid
 import logging
 import os
 
@@ -13,8 +14,14 @@ log = logging.getLogger("order-service")
 app = FastAPI(title="order-service", version="1.0.0")
 
 # Routers
-from app.routers import orders  # noqa: E402
+from app.routers import orders, customer_orders, order_events, analytics, exports  # noqa: E402
+from app import events, reconcile  # noqa: E402
+app.include_router(exports.router)  # before orders: /v1/orders/export.arrow vs /{order_id}
 app.include_router(orders.router)
+app.include_router(customer_orders.router)
+app.include_router(order_events.router)
+app.include_router(order_events.internal_router)
+app.include_router(analytics.router)
 
 # Metrics
 REQUEST_COUNT = Counter(
@@ -26,20 +33,26 @@ REQUEST_LATENCY = Histogram(
     "order_service_http_request_latency_seconds",
     "Request latency",
     ["method", "path"],
+    buckets=latency_buckets(),
 )
+REQUESTS_IN_FLIGHT = Gauge(
+    "order_service_http_requests_in_flight",
+    "Requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+# Correlation ID + metrics (pure ASGI, labelled by route template)
+app.add_middleware(
+    MetricsMiddleware,
+    request_count=REQUEST_COUNT,
+    request_latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+)
+# Read-your-writes routing for ReadSessionLocal (no-op without DATABASE_READ_URL)
+app.add_middleware(ReadYourWritesMiddleware)
 
-# Correlation ID + metrics middleware
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next):
-    corr = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-    start = time.time()
-    response: Response = await call_next(request)
-    duration = time.time() - start
-    path = request.url.path
-    REQUEST_COUNT.labels(request.method, path, str(response.status_code)).inc()
-    REQUEST_LATENCY.labels(request.method, path).observe(duration)
-    response.headers["X-Correlation-ID"] = corr
-    return response
+# Tracing (W3C traceparent in/out; exporter chosen by TRACING_EXPORTER)
+setup_tracing(app, "order-service", engines=[engine, read_engine])
 
 @app.get("/health")
 async def health():
@@ -47,7 +60,7 @@ async def health():
 
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 
 def _repair_pg_sequences():
@@ -79,6 +92,25 @@ def _repair_pg_sequences():
 
 @app.on_event("startup")
 def on_startup():
-    # Create tables and (best-effort) repair the orders sequence.
-    Base.metadata.create_all(bind=engine)
+    # Create tables/indexes and (best-effort) repair the orders sequence.
+    create_schema(Base.metadata)
     _repair_pg_sequences()
+
+
+@app.on_event("startup")
+async def start_events():
+    # Fan-out for the status stream (plus the LISTEN thread on Postgres)
+    events.start()
+
+
+@app.on_event("startup")
+def start_reconciler():
+    # Settles orders left PAYMENT_PENDING by a charge with an unknown outcome
+    reconcile.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    events.stop()
+    reconcile.stop()
+    mark_worker_dead()
@@ -0,0 +1,88 @@
+# app/metrics.py
+# Correlation ID + HTTP metrics as a plain ASGI middleware.
+#
+# BaseHTTPMiddleware / @app.middleware("http") wraps every request in extra
+# tasks and memory streams; a raw ASGI callable only intercepts send().
+# Requests are labelled by the matched route template (/v1/orders/{order_id})
+# rather than the raw URL, so label cardinality stays bounded.
+
+import os
+import time
+import uuid
+from prometheus_client import CollectorRegistry, REGISTRY, generate_latest, multiprocess
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label for requests that matched no route (404s, scanners, ...).
+UNMATCHED_PATH = "<unmatched>"
+
+
+def latency_buckets() -> tuple[float, ...]:
+    """Histogram buckets from HTTP_LATENCY_BUCKETS (comma-separated seconds)."""
+    raw = os.getenv("HTTP_LATENCY_BUCKETS", "").strip()
+    if not raw:
+        return DEFAULT_LATENCY_BUCKETS
+    return tuple(sorted(float(b) for b in raw.split(",") if b.strip()))
+
+
+def render_metrics() -> bytes:
+    """
+    Exposition for /metrics. Under several workers (app/serve.py sets
+    PROMETHEUS_MULTIPROC_DIR) every process writes to shared mmap files, so
+    aggregate those instead of answering with this worker's registry only.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_worker_dead():
+    """Drop this worker's live gauge files on shutdown (multiprocess mode only)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    def __init__(self, app, request_count, request_latency, in_flight):
+        self.app = app
+        self.request_count = request_count
+        self.request_latency = request_latency
+        self.in_flight = in_flight
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        corr = None
+        for name, value in scope["headers"]:
+            if name == b"x-correlation-id":
+                corr = value
+                break
+        if corr is None:
+            corr = str(uuid.uuid4()).encode()
+
+        status = 500  # if the app raises before starting a response
+
+        async def send_with_correlation(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-correlation-id", corr)]
+            await send(message)
+
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_correlation)
+        finally:
+            duration = time.perf_counter() - start
+            self.in_flight.dec()
+            # The router stores the matched route in the (shared) scope.
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_PATH
+            method = scope["method"]
+            self.request_count.labels(method, path, str(status)).inc()
+            self.request_latency.labels(method, path).observe(duration)
@@ -1,7 +1,7 @@
 # order-service/app/models.py
-from datetime import datetime
+from datetime import date, datetime
 from sqlalchemy.orm import declarative_base, relationship, Mapped, mapped_column
-from sqlalchemy import String, Integer, Float, Boolean, ForeignKey, DateTime, Identity
+from sqlalchemy import String, Integer, Float, Boolean, ForeignKey, Date, DateTime, Identity, Index, Text
 
 Base = declarative_base()
 
@@ -54,6 +54,15 @@ class Order(Base):
 
     items: Mapped[list["OrderItem"]] = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+# "My orders": newest first per customer, order_id as the keyset tie-breaker.
+Index("ix_orders_customer_created", Order.customer_id, Order.created_at.desc(), Order.order_id)
+# Exports (app/export.py) scan by creation time.
+Index("ix_orders_created", Order.created_at, Order.order_id)
+# Payment reconciler (app/reconcile.py): the few orders still waiting on a charge.
+_payment_pending = Order.order_status == "PAYMENT_PENDING"
+Index("ix_orders_payment_pending", Order.order_id,
+      postgresql_where=_payment_pending, sqlite_where=_payment_pending)
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[int]        = mapped_column(Integer, Identity(always=False), primary_key=True)
@@ -64,3 +73,26 @@ class OrderItem(Base):
 
     order: Mapped["Order"] = relationship("Order", back_populates="items")
 
+# place_order replay store (app/idempotency.py): one row per Idempotency-Key.
+class OrderIdempotencyKey(Base):
+    __tablename__ = "order_idempotency_keys"
+    key: Mapped[str]               = mapped_column(String(64), primary_key=True)
+    request_hash: Mapped[str]      = mapped_column(String(64), nullable=False)
+    status: Mapped[str]            = mapped_column(String(20), nullable=False, default="IN_PROGRESS")  # IN_PROGRESS | COMPLETED
+    lease_id: Mapped[str]          = mapped_column(String(36), nullable=True)
+    locked_until: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    response_code: Mapped[int]     = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str]     = mapped_column(Text, nullable=True)  # JSON
+    order_id: Mapped[int]          = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime]   = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+# Orders and revenue per (day, restaurant, city, status), kept current by
+# app/analytics.py so dashboards read buckets instead of scanning orders.
+class OrderDailyStat(Base):
+    __tablename__ = "order_daily_stats"
+    day: Mapped[date]           = mapped_column(Date, primary_key=True)
+    restaurant_id: Mapped[int]  = mapped_column(Integer, primary_key=True)
+    city: Mapped[str]           = mapped_column(String(80), primary_key=True)  # "" when unknown
+    order_status: Mapped[str]   = mapped_column(String(40), primary_key=True)
+    order_count: Mapped[int]    = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float]      = mapped_column(Float, nullable=False, default=0.0)
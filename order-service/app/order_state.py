@@ -0,0 +1,143 @@
+# order-service/app/order_state.py
+# Order status state machine.
+#
+# Every change of orders.order_status goes through transition(): one
+#   UPDATE orders SET ... WHERE order_id = :id AND order_status = :expected RETURNING ...
+# so two concurrent writers can't both move the same order, and the loser
+# learns the status it lost to. Without an expected status the statement
+# locks the row, reads its old status and checks it against the target's
+# allowed predecessors itself:
+#   UPDATE orders SET ... FROM (SELECT order_status AS old ... FOR UPDATE) prev
+#   WHERE ... AND prev.old IN (:predecessors) RETURNING ..., prev.old
+# The analytics buckets move in the same transaction.
+
+from sqlalchemy import select, update
+from app import analytics, events
+from app.models import Order
+
+# Status a new order is inserted with
+INITIAL_STATUS = "PENDING"
+
+TRANSITIONS: dict[str, set[str]] = {
+    "PENDING":         {"PAYMENT_PENDING", "CONFIRMED", "PAYMENT_FAILED", "CANCELLED"},
+    "CREATED":         {"PAYMENT_PENDING", "CONFIRMED", "PAYMENT_FAILED", "CANCELLED"},  # seeded orders
+    "PAYMENT_PENDING": {"CONFIRMED", "PAYMENT_FAILED", "CANCELLED"},
+    "CONFIRMED":       {"PREPARING", "CANCELLED"},
+    "PREPARING":       {"READY", "CANCELLED"},
+    "READY":           {"DISPATCHED", "CANCELLED"},
+    "DISPATCHED":      {"DELIVERED"},
+    "DELIVERED":       set(),
+    "CANCELLED":       set(),
+    "PAYMENT_FAILED":  set(),
+}
+STATUSES = frozenset(TRANSITIONS)
+
+# Reached only through the payment flow (place_order / payment callback)
+PAYMENT_DRIVEN = frozenset({"PAYMENT_PENDING", "CONFIRMED", "PAYMENT_FAILED"})
+
+
+class OrderNotFound(Exception):
+    pass
+
+
+class TransitionConflict(Exception):
+    """The order is not in a status the requested transition can start from."""
+
+    def __init__(self, current: str, target: str):
+        super().__init__(f"Cannot move order from {current} to {target}")
+        self.current = current
+        self.target = target
+
+
+def can_transition(current: str, target: str) -> bool:
+    return target in TRANSITIONS.get(current, ())
+
+
+# target -> statuses it can be reached from
+PREDECESSORS: dict[str, frozenset[str]] = {
+    target: frozenset(s for s, targets in TRANSITIONS.items() if target in targets)
+    for target in TRANSITIONS
+}
+
+_RETURNING = (Order.order_id, Order.order_status, Order.payment_status,
+              Order.order_total, Order.address_city, Order.restaurant_id, Order.created_at)
+
+
+def _update_from_any(db, order_id: int, target: str, values: dict):
+    """
+    Single-statement transition from whatever status the order is in, if the
+    target allows it. Returns (row, old_status) or None when nothing matched.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        # SQLite can't RETURNING from an UPDATE ... FROM table (and has no
+        # FOR UPDATE); its writers are serialised anyway, so read first
+        old = db.execute(select(Order.order_status).where(Order.order_id == order_id)).scalar_one_or_none()
+        if old not in PREDECESSORS[target]:
+            return None
+        row = db.execute(
+            update(Order)
+            .where(Order.order_id == order_id, Order.order_status == old)
+            .values(**values)
+            .returning(*_RETURNING)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        return (row, old) if row is not None else None
+
+    prev = (
+        select(Order.order_id, Order.order_status.label("old"))
+        .where(Order.order_id == order_id)
+        .with_for_update()
+        .subquery("prev")
+    )
+    row = db.execute(
+        update(Order)
+        .where(Order.order_id == prev.c.order_id, prev.c.old.in_(sorted(PREDECESSORS[target])))
+        .values(**values)
+        .returning(*_RETURNING, prev.c.old)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    return (row, row.old) if row is not None else None
+
+
+def transition(db, order_id: int, target: str, expected: str | None = None,
+               payment_status: str | None = None):
+    """
+    Move an order to `target` (optionally setting payment_status) and commit.
+
+    With `expected`, only from that status (compare-and-set). Without it from
+    any status the target can follow, read and checked in the same statement
+    (see _update_from_any). Raises OrderNotFound or TransitionConflict;
+    publishes an order_status event on success and returns the updated row
+    (order_id, order_status, payment_status, order_total, address_city,
+    restaurant_id, created_at).
+    """
+    if expected is not None and not can_transition(expected, target):
+        raise ValueError(f"{expected} -> {target} is not a valid transition")
+
+    values = {"order_status": target}
+    if payment_status is not None:
+        values["payment_status"] = payment_status
+    if expected is None:
+        matched = _update_from_any(db, order_id, target, values)
+        order, expected = matched if matched is not None else (None, None)
+    else:
+        order = db.execute(
+            update(Order)
+            .where(Order.order_id == order_id, Order.order_status == expected)
+            .values(**values)
+            .returning(*_RETURNING)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+
+    if order is None:
+        db.rollback()
+        # Error path only: find out why nothing matched
+        current = db.execute(select(Order.order_status).where(Order.order_id == order_id)).scalar_one_or_none()
+        if current is None:
+            raise OrderNotFound(order_id)
+        raise TransitionConflict(current, target)
+
+    analytics.record_transition(db, order, expected)
+    events.publish_order(order, db)  # sent when the commit lands
+    db.commit()
+    return order
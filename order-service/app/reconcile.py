@@ -0,0 +1,148 @@
+# order-service/app/reconcile.py
+# Settles PAYMENT_PENDING orders that nothing else will settle.
+#
+# When the synchronous charge call times out (or the connection drops) after
+# the request was sent, payment-service may still have captured the money, so
+# place_order leaves the order PAYMENT_PENDING with payment_status UNKNOWN
+# instead of failing it. Async captures (payment_status PENDING) are settled
+# by payment_callback, but payment-service abandons a callback after
+# PAYMENT_CALLBACK_MAX_ATTEMPTS; once such an order has waited
+# PAYMENT_RECONCILE_ASYNC_AFTER_SECONDS it is swept too. A background thread
+# per process looks these orders up in payment-service
+# (GET /v1/payments?order_id=...) and settles them:
+#   - a SUCCESS payment     -> CONFIRMED, then delivery assignment + notice
+#   - a FAILED payment      -> PAYMENT_FAILED
+#   - nothing after PAYMENT_RECONCILE_GIVE_UP_SECONDS -> PAYMENT_FAILED
+# Settling is a compare-and-set from PAYMENT_PENDING, so replicas running the
+# same sweep never apply (or dispatch) an order twice.
+#
+#   PAYMENT_RECONCILE_INTERVAL_SECONDS  sweep interval (0 disables the thread)
+#   PAYMENT_RECONCILE_ASYNC_AFTER_SECONDS  age after which an async capture is swept
+#   PAYMENT_RECONCILE_GIVE_UP_SECONDS   age after which an order with no payment fails
+#   PAYMENT_RECONCILE_BATCH             orders looked up per sweep
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+import httpx
+from prometheus_client import Counter
+from sqlalchemy import or_, select
+from app import downstream, order_state
+from app.database import SessionLocal
+from app.downstream import BreakerOpen, Deadline, DeadlineExceeded
+from app.models import Order
+
+log = logging.getLogger("order-service.reconcile")
+
+PAYMENT_URL = os.getenv("PAYMENT_SERVICE_URL", "http://payment-service:80")
+
+PAYMENT_RECONCILE_INTERVAL_SECONDS    = float(os.getenv("PAYMENT_RECONCILE_INTERVAL_SECONDS", "30"))
+PAYMENT_RECONCILE_ASYNC_AFTER_SECONDS = float(os.getenv("PAYMENT_RECONCILE_ASYNC_AFTER_SECONDS", "600"))
+PAYMENT_RECONCILE_GIVE_UP_SECONDS     = float(os.getenv("PAYMENT_RECONCILE_GIVE_UP_SECONDS", "900"))
+PAYMENT_RECONCILE_BATCH               = int(os.getenv("PAYMENT_RECONCILE_BATCH", "100"))
+
+# payment_status of an order whose charge may or may not have happened
+UNKNOWN = "UNKNOWN"
+# payment_status of an order waiting for its async capture callback
+PENDING = "PENDING"
+
+RECONCILED = Counter(
+    "order_service_payment_reconciled_total",
+    "Orders with an unknown charge outcome settled by the reconciler",
+    ["outcome"],  # confirmed | failed | gave_up
+)
+
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def _payments_by_order(order_ids: list[int]) -> dict[int, set[str]]:
+    """Payment statuses recorded by payment-service for each order."""
+    found: dict[int, set[str]] = {}
+    cursor = None
+    while True:
+        params = {"order_id": order_ids, "page_size": 500}
+        if cursor:
+            params["cursor"] = cursor
+        resp = downstream.get("payment", f"{PAYMENT_URL}/v1/payments",
+                              Deadline(downstream.ORDER_DEADLINE_SECONDS), params=params)
+        resp.raise_for_status()
+        body = resp.json()
+        for p in body["items"]:
+            found.setdefault(p["order_id"], set()).add(p["status"])
+        cursor = body.get("next_cursor")
+        if not cursor:
+            return found
+
+
+def _settle(order_id: int, target: str, payment_status: str, outcome: str):
+    from app.routers.orders import _dispatch_confirmed  # the router imports this module
+
+    with SessionLocal() as db:
+        try:
+            row = order_state.transition(db, order_id, target, expected="PAYMENT_PENDING",
+                                         payment_status=payment_status)
+        except (order_state.TransitionConflict, order_state.OrderNotFound):
+            return  # settled elsewhere (another replica, or cancelled)
+    RECONCILED.labels(outcome).inc()
+    if row.order_status == "CONFIRMED":
+        _dispatch_confirmed(row.order_id, row.address_city, Deadline(downstream.ORDER_DEADLINE_SECONDS), {})
+
+
+def reconcile_once() -> int:
+    """One sweep over unsettled PAYMENT_PENDING orders; returns how many were looked at."""
+    async_before = datetime.utcnow() - timedelta(seconds=PAYMENT_RECONCILE_ASYNC_AFTER_SECONDS)
+    with SessionLocal() as db:
+        pending = db.execute(
+            select(Order.order_id, Order.created_at)
+            .where(Order.order_status == "PAYMENT_PENDING",
+                   or_(Order.payment_status == UNKNOWN,
+                       (Order.payment_status == PENDING) & (Order.created_at < async_before)))
+            .order_by(Order.order_id)
+            .limit(PAYMENT_RECONCILE_BATCH)
+        ).all()
+    if not pending:
+        return 0
+
+    payments: dict[int, set[str]] = {}
+    ids = [order_id for order_id, _ in pending]
+    for i in range(0, len(ids), 100):  # payment-service takes up to 100 order_ids per call
+        payments.update(_payments_by_order(ids[i:i + 100]))
+
+    give_up_before = datetime.utcnow() - timedelta(seconds=PAYMENT_RECONCILE_GIVE_UP_SECONDS)
+    for order_id, created_at in pending:
+        statuses = payments.get(order_id, set())
+        if "SUCCESS" in statuses:
+            _settle(order_id, "CONFIRMED", "SUCCESS", "confirmed")
+        elif statuses:
+            _settle(order_id, "PAYMENT_FAILED", "FAILED", "failed")
+        elif created_at < give_up_before:
+            log.warning("No payment recorded for order %s, failing it", order_id)
+            _settle(order_id, "PAYMENT_FAILED", "FAILED", "gave_up")
+    return len(pending)
+
+
+def _run():
+    while not _stop.wait(PAYMENT_RECONCILE_INTERVAL_SECONDS):
+        try:
+            reconcile_once()
+        except (httpx.HTTPError, BreakerOpen, DeadlineExceeded) as exc:
+            log.warning("Payment reconcile skipped: %s", exc)
+        except Exception:
+            log.exception("Payment reconcile failed")
+
+
+def start():
+    global _thread
+    if PAYMENT_RECONCILE_INTERVAL_SECONDS <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="payment-reconcile", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread
+    _stop.set()
+    _thread = None
@@ -0,0 +1,91 @@
+# order-service/app/routers/analytics.py
+
+from datetime import date
+from typing import Literal
+from fastapi import APIRouter, Query
+from sqlalchemy import select, func
+from app.database import ReadSessionLocal
+from app.models import OrderDailyStat
+
+# Dashboards: every query reads order_daily_stats buckets, never orders.
+router = APIRouter(prefix="/v1/analytics", tags=["analytics"])
+
+# Statuses whose order_total counts as revenue
+REVENUE_STATUSES = ["CONFIRMED", "PREPARING", "READY", "DISPATCHED", "DELIVERED"]
+
+_GROUP_COLUMNS = {
+    "day": OrderDailyStat.day,
+    "restaurant_id": OrderDailyStat.restaurant_id,
+    "city": OrderDailyStat.city,
+    "order_status": OrderDailyStat.order_status,
+}
+
+
+def _filtered(stmt, date_from, date_to, restaurant_id, city):
+    if date_from:
+        stmt = stmt.where(OrderDailyStat.day >= date_from)
+    if date_to:
+        stmt = stmt.where(OrderDailyStat.day <= date_to)
+    if restaurant_id:
+        stmt = stmt.where(OrderDailyStat.restaurant_id.in_(restaurant_id))
+    if city:
+        stmt = stmt.where(OrderDailyStat.city.in_(city))
+    return stmt
+
+
+@router.get("/revenue", response_model=dict)
+def revenue(
+    group_by: list[Literal["day", "restaurant_id", "city", "order_status"]] = Query(["day"]),
+    date_from: date | None = None,
+    date_to: date | None = Query(None, description="Inclusive"),
+    restaurant_id: list[int] | None = Query(None),
+    city: list[str] | None = Query(None),
+    status: list[str] | None = Query(None, description="Defaults to confirmed-or-later statuses"),
+):
+    """Order count and revenue per bucket, e.g. group_by=restaurant_id&group_by=day."""
+    cols = [_GROUP_COLUMNS[g] for g in dict.fromkeys(group_by)]
+    stmt = select(*cols, func.sum(OrderDailyStat.order_count), func.sum(OrderDailyStat.revenue))
+    stmt = _filtered(stmt, date_from, date_to, restaurant_id, city)
+    stmt = stmt.where(OrderDailyStat.order_status.in_(status or REVENUE_STATUSES))
+    stmt = stmt.group_by(*cols).having(func.sum(OrderDailyStat.order_count) > 0).order_by(*cols)
+
+    with ReadSessionLocal() as db:
+        rows = db.execute(stmt).all()
+
+    keys = list(dict.fromkeys(group_by))
+    return {
+        "group_by": keys,
+        "items": [
+            {**dict(zip(keys, r[:len(keys)])), "orders": r[-2], "revenue": round(r[-1] or 0.0, 2)}
+            for r in rows
+        ],
+    }
+
+
+@router.get("/status-distribution", response_model=dict)
+def status_distribution(
+    date_from: date | None = None,
+    date_to: date | None = Query(None, description="Inclusive"),
+    restaurant_id: list[int] | None = Query(None),
+    city: list[str] | None = Query(None),
+):
+    """How many orders sit in each status (and their share) for the filter."""
+    stmt = select(OrderDailyStat.order_status, func.sum(OrderDailyStat.order_count))
+    stmt = _filtered(stmt, date_from, date_to, restaurant_id, city)
+    stmt = (
+        stmt.group_by(OrderDailyStat.order_status)
+        .having(func.sum(OrderDailyStat.order_count) > 0)
+        .order_by(OrderDailyStat.order_status)
+    )
+
+    with ReadSessionLocal() as db:
+        rows = db.execute(stmt).all()
+
+    total = sum(n for _, n in rows)
+    return {
+        "total": total,
+        "items": [
+            {"order_status": s, "orders": n, "share": round(n / total, 4)}
+            for s, n in rows
+        ],
+    }
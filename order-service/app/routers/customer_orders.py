@@ -0,0 +1,88 @@
+# order-service/app/routers/customer_orders.py
+
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import select, and_, or_
+from app.database import ReadSessionLocal
+from app.models import Order
+import base64
+
+# "My orders" for one customer, served from ix_orders_customer_created.
+router = APIRouter(prefix="/v1/customers/{customer_id}/orders", tags=["orders"])
+
+
+# ---------- Schemas ----------
+
+class CustomerOrderOut(BaseModel):
+    order_id: int
+    restaurant_id: int
+    restaurant_name: str | None = None
+    order_status: str
+    payment_status: str
+    order_total: float
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+# ---------- Keyset cursor ----------
+# Opaque token for the last row of a page: "<created_at iso>|<order_id>".
+
+def _encode_cursor(o: Order) -> str:
+    raw = f"{o.created_at.isoformat()}|{o.order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ---------- Endpoints ----------
+
+@router.get("", response_model=dict)
+def list_customer_orders(
+    customer_id: int,
+    status: list[str] | None = Query(None, description="Filter by order_status (repeatable)"),
+    payment_status: list[str] | None = Query(None, description="Filter by payment_status (repeatable)"),
+    cursor: str | None = None,
+    page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    Newest-first order history for a customer.
+
+    Keyset pagination walks the (customer_id, created_at DESC, order_id) index
+    directly, so deep pages cost the same as the first one and no COUNT is run.
+    Pass `next_cursor` from the previous response to fetch the next page.
+    """
+    stmt = select(Order).where(Order.customer_id == customer_id)
+    if status:
+        stmt = stmt.where(Order.order_status.in_(status))
+    if payment_status:
+        stmt = stmt.where(Order.payment_status.in_(payment_status))
+    if cursor:
+        after_created, after_id = _decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                Order.created_at < after_created,
+                and_(Order.created_at == after_created, Order.order_id > after_id),
+            )
+        )
+
+    # Same column order/direction as the index so Postgres never sorts.
+    stmt = stmt.order_by(Order.created_at.desc(), Order.order_id).limit(page_size + 1)
+
+    with ReadSessionLocal() as db:
+        rows = db.execute(stmt).scalars().all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "items": [CustomerOrderOut.model_validate(o).model_dump(mode="json") for o in rows],
+        "page_size": page_size,
+        "next_cursor": _encode_cursor(rows[-1]) if has_more else None,
+    }
@@ -0,0 +1,24 @@
+# order-service/app/routers/exports.py
+
+from datetime import date
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from app.database import ReadSessionLocal
+from app.export import ARROW_STREAM_MEDIA_TYPE, arrow_stream
+
+# Bulk export for analytics jobs; streamed from a server-side cursor.
+router = APIRouter(prefix="/v1/orders", tags=["exports"])
+
+
+@router.get("/export.arrow")
+def export_orders(
+    date_from: date | None = None,
+    date_to: date | None = Query(None, description="Inclusive"),
+):
+    """Orders by created_at as an Arrow IPC stream (pyarrow.ipc.open_stream)."""
+    filename = f"orders-{date_from or 'all'}-{date_to or 'now'}.arrow"
+    return StreamingResponse(
+        arrow_stream(ReadSessionLocal, "orders", date_from, date_to),
+        media_type=ARROW_STREAM_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,117 @@
+# order-service/app/routers/order_events.py
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app import events
+from app.database import ReadSessionLocal
+from app.models import Order
+import asyncio
+import hmac
+import json
+import logging
+import os
+
+log = logging.getLogger("order-service.events")
+
+# Live status for clients that would otherwise poll GET /v1/orders/{id}.
+router = APIRouter(prefix="/v1/orders", tags=["orders"])
+
+# Service-to-service endpoints: outside /v1, which is all the ingress routes
+internal_router = APIRouter(prefix="/internal/orders", tags=["internal"])
+
+# Comment line sent on idle streams so proxies don't time them out
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Shared secret internal callers send as X-Internal-Token. Without one the
+# internal endpoints refuse every call, unless INTERNAL_API_INSECURE=true
+# (local development only) turns the check off.
+INTERNAL_API_TOKEN    = os.getenv("INTERNAL_API_TOKEN", "")
+INTERNAL_API_INSECURE = os.getenv("INTERNAL_API_INSECURE", "").lower() in {"1", "true", "yes"}
+
+if not INTERNAL_API_TOKEN:
+    log.warning("INTERNAL_API_TOKEN is not set: /internal endpoints %s",
+                "accept any caller (INTERNAL_API_INSECURE)" if INTERNAL_API_INSECURE else "reject every call")
+
+
+# ---------- Schemas ----------
+
+class DeliveryEventIn(BaseModel):
+    order_id: int
+    delivery_id: int
+    driver_id: int | None = None
+    status: str  # ASSIGNED | PICKED | DELIVERED
+
+class DeliveryEventsIn(BaseModel):
+    events: list[DeliveryEventIn] = Field(min_length=1)
+
+
+# ---------- Endpoints ----------
+
+def _sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def _snapshot(order_id: int) -> dict | None:
+    with ReadSessionLocal() as db:
+        o = db.get(Order, order_id)
+        if not o:
+            return None
+        return {
+            "event": "order_status",
+            "order_id": o.order_id,
+            "order_status": o.order_status,
+            "payment_status": o.payment_status,
+        }
+
+
+@router.get("/{order_id}/events")
+async def stream_order_events(order_id: int, request: Request):
+    """
+    Server-sent events for one order: the current status first, then every
+    `order_status` and `delivery_status` change as it happens.
+    """
+    if await run_in_threadpool(_snapshot, order_id) is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    async def stream():
+        # Subscribed only once the body is being sent, so a client that goes
+        # away before that leaves nothing behind; and before the snapshot is
+        # read, so no transition falls in between
+        q = events.subscribe(order_id)
+        try:
+            snapshot = await run_in_threadpool(_snapshot, order_id)
+            if snapshot is None:
+                return
+            yield _sse(snapshot)
+            while True:
+                try:
+                    event = await asyncio.wait_for(q.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event)
+        finally:
+            events.unsubscribe(order_id, q)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _require_internal(x_internal_token: str | None = Header(default=None)):
+    if INTERNAL_API_INSECURE and not INTERNAL_API_TOKEN:
+        return
+    if not INTERNAL_API_TOKEN or not hmac.compare_digest(x_internal_token or "", INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Internal endpoint")
+
+
+@internal_router.post("/delivery-events", status_code=202, dependencies=[Depends(_require_internal)])
+def publish_delivery_events(payload: DeliveryEventsIn):
+    """Delivery-service reports assignments and status changes here for the stream."""
+    events.publish_many([{"event": "delivery_status", **e.model_dump()} for e in payload.events])
+    return {"accepted": len(payload.events)}
@@ -1,12 +1,21 @@
 # order-service/app/routers/orders.py
 
-from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sqlalchemy import select, func
-from app.database import SessionLocal
+from app.database import SessionLocal, ReadSessionLocal
 from app.models import Order, OrderItem
+from app import addresses, analytics, downstream, idempotency, order_state, reconcile
+from app.streaming import ndjson_response, wants_ndjson
+from app.downstream import BreakerOpen, Deadline, DeadlineExceeded
+from app.metrics import latency_buckets
+from contextlib import contextmanager
+from opentelemetry import trace
+from prometheus_client import Counter, Histogram
 import httpx
 import os
+import time
 
 # IMPORTANT:
 # Don't call Base.metadata.create_all() here; it's done in app/main.py on startup.
@@ -18,6 +27,33 @@ RESTAURANT_URL = os.getenv("RESTAURANT_SERVICE_URL", "http://restaurant-service:
 PAYMENT_URL    = os.getenv("PAYMENT_SERVICE_URL",    "http://payment-service:80")
 DELIVERY_URL   = os.getenv("DELIVERY_SERVICE_URL",   "http://delivery-service:80")
 NOTIF_URL      = os.getenv("NOTIFICATION_SERVICE_URL","http://notification-service:80")
+# Where payment-service posts async charge results back to us.
+ORDER_URL      = os.getenv("ORDER_SERVICE_URL",      "http://order-service:80")
+
+# sync: place_order waits for the charge. async: the order is created as
+# PAYMENT_PENDING, the client gets 202 and /payment-callback settles it.
+PAYMENT_MODE = os.getenv("PAYMENT_MODE", "sync").lower()
+# Fixed (not p99-adaptive) timeout for the charge call, which is not safe to
+# cut short: a charge that times out after being sent may still have captured
+# the money, so the order is left PAYMENT_PENDING for app/reconcile.py.
+PAYMENT_CHARGE_TIMEOUT_SECONDS = float(os.getenv("PAYMENT_CHARGE_TIMEOUT_SECONDS", "15"))
+
+# One span per saga hop; httpx/SQLAlchemy instrumentation nests under them.
+tracer = trace.get_tracer("order-service")
+
+# Per-stage timing and failure reasons for place_order, so the stage behind
+# p99 shows up in Prometheus even without a tracing backend.
+ORDER_STAGE_LATENCY = Histogram(
+    "order_service_place_order_stage_seconds",
+    "place_order latency by saga stage",
+    ["stage"],
+    buckets=latency_buckets(),
+)
+ORDER_FAILURES = Counter(
+    "order_service_place_order_failures_total",
+    "place_order failures by reason (best-effort hops included)",
+    ["reason"],
+)
 
 TAX_RATE = 0.05
 DELIVERY_FEE = 30.0
@@ -37,6 +73,17 @@ class PlaceOrderIn(BaseModel):
     lines: list[OrderLineIn]
     payment_method: str  # CARD|UPI|WALLET|COD
 
+class PaymentResultIn(BaseModel):
+    status: str  # SUCCESS | FAILED
+    payment_id: int | None = None
+    reference: str | None = None
+    job_id: int | None = None
+
+class StatusChangeIn(BaseModel):
+    order_status: str
+    # Optimistic concurrency: only apply if the order is still in this status
+    expected_status: str | None = None
+
 class OrderOut(BaseModel):
     order_id: int
     order_status: str
@@ -47,14 +94,66 @@ class OrderOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+# ---------- Saga helpers ----------
+
+@contextmanager
+def _stage(name: str):
+    """Time one saga stage into ORDER_STAGE_LATENCY, inside a span of the same name."""
+    start = time.perf_counter()
+    with tracer.start_as_current_span(name):
+        try:
+            yield
+        finally:
+            ORDER_STAGE_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+def _fail(reason: str, status_code: int, detail: str) -> HTTPException:
+    ORDER_FAILURES.labels(reason).inc()
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def _charge_outcome_unknown(exc: Exception) -> bool:
+    """True if the charge request may have reached payment-service before failing."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return False  # never sent
+    return isinstance(exc, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+
+
+def _dispatch_confirmed(order_id: int, city: str, deadline: Deadline, corr: dict):
+    """Best-effort driver assignment and confirmation notice for a CONFIRMED order."""
+    try:
+        with _stage("delivery_assign"):
+            downstream.call(
+                "delivery", "POST", f"{DELIVERY_URL}/v1/deliveries/assign", deadline,
+                headers=corr,
+                json={"order_id": order_id, "city": city},
+            )
+    except (httpx.HTTPError, BreakerOpen, DeadlineExceeded):
+        ORDER_FAILURES.labels("delivery_assign_error").inc()
+
+    try:
+        with _stage("notify"):
+            downstream.call(
+                "notification", "POST", f"{NOTIF_URL}/v1/notifications", deadline,
+                max_timeout=3.0, headers=corr,
+                json={"order_id": order_id, "type": "ORDER_CONFIRMED"},
+            )
+    except (httpx.HTTPError, BreakerOpen, DeadlineExceeded):
+        ORDER_FAILURES.labels("notify_error").inc()
+
+
 # ---------- Endpoints ----------
 
 @router.get("", response_model=dict)
 def list_orders(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
 ):
-    with SessionLocal() as db:
+    # Accept: application/x-ndjson -> every order, streamed (page params ignored)
+    if wants_ndjson(request):
+        return ndjson_response(ReadSessionLocal, select(Order).order_by(Order.order_id), OrderOut)
+    with ReadSessionLocal() as db:
         total = db.scalar(select(func.count(Order.order_id))) or 0
         items = (
             db.execute(
@@ -76,7 +175,7 @@ def list_orders(
 
 @router.get("/{order_id}", response_model=OrderOut)
 def get_order(order_id: int):
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         o = db.get(Order, order_id)
         if not o:
             raise HTTPException(status_code=404, detail="Order not found")
@@ -87,159 +186,365 @@ def get_order(order_id: int):
 def place_order(
     payload: PlaceOrderIn,
     request: Request,
+    response: Response,
     idempotency_key: str = Header(
         ...,
         alias="Idempotency-Key",          # accept hyphenated header name
         convert_underscores=False
     ),
 ):
+    """
+    Idempotent on Idempotency-Key: a retry with the same key and body gets the
+    original response (with an Idempotent-Replayed header) without re-running
+    the saga; a concurrent duplicate waits for the original to finish. 422 if
+    the key was used for a different order, 409 if the original is still
+    running when our deadline is up.
+    """
     # Business rules
     if len(payload.lines) < 1 or len(payload.lines) > 20:
-        raise HTTPException(status_code=400, detail="Provide 1..20 order lines.")
+        raise _fail("invalid_lines", 400, "Provide 1..20 order lines.")
     if any(l.quantity < 1 or l.quantity > 5 for l in payload.lines):
-        raise HTTPException(status_code=400, detail="Each line quantity must be 1..5.")
+        raise _fail("invalid_lines", 400, "Each line quantity must be 1..5.")
+    if not 1 <= len(idempotency_key) <= 64:
+        raise _fail("invalid_idempotency_key", 422, "Idempotency-Key must be 1..64 characters")
+
+    # One time budget for the whole saga; each hop gets what is left.
+    deadline = Deadline.from_headers(request.headers)
+
+    try:
+        claim = idempotency.begin(idempotency_key, idempotency.request_hash(payload.model_dump()),
+                                  wait_seconds=deadline.remaining())
+    except idempotency.KeyReused:
+        raise _fail("idempotency_key_reused", 422, "Idempotency-Key was already used for a different order")
+    except idempotency.StillInProgress:
+        raise _fail("idempotency_in_progress", 409, "An order with this Idempotency-Key is still being placed")
+    if isinstance(claim, idempotency.Stored):
+        return JSONResponse(claim.body, status_code=claim.status_code,
+                            headers={"Idempotent-Replayed": "true"})
+    # A claim that already carries an order_id was taken over from a request
+    # that died after creating it: finish that order, don't place another
+    saga = _place_order if claim.order_id is None else _resume_order
+
+    # Failures before the order row exists release the key (a retry starts
+    # over); once it exists the outcome is stored, so a retry can never
+    # create a second order or re-send the charge for a different order_id.
+    try:
+        out = saga(payload, request, response, claim, deadline)
+    except HTTPException as exc:
+        if claim.order_id is not None:
+            # Same body now and on replay: the error plus the order it left behind
+            body = {"detail": exc.detail, "order_id": claim.order_id}
+            idempotency.complete(claim, exc.status_code, body)
+            return JSONResponse(body, status_code=exc.status_code)
+        if exc.status_code < 500:
+            idempotency.complete(claim, exc.status_code, {"detail": exc.detail})
+        else:
+            idempotency.release(claim)
+        raise
+    except BaseException:
+        if claim.order_id is not None:
+            idempotency.complete(claim, 500, {"detail": "Internal error", "order_id": claim.order_id})
+        else:
+            idempotency.release(claim)
+        raise
+    idempotency.complete(claim, response.status_code or 201, out.model_dump())
+    return out
 
+
+def _place_order(payload: PlaceOrderIn, request: Request, response: Response,
+                 claim: idempotency.Claim, deadline: Deadline) -> OrderOut:
+    """The place_order saga: validate, insert, charge, confirm."""
     # Correlation ID propagation (best-effort)
     corr_id = request.headers.get("X-Correlation-ID")
+    corr = {"X-Correlation-ID": corr_id} if corr_id else {}
+
+    # Address ownership/city: cache hit, or a customer-service lookup that
+    # runs while we fetch the restaurant
+    address_check = addresses.lookup(payload.customer_id, payload.address_id, deadline, corr)
 
     # Fetch restaurant & menu to validate availability and prices
     try:
-        with httpx.Client(timeout=5.0) as client:
-            r = client.get(
-                f"{RESTAURANT_URL}/v1/restaurants/{payload.restaurant_id}",
-                headers={"X-Correlation-ID": corr_id} if corr_id else None,
+        with _stage("restaurant_fetch"):
+            r = downstream.get(
+                "restaurant", f"{RESTAURANT_URL}/v1/restaurants/{payload.restaurant_id}",
+                deadline, headers=corr,
             )
-            if r.status_code != 200:
-                raise HTTPException(status_code=400, detail="Restaurant not found")
+        if r.status_code != 200:
+            raise _fail("restaurant_not_found", 400, "Restaurant not found")
 
-            rest = r.json()
-            if not rest.get("is_open", False):
-                raise HTTPException(status_code=400, detail="Restaurant is closed")
+        rest = r.json()
+        if not rest.get("is_open", False):
+            raise _fail("restaurant_closed", 400, "Restaurant is closed")
 
-            mresp = client.get(
-                f"{RESTAURANT_URL}/v1/restaurants/{payload.restaurant_id}/menu",
-                headers={"X-Correlation-ID": corr_id} if corr_id else None,
+        with _stage("menu_fetch"):
+            mresp = downstream.get(
+                "restaurant", f"{RESTAURANT_URL}/v1/restaurants/{payload.restaurant_id}/menu",
+                deadline, headers=corr,
             )
-            if mresp.status_code != 200:
-                raise HTTPException(status_code=400, detail="Menu not found")
-            menu = mresp.json().get("items", [])
+        if mresp.status_code != 200:
+            raise _fail("menu_not_found", 400, "Menu not found")
+        menu = mresp.json().get("items", [])
+    except BreakerOpen:
+        raise _fail("circuit_open", 503, "Restaurant service temporarily unavailable")
+    except DeadlineExceeded:
+        raise _fail("deadline_exceeded", 504, "Order deadline exceeded")
+    except httpx.TimeoutException:
+        raise _fail("downstream_timeout", 502, "Restaurant service unavailable")
     except httpx.HTTPError:
-        raise HTTPException(status_code=502, detail="Restaurant service unavailable")
+        raise _fail("restaurant_unavailable", 502, "Restaurant service unavailable")
+
+    with _stage("address_check"):
+        try:
+            address_city = addresses.resolve(address_check, payload.customer_id)
+        except addresses.AddressNotFound:
+            raise _fail("address_not_found", 400, "Address not found for this customer")
+        except addresses.AddressUnavailable:
+            raise _fail("address_unavailable", 503, "Customer service unavailable")
+
+    with _stage("validate"):
+        city = addresses.normalize_city(payload.city)
+        if address_city is not None and address_city != city:
+            raise _fail("address_city_mismatch", 400, "City does not match the delivery address")
+        # Delivery must be same city as restaurant
+        if addresses.normalize_city(rest.get("city")) != city:
+            raise _fail("city_mismatch", 400, "Delivery city must match restaurant city")
+
+        menu_by_id = {m["item_id"]: m for m in menu}
+
+        # Validate and price
+        subtotal = 0.0
+        for line in payload.lines:
+            mi = menu_by_id.get(line.item_id)
+            if not mi or not mi.get("is_available", False):
+                raise _fail("item_unavailable", 400, f"Item {line.item_id} not available")
+            price = float(mi.get("price", 0))
+            subtotal += price * line.quantity
 
-    # Delivery must be same city as restaurant
-    if rest.get("city") != payload.city:
-        raise HTTPException(status_code=400, detail="Delivery city must match restaurant city")
+        tax = round(subtotal * TAX_RATE, 2)
+        total = round(subtotal + tax + DELIVERY_FEE, 2)
 
-    menu_by_id = {m["item_id"]: m for m in menu}
+    # Create order and items, linked to the idempotency key in the same
+    # transaction: a crash can't leave an order its key doesn't know about
+    with SessionLocal() as db:
+        with _stage("db_insert"):
+            order = Order(
+                customer_id=payload.customer_id,
+                restaurant_id=payload.restaurant_id,
+                address_id=payload.address_id,
+                order_status=order_state.INITIAL_STATUS,
+                order_total=total,
+                payment_status="INIT",
+                restaurant_name=rest.get("name"),
+                address_city=addresses.canonical_city(payload.city),  # the delivery city
+            )
+            db.add(order)
+            db.flush()
+            analytics.record_placed(db, order)
+
+            for line in payload.lines:
+                mi = menu_by_id[line.item_id]
+                db.add(
+                    OrderItem(
+                        order_id=order.order_id,
+                        item_id=line.item_id,
+                        quantity=line.quantity,
+                        price=float(mi["price"]),
+                    )
+                )
+            try:
+                idempotency.attach_order(db, claim, order.order_id)
+            except idempotency.ClaimLost:
+                db.rollback()
+                raise _fail("idempotency_in_progress", 409,
+                            "An order with this Idempotency-Key is still being placed")
+            db.commit()
+            db.refresh(order)
+            claim.order_id = order.order_id
 
-    # Validate and price
-    subtotal = 0.0
-    for line in payload.lines:
-        mi = menu_by_id.get(line.item_id)
-        if not mi or not mi.get("is_available", False):
-            raise HTTPException(status_code=400, detail=f"Item {line.item_id} not available")
-        price = float(mi.get("price", 0))
-        subtotal += price * line.quantity
+        return _charge_and_confirm(db, order, payload, response, claim, deadline, corr)
 
-    tax = round(subtotal * TAX_RATE, 2)
-    total = round(subtotal + tax + DELIVERY_FEE, 2)
 
-    # Create order and items
+def _resume_order(payload: PlaceOrderIn, request: Request, response: Response,
+                  claim: idempotency.Claim, deadline: Deadline) -> OrderOut:
+    """
+    Carry on the saga of an order whose request died after inserting it. An
+    order still in the initial status has its charge (re)sent with the same
+    Idempotency-Key and amount, so payment-service replays a charge that
+    already happened rather than taking it twice.
+    """
+    corr_id = request.headers.get("X-Correlation-ID")
+    corr = {"X-Correlation-ID": corr_id} if corr_id else {}
     with SessionLocal() as db:
-        order = Order(
-            customer_id=payload.customer_id,
-            restaurant_id=payload.restaurant_id,
-            address_id=payload.address_id,
-            order_status="PENDING",
-            order_total=total,
-            payment_status="INIT",
-            restaurant_name=rest.get("name"),
-            address_city=payload.city,
-        )
-        db.add(order)
-        db.commit()
-        db.refresh(order)
-
-        for line in payload.lines:
-            mi = menu_by_id[line.item_id]
-            db.add(
-                OrderItem(
-                    order_id=order.order_id,
-                    item_id=line.item_id,
-                    quantity=line.quantity,
-                    price=float(mi["price"]),
+        order = db.get(Order, claim.order_id)
+        if order.order_status == order_state.INITIAL_STATUS:
+            return _charge_and_confirm(db, order, payload, response, claim, deadline, corr)
+    # Already settled, or left to the payment callback / reconciler
+    if order.order_status == "PAYMENT_PENDING":
+        response.status_code = 202
+    return OrderOut.model_validate(order)
+
+
+def _charge_and_confirm(db, order: Order, payload: PlaceOrderIn, response: Response,
+                        claim: idempotency.Claim, deadline: Deadline, corr: dict) -> OrderOut:
+    """Charge an order still in the initial status, then confirm or fail it."""
+    # Charge payment unless COD
+    if payload.payment_method != "COD":
+        pay_req = {
+            "order_id": order.order_id,
+            "amount": order.order_total,
+            "method": payload.payment_method,
+        }
+        async_capture = PAYMENT_MODE == "async"
+        if async_capture:
+            pay_req["callback_url"] = f"{ORDER_URL}/v1/orders/{order.order_id}/payment-callback"
+        try:
+            with _stage("payment"):
+                pr = downstream.call(
+                    "payment", "POST",
+                    f"{PAYMENT_URL}/v1/payments/{'charge:async' if async_capture else 'charge'}",
+                    deadline,
+                    headers={"Idempotency-Key": claim.key, **corr},
+                    json=pay_req,
+                    fixed_timeout=PAYMENT_CHARGE_TIMEOUT_SECONDS,
                 )
-            )
-        db.commit()
-
-        # Charge payment unless COD
-        if payload.payment_method != "COD":
-            pay_req = {
-                "order_id": order.order_id,
-                "amount": total,
-                "method": payload.payment_method,
-            }
+        except (httpx.HTTPError, BreakerOpen, DeadlineExceeded) as exc:
+            if _charge_outcome_unknown(exc):
+                # The charge may have gone through: don't fail the order,
+                # let the reconciler settle it from payment-service's records
+                ORDER_FAILURES.labels("payment_outcome_unknown").inc()
+                row = order_state.transition(db, order.order_id, "PAYMENT_PENDING",
+                                             expected=order_state.INITIAL_STATUS,
+                                             payment_status=reconcile.UNKNOWN)
+                response.status_code = 202
+                return OrderOut.model_validate(row)
+            order_state.transition(db, order.order_id, "PAYMENT_FAILED",
+                                   expected=order_state.INITIAL_STATUS, payment_status="FAILED")
+            if isinstance(exc, BreakerOpen):
+                raise _fail("circuit_open", 503, "Payment service temporarily unavailable")
+            if isinstance(exc, DeadlineExceeded):
+                raise _fail("deadline_exceeded", 504, "Order deadline exceeded")
+            reason = "downstream_timeout" if isinstance(exc, httpx.TimeoutException) else "payment_unavailable"
+            raise _fail(reason, 502, "Payment service unavailable")
+
+        if pr.status_code != (202 if async_capture else 200):
+            # Payment service returns 400 on failure; map to user error
+            order_state.transition(db, order.order_id, "PAYMENT_FAILED",
+                                   expected=order_state.INITIAL_STATUS, payment_status="FAILED")
+            # Bubble up payment error body if present
             try:
-                with httpx.Client(timeout=5.0) as client:
-                    pr = client.post(
-                        f"{PAYMENT_URL}/v1/payments/charge",
-                        headers={
-                            "Idempotency-Key": idempotency_key,
-                            **({"X-Correlation-ID": corr_id} if corr_id else {}),
-                        },
-                        json=pay_req,
-                    )
-            except httpx.HTTPError:
-                order.payment_status = "FAILED"
-                db.commit()
-                raise HTTPException(status_code=502, detail="Payment service unavailable")
-
-            if pr.status_code != 200:
-                # Payment service returns 400 on failure; map to user error
-                order.payment_status = "FAILED"
-                db.commit()
-                # Bubble up payment error body if present
-                try:
-                    d = pr.json()
-                    msg = d.get("detail") if isinstance(d, dict) else None
-                except Exception:
-                    msg = None
-                raise HTTPException(status_code=400, detail=msg or "Payment failed")
-
-            p = pr.json()
-            order.payment_status = p.get("status", "FAILED")
-        else:
-            order.payment_status = "PENDING"
+                d = pr.json()
+                msg = d.get("detail") if isinstance(d, dict) else None
+            except Exception:
+                msg = None
+            raise _fail("payment_failed", 400, msg or "Payment failed")
+
+        if async_capture:
+            # Charge is queued; payment_callback() settles the order later.
+            row = order_state.transition(db, order.order_id, "PAYMENT_PENDING",
+                                         expected=order_state.INITIAL_STATUS, payment_status="PENDING")
+            response.status_code = 202
+            return OrderOut.model_validate(row)
+
+        payment_status = pr.json().get("status", "FAILED")
+    else:
+        payment_status = "PENDING"
+
+    # Confirm + kick off delivery + notify (best-effort background style)
+    if payment_status == "SUCCESS" or payload.payment_method == "COD":
+        row = order_state.transition(db, order.order_id, "CONFIRMED",
+                                     expected=order_state.INITIAL_STATUS, payment_status=payment_status)
+        _dispatch_confirmed(order.order_id, row.address_city, deadline, corr)
+    else:
+        ORDER_FAILURES.labels("payment_failed").inc()
+        row = order_state.transition(db, order.order_id, "PAYMENT_FAILED",
+                                     expected=order_state.INITIAL_STATUS, payment_status=payment_status)
+
+    return OrderOut.model_validate(row)
+
+
+@router.post("/{order_id}/payment-callback", response_model=OrderOut)
+def payment_callback(order_id: int, payload: PaymentResultIn, request: Request, background: BackgroundTasks):
+    """
+    Async capture result from payment-service. Only a PAYMENT_PENDING order is
+    settled, so redelivered callbacks are harmless; delivery assignment and
+    the notification run after the response.
+
+    The route is reachable by anyone, so the body is only a hint: the job is
+    read back from payment-service (GET /v1/payments/jobs/{job_id}) and must
+    belong to this order and carry the same result. 403 if it doesn't, 409
+    while the job has no result yet, 503 if payment-service can't be asked;
+    payment-service retries its callback on all of these.
+    """
+    if payload.job_id is None:
+        raise HTTPException(status_code=422, detail="job_id is required")
+    try:
+        jr = downstream.get("payment", f"{PAYMENT_URL}/v1/payments/jobs/{payload.job_id}",
+                            Deadline.from_headers(request.headers))
+    except (httpx.HTTPError, BreakerOpen, DeadlineExceeded):
+        raise HTTPException(status_code=503, detail="Payment service unavailable")
+    if jr.status_code == 404:
+        raise _fail("callback_rejected", 403, "Unknown charge job")
+    if jr.status_code != 200:
+        raise HTTPException(status_code=503, detail="Payment service unavailable")
+    job = jr.json()
+    if job.get("order_id") != order_id:
+        raise _fail("callback_rejected", 403, "Charge job belongs to a different order")
+    if job.get("result_status") is None:
+        raise HTTPException(status_code=409, detail="Charge job has no result yet")
+    if job["result_status"] != payload.status:
+        raise _fail("callback_rejected", 403, "Callback status does not match the charge job")
+
+    if payload.status == "SUCCESS":
+        target, payment_status = "CONFIRMED", "SUCCESS"
+    else:
+        target, payment_status = "PAYMENT_FAILED", "FAILED"
 
-        # Confirm + kick off delivery + notify (best-effort background style)
-        if order.payment_status == "SUCCESS" or payload.payment_method == "COD":
-            order.order_status = "CONFIRMED"
-            db.commit()
+    with SessionLocal() as db:
+        # Compare-and-set from PAYMENT_PENDING: of concurrent duplicate
+        # callbacks exactly one applies (and dispatches).
+        try:
+            order = order_state.transition(db, order_id, target, expected="PAYMENT_PENDING",
+                                           payment_status=payment_status)
+        except order_state.OrderNotFound:
+            raise HTTPException(status_code=404, detail="Order not found")
+        except order_state.TransitionConflict:
+            return OrderOut.model_validate(db.get(Order, order_id))
+
+        if target == "PAYMENT_FAILED":
+            ORDER_FAILURES.labels("payment_failed").inc()
+        if order.order_status == "CONFIRMED":
+            corr_id = request.headers.get("X-Correlation-ID")
+            background.add_task(
+                _dispatch_confirmed, order.order_id, order.address_city,
+                Deadline(downstream.ORDER_DEADLINE_SECONDS),
+                {"X-Correlation-ID": corr_id} if corr_id else {},
+            )
+        return OrderOut.model_validate(order)
 
-            # Assign driver (best-effort, ignore errors)
-            try:
-                with httpx.Client(timeout=5.0) as client:
-                    client.post(
-                        f"{DELIVERY_URL}/v1/deliveries/assign",
-                        headers={"X-Correlation-ID": corr_id} if corr_id else None,
-                        json={"order_id": order.order_id, "city": payload.city},
-                    )
-            except httpx.HTTPError:
-                pass
 
-            # Send notification (best-effort, ignore errors)
-            try:
-                with httpx.Client(timeout=3.0) as client:
-                    client.post(
-                        f"{NOTIF_URL}/v1/notifications",
-                        headers={"X-Correlation-ID": corr_id} if corr_id else None,
-                        json={"order_id": order.order_id, "type": "ORDER_CONFIRMED"},
-                    )
-            except httpx.HTTPError:
-                pass
-        else:
-            # Non-COD and not SUCCESS -> already set to FAILED above
-            db.commit()
+@router.patch("/{order_id}/status", response_model=OrderOut)
+def change_status(order_id: int, payload: StatusChangeIn):
+    """
+    Move an order along its lifecycle (CONFIRMED -> PREPARING -> READY ->
+    DISPATCHED -> DELIVERED, or CANCELLED). Applied as one conditional UPDATE;
+    409 if the order is not in a status the change can start from (or not in
+    `expected_status`), with the current status in the detail.
+    """
+    target = payload.order_status
+    if target not in order_state.STATUSES or target in order_state.PAYMENT_DRIVEN:
+        raise HTTPException(status_code=422, detail=f"Cannot set order_status to {target}")
+    expected = payload.expected_status
+    if expected is not None and not order_state.can_transition(expected, target):
+        raise HTTPException(status_code=422, detail=f"{expected} -> {target} is not a valid transition")
 
-        db.refresh(order)
+    with SessionLocal() as db:
+        try:
+            order = order_state.transition(db, order_id, target, expected=expected)
+        except order_state.OrderNotFound:
+            raise HTTPException(status_code=404, detail="Order not found")
+        except order_state.TransitionConflict as exc:
+            raise HTTPException(
+                status_code=409,
+                detail={"message": str(exc), "current_status": exc.current},
+            )
         return OrderOut.model_validate(order)
@@ -0,0 +1,93 @@
+# app/tracing.py
+# OpenTelemetry setup: server spans for FastAPI, client spans (and W3C
+# traceparent injection) for httpx, and a span per SQL statement.
+#
+#   TRACING_EXPORTER      otlp | console | file | none
+#                         (default: otlp when OTEL_EXPORTER_OTLP_ENDPOINT is set)
+#   TRACING_FILE          span output for the file exporter, one JSON span per line
+#   TRACING_SAMPLE_RATIO  head sampling ratio for new traces; callers' decisions win
+
+import os
+from opentelemetry import trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+TRACING_EXPORTER = os.getenv(
+    "TRACING_EXPORTER", "otlp" if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else "none"
+).lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "spans.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+
+
+# Module-level httpx clients are usually built at import time, before
+# setup_tracing() runs; HTTPXClientInstrumentor().instrument() only covers
+# clients created after it, so those are registered and patched explicitly.
+_early_clients: list = []
+_instrumented = False
+
+
+def traced_client(client):
+    """Register an httpx client so its requests carry traceparent; returns it."""
+    if _instrumented:
+        return client  # created after instrument(): already traced
+    _early_clients.append(client)
+    return client
+
+
+class _FileSpanExporter(ConsoleSpanExporter):
+    """
+    One JSON span per line, appended to `path`. The provider shuts its
+    processors down at exit (shutdown_on_exit), which closes the file.
+    """
+
+    def __init__(self, path: str):
+        self._out = open(path, "a", buffering=1)
+        super().__init__(out=self._out, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+    def export(self, spans):
+        if self._out.closed:
+            return SpanExportResult.FAILURE
+        return super().export(spans)
+
+    def shutdown(self):
+        self._out.close()
+
+
+def _span_processor():
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return BatchSpanProcessor(OTLPSpanExporter())
+    if TRACING_EXPORTER == "console":
+        return SimpleSpanProcessor(ConsoleSpanExporter())
+    if TRACING_EXPORTER == "file":
+        return SimpleSpanProcessor(_FileSpanExporter(TRACING_FILE))
+    raise ValueError(f"Unknown TRACING_EXPORTER: {TRACING_EXPORTER}")
+
+
+def setup_tracing(app, service_name: str, engines=()):
+    """Install the tracer provider and instrument the app, httpx and the given engines."""
+    if TRACING_EXPORTER == "none":
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(_span_processor())
+    trace.set_tracer_provider(provider)
+
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="/health,/metrics")
+    # Before instrument(): it swaps httpx.Client for a subclass, after which
+    # instrument_client() no longer recognises clients of the original class
+    for client in _early_clients:
+        HTTPXClientInstrumentor.instrument_client(client)
+    HTTPXClientInstrumentor().instrument()
+    global _instrumented
+    _instrumented = True
+    SQLAlchemyInstrumentor().instrument(engines=[e for e in engines if e is not None])
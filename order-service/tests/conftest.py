@@ -0,0 +1,101 @@
+# order-service/tests/conftest.py
+# Runs the app against a throwaway SQLite file with the downstream services
+# (restaurant, payment, delivery, notification) answered by an httpx
+# MockTransport. Run from order-service/: python -m pytest tests
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="order-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/orders.db"
+os.environ["DATABASE_READ_URL"] = ""
+os.environ["ADDRESS_VALIDATION"] = "off"
+os.environ["ORDER_EVENTS_BACKEND"] = "memory"
+os.environ["PAYMENT_RECONCILE_INTERVAL_SECONDS"] = "0"
+os.environ["TRACING_EXPORTER"] = "none"
+os.environ["DISABLE_SEQUENCE_REPAIR"] = "1"
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app import downstream as downstream_module, idempotency
+from app.database import engine
+from app.main import app
+from app.models import Base
+
+
+class FakeDownstreams:
+    """Canned restaurant/menu/payment answers; records every call."""
+
+    def __init__(self):
+        self.calls: list[httpx.Request] = []
+        self.restaurant_open = True
+        self.down: set[str] = set()  # path prefixes that fail to connect
+        self.charge = lambda request: httpx.Response(
+            200, json={"payment_id": 1, "status": "SUCCESS", "reference": "REF1"})
+        self.jobs: dict[int, dict] = {}    # GET /v1/payments/jobs/{job_id}
+        self.payments: list[dict] = []     # GET /v1/payments?order_id=...
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request)
+        path = request.url.path
+        if any(path.startswith(prefix) for prefix in self.down):
+            raise httpx.ConnectError("connection refused", request=request)
+        if path.endswith("/menu"):
+            return httpx.Response(200, json={"items": [
+                {"item_id": 1, "price": 100.0, "is_available": True},
+                {"item_id": 2, "price": 50.0, "is_available": True},
+            ]})
+        if path.startswith("/v1/restaurants/"):
+            return httpx.Response(200, json={
+                "restaurant_id": 1, "name": "Dosa Corner", "city": "Pune", "is_open": self.restaurant_open,
+            })
+        if path.startswith("/v1/payments/charge"):
+            return self.charge(request)
+        if path.startswith("/v1/payments/jobs/"):
+            job = self.jobs.get(int(path.rsplit("/", 1)[1]))
+            return httpx.Response(200, json=job) if job else httpx.Response(404, json={})
+        if path == "/v1/payments":
+            order_ids = {int(v) for v in request.url.params.get_list("order_id")}
+            items = [p for p in self.payments if p["order_id"] in order_ids]
+            return httpx.Response(200, json={"items": items, "next_cursor": None})
+        return httpx.Response(202, json={})
+
+    def paths(self, prefix: str) -> list[str]:
+        return [r.url.path for r in self.calls if r.url.path.startswith(prefix)]
+
+
+@pytest.fixture
+def downstreams(monkeypatch):
+    fake = FakeDownstreams()
+    monkeypatch.setattr(downstream_module._client, "_transport", httpx.MockTransport(fake))
+    return fake
+
+
+@pytest.fixture
+def client(downstreams):
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    idempotency._inflight.clear()  # claims a test left unfinished
+
+
+def order_body(**overrides) -> dict:
+    body = {
+        "customer_id": 1,
+        "restaurant_id": 1,
+        "address_id": 1,
+        "city": "Pune",
+        "lines": [{"item_id": 1, "quantity": 2}],
+        "payment_method": "CARD",
+    }
+    body.update(overrides)
+    return body
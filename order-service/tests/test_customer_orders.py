@@ -0,0 +1,55 @@
+# order-service/tests/test_customer_orders.py
+
+from datetime import datetime, timedelta
+from app.database import SessionLocal
+from app.models import Order
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _seed(*specs: tuple[int, int, str]) -> list[int]:
+    """(customer_id, minutes after T0, order_status) per order; returns order_ids."""
+    with SessionLocal() as db:
+        orders = [
+            Order(customer_id=customer_id, restaurant_id=1, address_id=1, order_status=status,
+                  order_total=100.0, payment_status="SUCCESS", created_at=T0 + timedelta(minutes=minutes))
+            for customer_id, minutes, status in specs
+        ]
+        db.add_all(orders)
+        db.commit()
+        return [o.order_id for o in orders]
+
+
+def _walk(client, customer_id: int, **params) -> list[int]:
+    seen, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        body = client.get(f"/v1/customers/{customer_id}/orders", params=query).json()
+        seen += [o["order_id"] for o in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_pages_are_newest_first_without_gaps(client):
+    # Two orders share a timestamp: ties are broken by order_id
+    a, b, c, d, _ = _seed((1, 0, "DELIVERED"), (1, 5, "DELIVERED"), (1, 5, "CANCELLED"),
+                          (1, 9, "CONFIRMED"), (2, 7, "CONFIRMED"))
+    assert _walk(client, 1, page_size=2) == [d, b, c, a]
+    assert _walk(client, 1, page_size=1) == [d, b, c, a]
+
+
+def test_status_filter(client):
+    a, _, c = _seed((1, 0, "DELIVERED"), (1, 1, "CANCELLED"), (1, 2, "DELIVERED"))
+    assert _walk(client, 1, status="DELIVERED", page_size=1) == [c, a]
+
+
+def test_last_page_has_no_cursor(client):
+    _seed((1, 0, "DELIVERED"), (1, 1, "DELIVERED"))
+    body = client.get("/v1/customers/1/orders", params={"page_size": 2}).json()
+    assert len(body["items"]) == 2
+    assert body["next_cursor"] is None
+
+
+def test_bad_cursor_is_400(client):
+    assert client.get("/v1/customers/1/orders", params={"cursor": "not-a-cursor"}).status_code == 400
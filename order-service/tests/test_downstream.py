@@ -0,0 +1,65 @@
+# order-service/tests/test_downstream.py
+
+import threading
+import time
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from app import downstream
+
+
+def _hedged(outcome: str) -> float:
+    return REGISTRY.get_sample_value("order_service_hedged_requests_total",
+                                     {"downstream": "restaurant", "outcome": outcome}) or 0.0
+
+
+@pytest.fixture
+def attempts(monkeypatch):
+    """
+    Stands in for call(): attempt n sleeps past the hedge delay, then returns
+    or raises results[n]. Returns (results, urls called).
+    """
+    results: list = []
+    calls: list[str] = []
+    lock = threading.Lock()
+
+    def call(name, method, url, deadline, **kwargs):
+        with lock:
+            result = results[len(calls)]
+            calls.append(url)
+        time.sleep(0.05)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(downstream, "call", call)
+    monkeypatch.setattr(downstream, "HEDGE_REQUESTS", True)
+    monkeypatch.setattr(downstream, "HEDGE_DEFAULT_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(downstream.BREAKERS["restaurant"], "percentile", lambda q: None)
+    monkeypatch.setattr(downstream.RETRY_BUDGET, "try_spend", lambda: True)
+    return results, calls
+
+
+def _get():
+    return downstream.get("restaurant", "http://restaurant/x", downstream.Deadline(1))
+
+
+def test_hedge_wins_when_the_primary_fails(attempts):
+    results, calls = attempts
+    results += [httpx.ConnectError("down"), httpx.Response(200)]
+    before = _hedged("hedge_won")
+    assert _get().status_code == 200
+    assert len(calls) == 2
+    assert _hedged("hedge_won") == before + 1
+
+
+def test_both_failing_is_its_own_outcome(attempts):
+    results, calls = attempts
+    results += [httpx.ConnectError("primary"), httpx.ConnectError("hedge")]
+    before = {o: _hedged(o) for o in ("primary_won", "hedge_won", "both_failed")}
+    with pytest.raises(httpx.ConnectError, match="primary"):
+        _get()
+    assert len(calls) == 2
+    assert _hedged("both_failed") == before["both_failed"] + 1
+    assert _hedged("primary_won") == before["primary_won"]
+    assert _hedged("hedge_won") == before["hedge_won"]
@@ -0,0 +1,156 @@
+# order-service/tests/test_idempotency.py
+
+from datetime import datetime, timedelta
+import json
+import pytest
+from sqlalchemy import func, select, update
+from app import idempotency
+from app.database import SessionLocal
+from app.models import Order, OrderIdempotencyKey
+from app.routers.orders import PlaceOrderIn
+from conftest import order_body
+
+
+def _post(client, key="k1", **overrides):
+    return client.post("/v1/orders", json=order_body(**overrides), headers={"Idempotency-Key": key})
+
+
+def _order_count() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(Order))
+
+
+def _hash(**overrides) -> str:
+    return idempotency.request_hash(PlaceOrderIn(**order_body(**overrides)).model_dump())
+
+
+def test_replay_returns_the_stored_response(client, downstreams):
+    first = _post(client)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    again = _post(client)
+    assert again.status_code == 201
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == first.json()
+    assert _order_count() == 1
+    assert len(downstreams.paths("/v1/payments/charge")) == 1
+
+
+def test_key_reused_for_a_different_body_is_422(client):
+    assert _post(client).status_code == 201
+    r = _post(client, lines=[{"item_id": 2, "quantity": 1}])
+    assert r.status_code == 422
+    assert _order_count() == 1
+
+
+def test_client_error_is_stored(client, downstreams):
+    downstreams.restaurant_open = False
+    assert _post(client).status_code == 400
+
+    downstreams.restaurant_open = True
+    r = _post(client)
+    assert r.status_code == 400
+    assert r.headers["Idempotent-Replayed"] == "true"
+    assert _order_count() == 0
+
+
+def test_server_error_before_the_order_releases_the_key(client, downstreams):
+    downstreams.down.add("/v1/restaurants/")
+    assert _post(client).status_code == 502
+    with SessionLocal() as db:
+        assert db.get(OrderIdempotencyKey, "k1") is None
+
+    downstreams.down.clear()
+    r = _post(client)
+    assert r.status_code == 201
+    assert "Idempotent-Replayed" not in r.headers
+
+
+def test_server_error_after_the_order_is_stored_with_it(client, downstreams):
+    downstreams.down.add("/v1/payments/charge")
+    first = _post(client)
+    assert first.status_code == 502
+    order_id = first.json()["order_id"]
+
+    again = _post(client)
+    assert again.status_code == 502
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json()["order_id"] == order_id
+    assert _order_count() == 1
+    with SessionLocal() as db:
+        assert db.get(Order, order_id).order_status == "PAYMENT_FAILED"
+
+
+def _dead_request(order_status: str, payment_status: str) -> tuple[idempotency.Claim, int]:
+    """A request that created its order and died without storing a response."""
+    claim = idempotency.begin("k1", _hash(), wait_seconds=0)
+    with SessionLocal() as db:
+        order = Order(customer_id=1, restaurant_id=1, address_id=1, order_status=order_status,
+                      order_total=230.0, payment_status=payment_status, address_city="Pune")
+        db.add(order)
+        db.flush()
+        idempotency.attach_order(db, claim, order.order_id)
+        db.commit()
+        order_id = order.order_id
+    with SessionLocal() as db:
+        db.execute(update(OrderIdempotencyKey)
+                   .where(OrderIdempotencyKey.key == "k1")
+                   .values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+    return claim, order_id
+
+
+def test_takeover_returns_a_settled_order(client, downstreams):
+    claim, order_id = _dead_request("CONFIRMED", "SUCCESS")
+    r = _post(client)
+    assert r.status_code == 201
+    assert r.json()["order_id"] == order_id
+    assert _order_count() == 1
+    assert downstreams.paths("/v1/payments/charge") == []
+
+    # The dead request's lease is gone: storing its response is a no-op
+    idempotency.complete(claim, 500, {"detail": "late"})
+    assert _post(client).json()["order_id"] == order_id
+
+
+def test_takeover_resumes_an_unpaid_order(client, downstreams):
+    _, order_id = _dead_request("PENDING", "INIT")
+    r = _post(client)
+    assert r.status_code == 201
+    assert r.json()["order_id"] == order_id
+    assert r.json()["order_status"] == "CONFIRMED"
+    assert _order_count() == 1
+
+    # The charge is re-sent under the same key and amount, so payment-service
+    # replays it if the dead request already got that far
+    charge, = [c for c in downstreams.calls if c.url.path == "/v1/payments/charge"]
+    assert charge.headers["Idempotency-Key"] == "k1"
+    assert json.loads(charge.content) == {"order_id": order_id, "amount": 230.0, "method": "CARD"}
+
+    again = _post(client)
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json()["order_status"] == "CONFIRMED"
+
+
+def test_order_is_not_linked_to_a_lost_lease(client):
+    claim = idempotency.begin("k1", _hash(), wait_seconds=0)
+    with SessionLocal() as db:
+        db.execute(update(OrderIdempotencyKey).values(lease_id="someone-else"))
+        db.commit()
+    with SessionLocal() as db:
+        db.add(Order(customer_id=1, restaurant_id=1, address_id=1, order_status="PENDING",
+                     order_total=230.0, payment_status="INIT"))
+        db.flush()
+        with pytest.raises(idempotency.ClaimLost):
+            idempotency.attach_order(db, claim, 1)
+
+
+def test_live_lease_is_not_taken_over(client):
+    idempotency.begin("k1", _hash(), wait_seconds=0)
+    with pytest.raises(idempotency.StillInProgress):
+        idempotency.begin("k1", _hash(), wait_seconds=0)
+    r = client.post("/v1/orders", json=order_body(),
+                    headers={"Idempotency-Key": "k1", "X-Deadline-Ms": "50"})
+    assert r.status_code == 409
+    assert _order_count() == 0
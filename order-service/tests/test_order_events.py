@@ -0,0 +1,66 @@
+# order-service/tests/test_order_events.py
+
+import asyncio
+from starlette.requests import Request
+from app import events
+from app.database import SessionLocal
+from app.models import Order
+from app.routers import order_events
+
+EVENT = {"order_id": 1, "delivery_id": 1, "driver_id": 3, "status": "PICKED"}
+
+
+def _post_event(client, token: str | None = None):
+    headers = {"X-Internal-Token": token} if token is not None else {}
+    return client.post("/internal/orders/delivery-events", json={"events": [EVENT]}, headers=headers)
+
+
+def test_internal_endpoint_rejects_without_a_configured_token(client):
+    assert _post_event(client).status_code == 403
+    assert _post_event(client, "anything").status_code == 403
+
+
+def test_internal_endpoint_checks_the_token(client, monkeypatch):
+    monkeypatch.setattr(order_events, "INTERNAL_API_TOKEN", "s3cret")
+    assert _post_event(client).status_code == 403
+    assert _post_event(client, "wrong").status_code == 403
+    r = _post_event(client, "s3cret")
+    assert r.status_code == 202
+    assert r.json() == {"accepted": 1}
+
+
+def test_insecure_flag_opens_the_endpoint(client, monkeypatch):
+    monkeypatch.setattr(order_events, "INTERNAL_API_INSECURE", True)
+    assert _post_event(client).status_code == 202
+
+
+def test_stream_for_unknown_order_is_404(client):
+    assert client.get("/v1/orders/999/events").status_code == 404
+    assert events._subscribers == {}
+
+
+def test_stream_subscribes_only_while_the_body_is_sent(client):
+    with SessionLocal() as db:
+        db.add(Order(customer_id=1, restaurant_id=1, address_id=1, order_status="CONFIRMED",
+                     order_total=230.0, payment_status="SUCCESS"))
+        db.commit()
+
+    async def scenario():
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+        response = await order_events.stream_order_events(1, request)
+        # A client that disconnects before the body starts leaves no subscriber
+        assert events._subscribers == {}
+
+        body = response.body_iterator
+        first = await body.__anext__()
+        assert first.startswith("event: order_status")
+        assert '"order_status": "CONFIRMED"' in first
+        assert len(events._subscribers[1]) == 1
+
+        events._dispatch({"event": "delivery_status", **EVENT})
+        assert (await body.__anext__()).startswith("event: delivery_status")
+
+        await body.aclose()
+        assert events._subscribers == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+# order-service/tests/test_order_state.py
+
+import pytest
+from sqlalchemy import select
+from app import order_state
+from app.database import SessionLocal
+from app.models import OrderDailyStat
+from conftest import order_body
+
+
+def _place(client, key="k1", **overrides) -> dict:
+    r = client.post("/v1/orders", json=order_body(**overrides), headers={"Idempotency-Key": key})
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+def _buckets() -> dict[str, int]:
+    with SessionLocal() as db:
+        rows = db.execute(select(OrderDailyStat.order_status, OrderDailyStat.order_count)).all()
+    return {status: count for status, count in rows if count}
+
+
+def test_paid_order_is_confirmed(client):
+    order = _place(client)
+    assert order["order_status"] == "CONFIRMED"
+    assert order["payment_status"] == "SUCCESS"
+
+
+def test_lifecycle_walks_forward(client):
+    order_id = _place(client)["order_id"]
+    for status in ("PREPARING", "READY", "DISPATCHED", "DELIVERED"):
+        r = client.patch(f"/v1/orders/{order_id}/status", json={"order_status": status})
+        assert r.status_code == 200, r.text
+        assert r.json()["order_status"] == status
+    assert _buckets() == {"DELIVERED": 1}
+
+
+def test_skipping_a_step_is_a_conflict(client):
+    order_id = _place(client)["order_id"]
+    r = client.patch(f"/v1/orders/{order_id}/status", json={"order_status": "DELIVERED"})
+    assert r.status_code == 409
+    assert r.json()["detail"]["current_status"] == "CONFIRMED"
+
+
+def test_terminal_status_cannot_be_left(client):
+    order_id = _place(client)["order_id"]
+    assert client.patch(f"/v1/orders/{order_id}/status", json={"order_status": "CANCELLED"}).status_code == 200
+    r = client.patch(f"/v1/orders/{order_id}/status", json={"order_status": "PREPARING"})
+    assert r.status_code == 409
+    assert r.json()["detail"]["current_status"] == "CANCELLED"
+
+
+def test_expected_status_is_compare_and_set(client):
+    order_id = _place(client)["order_id"]
+    r = client.patch(f"/v1/orders/{order_id}/status",
+                     json={"order_status": "PREPARING", "expected_status": "CONFIRMED"})
+    assert r.status_code == 200
+    # A second writer that still believes the order is CONFIRMED loses
+    r = client.patch(f"/v1/orders/{order_id}/status",
+                     json={"order_status": "CANCELLED", "expected_status": "CONFIRMED"})
+    assert r.status_code == 409
+    assert r.json()["detail"]["current_status"] == "PREPARING"
+
+
+@pytest.mark.parametrize("payload", [
+    {"order_status": "CONFIRMED"},                                    # payment-driven
+    {"order_status": "SHIPPED"},                                      # unknown
+    {"order_status": "READY", "expected_status": "CONFIRMED"},        # not an edge
+])
+def test_invalid_requests_are_rejected(client, payload):
+    order_id = _place(client)["order_id"]
+    assert client.patch(f"/v1/orders/{order_id}/status", json=payload).status_code == 422
+
+
+def test_unknown_order_is_404(client):
+    assert client.patch("/v1/orders/999/status", json={"order_status": "PREPARING"}).status_code == 404
+
+
+def test_transition_raises_for_the_loser(client):
+    order_id = _place(client)["order_id"]
+    with SessionLocal() as db:
+        order_state.transition(db, order_id, "PREPARING", expected="CONFIRMED")
+    with SessionLocal() as db, pytest.raises(order_state.TransitionConflict) as exc:
+        order_state.transition(db, order_id, "CANCELLED", expected="CONFIRMED")
+    assert exc.value.current == "PREPARING"
+
+
+def test_predecessors_mirror_transitions():
+    for source, targets in order_state.TRANSITIONS.items():
+        for target in targets:
+            assert source in order_state.PREDECESSORS[target]
+    assert order_state.PREDECESSORS["PENDING"] == frozenset()
@@ -0,0 +1,143 @@
+# order-service/tests/test_payment_settlement.py
+
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from sqlalchemy import update
+from app import reconcile
+from app.database import SessionLocal
+from app.models import Order
+from app.routers import orders
+from conftest import order_body
+
+
+def _place(client, key="k1") -> dict:
+    r = client.post("/v1/orders", json=order_body(), headers={"Idempotency-Key": key})
+    assert r.status_code == 202, r.text
+    return r.json()
+
+
+def _status(order_id: int) -> tuple[str, str]:
+    with SessionLocal() as db:
+        order = db.get(Order, order_id)
+        return order.order_status, order.payment_status
+
+
+def _age(order_id: int, seconds: float):
+    with SessionLocal() as db:
+        db.execute(update(Order).where(Order.order_id == order_id)
+                   .values(created_at=datetime.utcnow() - timedelta(seconds=seconds)))
+        db.commit()
+
+
+@pytest.fixture
+def async_capture(monkeypatch, downstreams):
+    monkeypatch.setattr(orders, "PAYMENT_MODE", "async")
+    downstreams.charge = lambda request: httpx.Response(
+        202, json={"job_id": 7, "order_id": 1, "status": "QUEUED"})
+    return downstreams
+
+
+def _callback(client, order_id: int, **body):
+    return client.post(f"/v1/orders/{order_id}/payment-callback", json=body)
+
+
+# ---------- Async capture callback ----------
+
+def test_async_capture_is_settled_by_callback(client, async_capture):
+    order = _place(client)
+    assert (order["order_status"], order["payment_status"]) == ("PAYMENT_PENDING", "PENDING")
+    order_id = order["order_id"]
+    async_capture.jobs[7] = {"job_id": 7, "order_id": order_id, "status": "CHARGED", "result_status": "SUCCESS"}
+
+    r = _callback(client, order_id, job_id=7, status="SUCCESS")
+    assert r.status_code == 200
+    assert r.json()["order_status"] == "CONFIRMED"
+    assert async_capture.paths("/v1/deliveries/assign") == ["/v1/deliveries/assign"]
+
+    # A redelivered callback changes nothing and dispatches nothing
+    assert _callback(client, order_id, job_id=7, status="SUCCESS").json()["order_status"] == "CONFIRMED"
+    assert len(async_capture.paths("/v1/deliveries/assign")) == 1
+
+
+def test_callback_for_a_failed_charge(client, async_capture):
+    order_id = _place(client)["order_id"]
+    async_capture.jobs[7] = {"job_id": 7, "order_id": order_id, "status": "CHARGED", "result_status": "FAILED"}
+    assert _callback(client, order_id, job_id=7, status="FAILED").json()["order_status"] == "PAYMENT_FAILED"
+
+
+@pytest.mark.parametrize("job, body, code", [
+    (None, {"status": "SUCCESS"}, 422),                                          # no job_id
+    (None, {"job_id": 7, "status": "SUCCESS"}, 403),                             # unknown job
+    ({"order_id": 999, "result_status": "SUCCESS"}, {"job_id": 7, "status": "SUCCESS"}, 403),
+    ({"result_status": None}, {"job_id": 7, "status": "SUCCESS"}, 409),          # not charged yet
+    ({"result_status": "FAILED"}, {"job_id": 7, "status": "SUCCESS"}, 403),      # forged status
+])
+def test_callback_is_checked_against_the_job(client, async_capture, job, body, code):
+    order_id = _place(client)["order_id"]
+    if job is not None:
+        async_capture.jobs[7] = {"job_id": 7, "order_id": order_id, "status": "QUEUED", **job}
+    assert _callback(client, order_id, **body).status_code == code
+    assert _status(order_id) == ("PAYMENT_PENDING", "PENDING")
+
+
+def test_callback_when_payment_service_is_down(client, async_capture):
+    order_id = _place(client)["order_id"]
+    async_capture.down.add("/v1/payments/jobs/")
+    assert _callback(client, order_id, job_id=7, status="SUCCESS").status_code == 503
+
+
+# ---------- Reconciler ----------
+
+def _timed_out_charge(request):
+    raise httpx.ReadTimeout("no response", request=request)
+
+
+def test_unknown_charge_is_confirmed_from_payment_records(client, downstreams):
+    downstreams.charge = _timed_out_charge
+    order = _place(client)
+    assert order["payment_status"] == reconcile.UNKNOWN
+    order_id = order["order_id"]
+
+    assert reconcile.reconcile_once() == 1
+    assert _status(order_id) == ("PAYMENT_PENDING", reconcile.UNKNOWN)  # nothing recorded yet
+
+    downstreams.payments.append({"order_id": order_id, "status": "SUCCESS"})
+    reconcile.reconcile_once()
+    assert _status(order_id) == ("CONFIRMED", "SUCCESS")
+    assert downstreams.paths("/v1/deliveries/assign") == ["/v1/deliveries/assign"]
+    assert reconcile.reconcile_once() == 0
+
+
+def test_unknown_charge_that_failed(client, downstreams):
+    downstreams.charge = _timed_out_charge
+    order_id = _place(client)["order_id"]
+    downstreams.payments.append({"order_id": order_id, "status": "FAILED"})
+    reconcile.reconcile_once()
+    assert _status(order_id) == ("PAYMENT_FAILED", "FAILED")
+
+
+def test_unknown_charge_with_no_payment_gives_up(client, downstreams):
+    downstreams.charge = _timed_out_charge
+    order_id = _place(client)["order_id"]
+    _age(order_id, reconcile.PAYMENT_RECONCILE_GIVE_UP_SECONDS + 1)
+    reconcile.reconcile_once()
+    assert _status(order_id) == ("PAYMENT_FAILED", "FAILED")
+
+
+def test_async_capture_without_callback_is_swept_once_stale(client, async_capture):
+    order_id = _place(client)["order_id"]
+    async_capture.payments.append({"order_id": order_id, "status": "SUCCESS"})
+
+    # The callback may still come: a fresh async order is left alone
+    assert reconcile.reconcile_once() == 0
+    assert _status(order_id) == ("PAYMENT_PENDING", "PENDING")
+
+    _age(order_id, reconcile.PAYMENT_RECONCILE_ASYNC_AFTER_SECONDS + 1)
+    assert reconcile.reconcile_once() == 1
+    assert _status(order_id) == ("CONFIRMED", "SUCCESS")
+
+    # The late callback then finds the order settled
+    async_capture.jobs[7] = {"job_id": 7, "order_id": order_id, "status": "CHARGED", "result_status": "SUCCESS"}
+    assert _callback(client, order_id, job_id=7, status="SUCCESS").json()["order_status"] == "CONFIRMED"
+    assert len(async_capture.paths("/v1/deliveries/assign")) == 1
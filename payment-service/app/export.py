@@ -0,0 +1,161 @@
+# payment-service/app/export.py
+# Columnar export of payments for offline analysis.
+#
+# Rows are read through a server-side cursor (yield_per/stream_results) in
+# EXPORT_BATCH_ROWS chunks and turned into Arrow record batches, so memory
+# stays flat however many payments there are. Two outputs:
+#
+#   python -m app.export payments OUT_DIR [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+#       Parquet dataset, one file per created_date=YYYY-MM-DD partition,
+#       one row group per batch.
+#   GET /v1/payments/export.arrow  (routers/exports.py)
+#       Arrow IPC stream of the same rows.
+
+import argparse
+import os
+import sys
+from datetime import date, datetime, time, timedelta, timezone
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from app.models import Payment
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# dataset -> (model, Arrow schema, timestamp column used for partitioning/filters)
+DATASETS = {
+    "payments": (
+        Payment,
+        pa.schema([
+            ("payment_id", pa.int64()),
+            ("order_id", pa.int64()),
+            ("amount", pa.float64()),
+            ("method", pa.string()),
+            ("status", pa.string()),
+            ("reference", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ]),
+        "created_at",
+    ),
+}
+
+
+def _query(dataset: str, date_from: date | None, date_to: date | None):
+    model, schema, ts = DATASETS[dataset]
+    ts_col = getattr(model, ts)
+    # Day bounds in UTC; naive for naive (UTC) columns
+    tz = timezone.utc if schema.field(ts).type.tz else None
+    stmt = select(*(getattr(model, f.name) for f in schema))
+    if date_from:
+        stmt = stmt.where(ts_col >= datetime.combine(date_from, time.min, tz))
+    if date_to:
+        stmt = stmt.where(ts_col < datetime.combine(date_to + timedelta(days=1), time.min, tz))
+    # Timestamp order keeps partitions contiguous for the Parquet writer
+    pk = model.__mapper__.primary_key[0]
+    return stmt.order_by(ts_col, pk).execution_options(yield_per=EXPORT_BATCH_ROWS, stream_results=True)
+
+
+def iter_batches(db, dataset: str, date_from: date | None = None, date_to: date | None = None):
+    """Yield pyarrow.RecordBatch chunks of up to EXPORT_BATCH_ROWS rows."""
+    schema = DATASETS[dataset][1]
+    result = db.execute(_query(dataset, date_from, date_to))
+    for rows in result.partitions():
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+class _Chunks:
+    """Minimal writable file for pyarrow that hands back what was written."""
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+
+def arrow_stream(session_factory, dataset: str, date_from: date | None = None, date_to: date | None = None):
+    """Sync generator of Arrow IPC stream bytes (for StreamingResponse)."""
+    schema = DATASETS[dataset][1]
+    sink = _Chunks()
+    with session_factory() as db:
+        writer = pa.ipc.new_stream(sink, schema)
+        yield sink.take()
+        for batch in iter_batches(db, dataset, date_from, date_to):
+            writer.write_batch(batch)
+            yield sink.take()
+        writer.close()
+        yield sink.take()
+
+
+def write_parquet(db, dataset: str, out_dir: str,
+                  date_from: date | None = None, date_to: date | None = None) -> dict[str, int]:
+    """
+    Write OUT_DIR/<dataset>/created_date=YYYY-MM-DD/part-0.parquet files.
+    Returns rows written per partition.
+    """
+    model, schema, ts = DATASETS[dataset]
+    ts_index = schema.get_field_index(ts)
+    counts: dict[str, int] = {}
+    writer, current = None, None
+    try:
+        for batch in iter_batches(db, dataset, date_from, date_to):
+            days = pc.strftime(batch.column(ts_index), format="%Y-%m-%d").to_pylist()
+            start = 0
+            # Batches are sorted by timestamp: split at each day boundary
+            for i in range(1, len(days) + 1):
+                if i < len(days) and days[i] == days[start]:
+                    continue
+                day = days[start] or "unknown"
+                if day != current:
+                    if writer is not None:
+                        writer.close()
+                    path = os.path.join(out_dir, dataset, f"created_date={day}")
+                    os.makedirs(path, exist_ok=True)
+                    writer = pq.ParquetWriter(os.path.join(path, "part-0.parquet"), schema, compression="zstd")
+                    current = day
+                writer.write_batch(batch.slice(start, i - start))
+                counts[day] = counts.get(day, 0) + (i - start)
+                start = i
+    finally:
+        if writer is not None:
+            writer.close()
+    return counts
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.export", description="Export to partitioned Parquet")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("out_dir")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="inclusive")
+    args = parser.parse_args(argv)
+
+    from app.database import ReadSessionLocal
+    with ReadSessionLocal() as db:
+        counts = write_parquet(db, args.dataset, args.out_dir, args.date_from, args.date_to)
+    print(f"{sum(counts.values())} rows in {len(counts)} partitions under {os.path.join(args.out_dir, args.dataset)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,33 +1,40 @@
 # payment-service/app/main.py
-from fastapi import FastAPI, Request, Response
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+import logging
+from fastapi import FastAPI, Response
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST
+from app.metrics import MetricsMiddleware, latency_buckets, mark_worker_dead, render_metrics
+from app.tracing import setup_tracing
 from sqlalchemy import text
-from app.database import engine
+from app.database import create_schema, engine, read_engine, ReadYourWritesMiddleware
 from app.models import Base
-import time, uuid
+
+log = logging.getLogger("payment-service")
 
 app = FastAPI(title="payment-service", version="1.0.0")
 
 # Routers
-from app.routers import payments
+from app.routers import payments, exports
+from app import worker
+app.include_router(exports.router)  # before payments: /v1/payments/export.arrow vs /{payment_id}
 app.include_router(payments.router)
 
 # Metrics
 REQUEST_COUNT = Counter("payment_service_http_requests_total", "Total HTTP requests", ["method", "path", "status"])
-REQUEST_LATENCY = Histogram("payment_service_http_request_latency_seconds", "Request latency", ["method", "path"])
-
-# Correlation ID + metrics middleware
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next):
-    corr = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-    start = time.time()
-    response: Response = await call_next(request)
-    duration = time.time() - start
-    path = request.url.path
-    REQUEST_COUNT.labels(request.method, path, str(response.status_code)).inc()
-    REQUEST_LATENCY.labels(request.method, path).observe(duration)
-    response.headers["X-Correlation-ID"] = corr
-    return response
+REQUEST_LATENCY = Histogram("payment_service_http_request_latency_seconds", "Request latency", ["method", "path"], buckets=latency_buckets())
+REQUESTS_IN_FLIGHT = Gauge("payment_service_http_requests_in_flight", "Requests currently being served", multiprocess_mode="livesum")
+
+# Correlation ID + metrics (pure ASGI, labelled by route template)
+app.add_middleware(
+    MetricsMiddleware,
+    request_count=REQUEST_COUNT,
+    request_latency=REQUEST_LATENCY,
+    in_flight=REQUESTS_IN_FLIGHT,
+)
+# Read-your-writes routing for ReadSessionLocal (no-op without DATABASE_READ_URL)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Tracing (W3C traceparent in/out; exporter chosen by TRACING_EXPORTER)
+setup_tracing(app, "payment-service", engines=[engine, read_engine])
 
 @app.get("/health")
 async def health():
@@ -35,7 +42,7 @@ async def health():
 
 @app.get("/metrics")
 async def metrics():
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 def _repair_pg_sequences():
     """
@@ -51,8 +58,27 @@ def _repair_pg_sequences():
             ) WHERE pg_get_serial_sequence('payments','payment_id') IS NOT NULL;
         """))
 
+def _upgrade_existing_tables():
+    """create_all() doesn't alter existing tables: apply model changes made since (Postgres)."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS reference VARCHAR(64)"))
+        conn.execute(text("ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ"))
+        # Covered by ix_payments_order_payment (order_id, payment_id)
+        conn.execute(text("DROP INDEX IF EXISTS ix_payments_order_id"))
+
 @app.on_event("startup")
 def on_startup():
-    # Ensure tables exist, then repair sequences
-    Base.metadata.create_all(bind=engine)
+    # Ensure tables/indexes exist, then repair sequences
+    create_schema(Base.metadata)
+    _upgrade_existing_tables()
     _repair_pg_sequences()
+    # Async charge workers (PAYMENT_WORKERS=0 to run API-only replicas)
+    worker.start_workers()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    worker.stop_workers()
+    mark_worker_dead()
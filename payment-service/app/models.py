@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, func, UniqueConstraint
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, func, UniqueConstraint, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -11,13 +11,20 @@ class Payment(Base):
     __tablename__ = "payments"
 
     payment_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    order_id: Mapped[int] = mapped_column(Integer, index=True)
+    order_id: Mapped[int] = mapped_column(Integer)  # indexed by ix_payments_order_payment
     amount: Mapped[float] = mapped_column(Float)
     method: Mapped[str] = mapped_column(String(20))  # CARD | UPI | WALLET | COD
     status: Mapped[str] = mapped_column(String(20))  # SUCCESS | FAILED | PENDING
-    reference: Mapped[str] = mapped_column(String(64))
+    reference: Mapped[str] = mapped_column(String(64), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # GET /v1/payments?order_id=...: filter and keyset order from one index
+        Index("ix_payments_order_payment", "order_id", "payment_id"),
+        # Exports (app/export.py) scan by creation time
+        Index("ix_payments_created", "created_at", "payment_id"),
+    )
+
 
 class IdempotencyKey(Base):
     __tablename__ = "idempotency_keys"
@@ -26,8 +33,38 @@ class IdempotencyKey(Base):
     key: Mapped[str] = mapped_column(String(64))
     request_hash: Mapped[str] = mapped_column(String(64))
     response_body: Mapped[str] = mapped_column(String(4096))  # JSON string
+    # Provider reference, chosen when the key is claimed so a retry charges the same one
+    reference: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # While the charge runs (response_body CLAIMED): when a retry may take the claim over
+    claimed_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     __table_args__ = (
         UniqueConstraint("key", "request_hash", name="uq_key_hash"),
     )
 
+
+class ChargeJob(Base):
+    """Queued charge for async capture; worked by app/worker.py."""
+    __tablename__ = "charge_jobs"
+
+    job_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key: Mapped[str] = mapped_column(String(64), unique=True)
+    # Hash of the request that queued the job; a key reused with another body is rejected
+    request_hash: Mapped[str] = mapped_column(String(64))
+    order_id: Mapped[int] = mapped_column(Integer, index=True)
+    amount: Mapped[float] = mapped_column(Float)
+    method: Mapped[str] = mapped_column(String(20))
+    callback_url: Mapped[str | None] = mapped_column(String(300), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="QUEUED")  # QUEUED | CHARGED | DONE
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # Next time a worker may claim the job: lease expiry or callback backoff.
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    payment_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    result_status: Mapped[str | None] = mapped_column(String(20), nullable=True)  # SUCCESS | FAILED
+    # Provider reference, committed before the charge so a retried job reuses it
+    reference: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_charge_jobs_claim", "status", "available_at"),
+    )
@@ -0,0 +1,48 @@
+# payment-service/app/provider.py
+# Local stand-in for the payment provider: variable latency, ~90% success.
+#
+# Like a real gateway, a charge is idempotent on its merchant reference:
+# charging a reference again returns the first outcome instead of taking the
+# money twice. Callers record the reference before charging, so a retry after
+# a crash reuses it. The stand-in remembers recent references in-process.
+#
+#   PAYMENT_PROVIDER_LATENCY_MS    median latency of a charge (log-normal)
+#   PAYMENT_PROVIDER_SUCCESS_RATE  probability a non-COD charge succeeds
+#   PAYMENT_PROVIDER_REMEMBER      references remembered for deduplication
+
+import os
+import random
+import string
+import threading
+import time
+from collections import OrderedDict
+
+PAYMENT_PROVIDER_LATENCY_MS   = float(os.getenv("PAYMENT_PROVIDER_LATENCY_MS", "100"))
+PAYMENT_PROVIDER_SUCCESS_RATE = float(os.getenv("PAYMENT_PROVIDER_SUCCESS_RATE", "0.9"))
+PAYMENT_PROVIDER_REMEMBER     = int(os.getenv("PAYMENT_PROVIDER_REMEMBER", "100000"))
+
+# reference -> outcome of the first charge with it
+_outcomes: OrderedDict[str, str] = OrderedDict()
+_outcomes_lock = threading.Lock()
+
+
+def new_reference() -> str:
+    return "REF" + "".join(random.choices(string.ascii_uppercase + string.digits, k=10))
+
+
+def charge(amount: float, method: str, reference: str) -> str:
+    """Charge `reference` with the provider; returns SUCCESS | FAILED (PENDING for COD)."""
+    if method == "COD":
+        return "PENDING"
+    with _outcomes_lock:
+        if reference in _outcomes:
+            return _outcomes[reference]
+    if PAYMENT_PROVIDER_LATENCY_MS > 0:
+        # Long right tail, like a real gateway.
+        time.sleep(random.lognormvariate(0, 0.6) * PAYMENT_PROVIDER_LATENCY_MS / 1000)
+    status = "SUCCESS" if random.random() < PAYMENT_PROVIDER_SUCCESS_RATE else "FAILED"
+    with _outcomes_lock:
+        status = _outcomes.setdefault(reference, status)
+        while len(_outcomes) > PAYMENT_PROVIDER_REMEMBER:
+            _outcomes.popitem(last=False)
+    return status
@@ -1,14 +1,32 @@
 # payment-service/app/routers/payments.py
 
-from fastapi import APIRouter, Header, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
-from app.database import SessionLocal
-from app.models import Payment, IdempotencyKey
-import hashlib, json, random, string
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Header, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy import bindparam, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import provider, worker
+from app.database import SessionLocal, ReadSessionLocal
+from app.models import Payment, IdempotencyKey, ChargeJob
+import base64, hashlib, json, os, time
 
 router = APIRouter(prefix="/v1/payments", tags=["payments"])
 
+PAYMENT_BATCH_MAX_SIZE    = int(os.getenv("PAYMENT_BATCH_MAX_SIZE", "1000"))
+# Provider calls of one batch run concurrently on this many threads
+PAYMENT_BATCH_CONCURRENCY = int(os.getenv("PAYMENT_BATCH_CONCURRENCY", "32"))
+# How long a batch waits for keys another request claimed and is still charging
+PAYMENT_BATCH_WAIT_SECONDS = float(os.getenv("PAYMENT_BATCH_WAIT_SECONDS", "10"))
+# A claimed key whose charge never finished (crash) can be taken over after this long
+PAYMENT_CLAIM_LEASE_SECONDS = float(os.getenv("PAYMENT_CLAIM_LEASE_SECONDS", "60"))
+
+# response_body of an idempotency key whose charge is still running
+CLAIMED = ""
+
+_batch_pool = ThreadPoolExecutor(max_workers=PAYMENT_BATCH_CONCURRENCY, thread_name_prefix="charge-batch")
+
 class ChargeIn(BaseModel):
     order_id: int
     amount: float
@@ -22,6 +40,43 @@ class ChargeOut(BaseModel):
     # Pydantic v2
     model_config = {"from_attributes": True}
 
+class PaymentOut(BaseModel):
+    payment_id: int
+    order_id: int
+    amount: float
+    method: str
+    status: str
+    reference: str
+    created_at: datetime | None = None
+
+    model_config = {"from_attributes": True}
+
+class AsyncChargeIn(ChargeIn):
+    callback_url: str | None = None  # receives {job_id, payment_id, status, reference}
+
+class ChargeJobOut(BaseModel):
+    job_id: int
+    order_id: int
+    status: str                       # QUEUED | CHARGED | DONE
+    result_status: str | None = None  # SUCCESS | FAILED once charged
+    payment_id: int | None = None
+    reference: str | None = None
+
+    model_config = {"from_attributes": True}
+
+class BatchChargeIn(ChargeIn):
+    idempotency_key: str = Field(min_length=1, max_length=64)
+
+class ChargeBatchIn(BaseModel):
+    charges: list[BatchChargeIn] = Field(min_length=1)
+
+class BatchChargeOut(BaseModel):
+    idempotency_key: str
+    payment_id: int
+    status: str
+    reference: str
+    replayed: bool  # True when answered from the idempotency store
+
 def _hash(payload: dict) -> str:
     # stable hash across replays
     return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
@@ -38,53 +93,318 @@ def charge(
         # Make the requirement explicit in the error for users/tools
         raise HTTPException(status_code=422, detail="Idempotency key required in header as 'Idempotency-Key'")
 
-    # Derive a status (demo); COD is PENDING
-    if payload.method == "COD":
-        status = "PENDING"
-    else:
-        status = "SUCCESS" if random.random() < 0.9 else "FAILED"
-
-    req_hash = _hash(payload.model_dump())
+    pair = (idempotency_key, _hash(payload.model_dump()))
 
     with SessionLocal() as db:
         # Idempotency: same key + same request -> return stored response
-        existing = db.execute(
-            select(IdempotencyKey).where(
-                IdempotencyKey.key == idempotency_key,
-                IdempotencyKey.request_hash == req_hash
-            )
-        ).scalar_one_or_none()
-        if existing:
+        body = _stored_responses(db, {idempotency_key}).get(pair)
+        if body is None or body == CLAIMED:
+            # Claim the key before charging, like charge:batch, so concurrent
+            # requests with this key never charge twice
+            lease = _now() + timedelta(seconds=PAYMENT_CLAIM_LEASE_SECONDS)
+            won = _claim_keys(db, [pair], lease)
+            db.commit()
+            if pair in won:
+                try:
+                    resp = _charge_claimed(db, {pair: (payload, won[pair])})[pair]
+                except BaseException:
+                    db.rollback()
+                    _release_claims(db, [pair], lease)
+                    raise
+                # Business error AFTER persistence -> return 400 cleanly (no crash)
+                if resp["status"] == "FAILED":
+                    raise HTTPException(status_code=400, detail="Payment failed")
+                return resp
+            body = _stored_responses(db, {idempotency_key}).get(pair, CLAIMED)
+        if body == CLAIMED:
+            raise HTTPException(status_code=409, detail="A charge with this idempotency key is still in progress")
+        return json.loads(body)
+
+
+@router.post("/charge:async", response_model=ChargeJobOut, status_code=202)
+def charge_async(
+    payload: AsyncChargeIn,
+    idem_hyphen: str | None = Header(default=None, alias="Idempotency-Key", convert_underscores=False),
+    idem_snake:  str | None = Header(default=None, alias="Idempotency_Key", convert_underscores=False),
+):
+    """
+    Queue a charge and return immediately; app/worker.py charges it and POSTs
+    the result to callback_url. Poll GET /v1/payments/jobs/{job_id} otherwise.
+    The idempotency key identifies the job: replays return the same job, and
+    reusing a key with a different request is a 422.
+    """
+    idempotency_key = idem_hyphen or idem_snake
+    if not idempotency_key:
+        raise HTTPException(status_code=422, detail="Idempotency key required in header as 'Idempotency-Key'")
+
+    req_hash = _hash(payload.model_dump())
+    with SessionLocal() as db:
+        stmt = select(ChargeJob).where(ChargeJob.idempotency_key == idempotency_key)
+        job = db.execute(stmt).scalar_one_or_none()
+        if job is None:
+            job = ChargeJob(idempotency_key=idempotency_key, request_hash=req_hash,
+                            status="QUEUED", attempts=0, **payload.model_dump())
+            db.add(job)
             try:
-                return json.loads(existing.response_body)
-            except Exception:
-                # If legacy/garbled, just proceed to compute again but keep the same key
-                pass
-
-        # Create payment record
-        pay = Payment(
-            order_id=payload.order_id,
-            amount=payload.amount,
-            method=payload.method,
-            status=status,
-            reference="REF" + "".join(random.choices(string.ascii_uppercase + string.digits, k=10)),
-        )
-        db.add(pay)
-        db.commit()
-        db.refresh(pay)
+                db.commit()
+            except IntegrityError:
+                # A concurrent replay queued it first
+                db.rollback()
+                job = db.execute(stmt).scalar_one()
+            else:
+                db.refresh(job)
+                worker.notify_enqueued()
+                return ChargeJobOut.model_validate(job)
+        if job.request_hash != req_hash:
+            raise HTTPException(status_code=422, detail="Idempotency key was already used for a different charge")
+        return ChargeJobOut.model_validate(job)
 
+
+@router.get("/jobs/{job_id}", response_model=ChargeJobOut)
+def get_charge_job(job_id: int):
+    with ReadSessionLocal() as db:
+        job = db.get(ChargeJob, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Charge job not found")
+        return ChargeJobOut.model_validate(job)
+
+
+def _insert_ignore(db, model):
+    """INSERT ... ON CONFLICT DO NOTHING for the dialects we run on."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if name == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _claim_keys(db, pairs, lease: datetime) -> dict[tuple[str, str], str]:
+    """
+    Claim (key, request_hash) pairs until `lease`: insert CLAIMED placeholders,
+    and take over claims whose lease ran out (the request holding them died).
+    Returns the provider reference of each pair won. A taken-over claim keeps
+    its reference, so the provider dedupes a charge the dead request made.
+    """
+    rows = [{"key": k, "request_hash": h, "response_body": CLAIMED,
+             "reference": provider.new_reference(), "claimed_until": lease} for k, h in pairs]
+    cols = (IdempotencyKey.key, IdempotencyKey.request_hash, IdempotencyKey.reference)
+    won = db.execute(_insert_ignore(db, IdempotencyKey).values(rows).returning(*cols)).all()
+    taken = set(pairs) - {(k, h) for k, h, _ in won}
+    if taken:
+        won += db.execute(
+            update(IdempotencyKey)
+            .where(tuple_(IdempotencyKey.key, IdempotencyKey.request_hash).in_(taken),
+                   IdempotencyKey.response_body == CLAIMED,
+                   or_(IdempotencyKey.claimed_until.is_(None), IdempotencyKey.claimed_until <= _now()))
+            .values(claimed_until=lease)
+            .returning(*cols)
+            .execution_options(synchronize_session=False)
+        ).all()
+    return {(k, h): ref for k, h, ref in won}
+
+
+def _release_claims(db, pairs, lease: datetime):
+    """Let a retry take our claims over now instead of when the lease runs out."""
+    db.execute(
+        update(IdempotencyKey)
+        .where(tuple_(IdempotencyKey.key, IdempotencyKey.request_hash).in_(list(pairs)),
+               IdempotencyKey.response_body == CLAIMED,
+               IdempotencyKey.claimed_until == lease)
+        .values(claimed_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _stored_responses(db, keys) -> dict[tuple[str, str], str]:
+    return {
+        (row.key, row.request_hash): row.response_body
+        for row in db.execute(select(IdempotencyKey).where(IdempotencyKey.key.in_(keys))).scalars()
+    }
+
+
+@router.post("/charge:batch", response_model=list[BatchChargeOut])
+def charge_batch(payload: ChargeBatchIn):
+    """
+    Many charges in one call, each with its own idempotency key. Replays are
+    found with a single lookup; new keys are claimed with one
+    INSERT ... ON CONFLICT DO NOTHING RETURNING before anything is charged, so
+    of two concurrent batches sharing a key only the one that claimed it
+    charges and the other waits for its result (409 if it takes longer than
+    PAYMENT_BATCH_WAIT_SECONDS). A claim that is never completed (the batch
+    failed or its process died) is released or lapses after
+    PAYMENT_CLAIM_LEASE_SECONDS; the retry that takes it over charges the
+    same provider reference, so nothing is charged twice. Won charges hit the
+    provider concurrently and their Payment rows and responses are written in
+    one transaction. Results are returned in request order; a FAILED charge
+    is a result, not a 400.
+    """
+    if len(payload.charges) > PAYMENT_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {PAYMENT_BATCH_MAX_SIZE} charges per batch")
+
+    entries = [
+        (c.idempotency_key, _hash(c.model_dump(exclude={"idempotency_key"})), c)
+        for c in payload.charges
+    ]
+    all_keys = {k for k, _, _ in entries}
+
+    with SessionLocal() as db:
+        # One query for every key in the batch; match the request hash here
+        stored = _stored_responses(db, all_keys)
+
+        results: dict[tuple[str, str], dict] = {}
+        replayed = set()
+        for k, h, _ in entries:
+            if stored.get((k, h), CLAIMED) != CLAIMED:
+                results[(k, h)] = json.loads(stored[(k, h)])
+                replayed.add((k, h))
+
+        # Same key + payload twice in one batch is charged once
+        todo = {}
+        for k, h, c in entries:
+            if (k, h) not in results:
+                todo.setdefault((k, h), c)
+
+        if todo:
+            lease = _now() + timedelta(seconds=PAYMENT_CLAIM_LEASE_SECONDS)
+            won = _claim_keys(db, list(todo), lease)
+            db.commit()
+            mine = {kh: (c, won[kh]) for kh, c in todo.items() if kh in won}
+            if mine:
+                try:
+                    results.update(_charge_claimed(db, mine))
+                except BaseException:
+                    db.rollback()
+                    _release_claims(db, mine, lease)
+                    raise
+
+            # Keys another request claimed first: wait for its responses
+            waiting = {kh for kh in todo if kh not in mine}
+            give_up = time.monotonic() + PAYMENT_BATCH_WAIT_SECONDS
+            while waiting:
+                db.expire_all()
+                stored = _stored_responses(db, {k for k, _ in waiting})
+                for kh in list(waiting):
+                    if stored.get(kh, CLAIMED) != CLAIMED:
+                        results[kh] = json.loads(stored[kh])
+                        replayed.add(kh)
+                        waiting.discard(kh)
+                if waiting and time.monotonic() >= give_up:
+                    raise HTTPException(status_code=409, detail="Charges with these idempotency keys are "
+                                        f"still in progress: {sorted(k for k, _ in waiting)}")
+                if waiting:
+                    time.sleep(0.05)
+
+    return [
+        BatchChargeOut(idempotency_key=k, replayed=(k, h) in replayed, **results[(k, h)])
+        for k, h, _ in entries
+    ]
+
+
+def _charge_claimed(db, mine: dict[tuple[str, str], tuple[ChargeIn, str]]) -> dict[tuple[str, str], dict]:
+    """Charge the claimed keys with their references, store Payments and responses in one transaction."""
+    charges = list(mine.values())
+    if len(charges) == 1:
+        c, ref = charges[0]
+        statuses = [provider.charge(c.amount, c.method, ref)]
+    else:
+        statuses = list(_batch_pool.map(lambda cr: provider.charge(cr[0].amount, cr[0].method, cr[1]), charges))
+    pays = db.scalars(
+        insert(Payment).returning(Payment, sort_by_parameter_order=True),
+        [
+            {
+                "order_id": c.order_id,
+                "amount": c.amount,
+                "method": c.method,
+                "status": status,
+                "reference": ref,
+            }
+            for (c, ref), status in zip(charges, statuses)
+        ],
+    ).all()
+    results, bodies = {}, []
+    for (k, h), pay in zip(mine, pays):
         resp = ChargeOut.model_validate(pay).model_dump()
+        results[(k, h)] = resp
+        bodies.append({"b_key": k, "b_hash": h, "b_body": json.dumps(resp)})
+    db.execute(
+        update(IdempotencyKey.__table__)
+        .where(IdempotencyKey.key == bindparam("b_key"), IdempotencyKey.request_hash == bindparam("b_hash"))
+        .values(response_body=bindparam("b_body"), claimed_until=None),
+        bodies,
+    )
+    db.commit()
+    return results
+
+
+# ---------- Reads ----------
+# Cursor is the opaque last payment_id of a page; pages walk payment_id ASC.
+
+def _encode_cursor(payment_id: int) -> str:
+    return base64.urlsafe_b64encode(str(payment_id).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("", response_model=dict)
+def list_payments(
+    order_id: list[int] | None = Query(None, description="Filter by order_id (repeatable, up to 100)"),
+    status: list[str] | None = Query(None, description="Filter by status (repeatable)"),
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+):
+    """
+    Payments for one or many orders (or all, for reconciliation).
+
+    Served from ix_payments_order_payment with keyset pagination on payment_id;
+    pass `next_cursor` from the previous response to continue.
+    """
+    stmt = select(Payment)
+    if order_id:
+        if len(order_id) > 100:
+            raise HTTPException(status_code=422, detail="At most 100 order_id values")
+        stmt = stmt.where(Payment.order_id.in_(order_id))
+    if status:
+        stmt = stmt.where(Payment.status.in_(status))
+    if cursor:
+        stmt = stmt.where(Payment.payment_id > _decode_cursor(cursor))
+    stmt = stmt.order_by(Payment.payment_id).limit(page_size + 1)
+
+    with ReadSessionLocal() as db:
+        rows = db.execute(stmt).scalars().all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        "items": [PaymentOut.model_validate(p).model_dump(mode="json") for p in rows],
+        "page_size": page_size,
+        "next_cursor": _encode_cursor(rows[-1].payment_id) if has_more else None,
+    }
+
 
-        # Store idempotency response
-        db.add(IdempotencyKey(
-            key=idempotency_key,
-            request_hash=req_hash,
-            response_body=json.dumps(resp)
-        ))
-        db.commit()
+@router.get("/by-reference/{reference}", response_model=PaymentOut)
+def get_payment_by_reference(reference: str):
+    with ReadSessionLocal() as db:
+        pay = db.execute(select(Payment).where(Payment.reference == reference)).scalars().first()
+        if not pay:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        return PaymentOut.model_validate(pay)
 
-        # Business error AFTER persistence -> return 400 cleanly (no crash)
-        if status == "FAILED":
-            raise HTTPException(status_code=400, detail="Payment failed")
 
-        return resp
+@router.get("/{payment_id}", response_model=PaymentOut)
+def get_payment(payment_id: int):
+    with ReadSessionLocal() as db:
+        pay = db.get(Payment, payment_id)
+        if not pay:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        return PaymentOut.model_validate(pay)
@@ -0,0 +1,169 @@
+# payment-service/app/worker.py
+# Async capture: a pool of threads drains the charge_jobs queue table.
+#
+# A job is claimed with FOR UPDATE SKIP LOCKED (so several workers/replicas can
+# share the table) and charged in three steps: its provider reference is
+# committed first, the provider is called with no transaction open, and the
+# Payment and job result are then written in one transaction. A worker that
+# dies between the charge and that commit leaves the reference behind; the
+# retry after its lease charges the same reference, which the provider
+# dedupes. Finally the result is POSTed to callback_url with backoff.
+#
+#   PAYMENT_WORKERS               worker threads per process (0 disables)
+#   PAYMENT_WORKER_POLL_SECONDS   idle poll interval
+#   PAYMENT_JOB_LEASE_SECONDS     a claimed job is retried after this long
+#   PAYMENT_CALLBACK_MAX_ATTEMPTS callback deliveries before giving up
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+import httpx
+from prometheus_client import Counter, Histogram
+from sqlalchemy import select, update
+from app import provider
+from app.database import SessionLocal
+from app.models import ChargeJob, Payment
+from app.tracing import traced_client
+
+log = logging.getLogger("payment-service.worker")
+
+PAYMENT_WORKERS               = int(os.getenv("PAYMENT_WORKERS", "4"))
+PAYMENT_WORKER_POLL_SECONDS   = float(os.getenv("PAYMENT_WORKER_POLL_SECONDS", "0.5"))
+PAYMENT_JOB_LEASE_SECONDS     = float(os.getenv("PAYMENT_JOB_LEASE_SECONDS", "60"))
+PAYMENT_CALLBACK_MAX_ATTEMPTS = int(os.getenv("PAYMENT_CALLBACK_MAX_ATTEMPTS", "8"))
+
+CHARGE_JOBS = Counter(
+    "payment_service_charge_jobs_total",
+    "Async charge jobs by outcome",
+    ["outcome"],  # SUCCESS | FAILED | callback_ok | callback_retry | callback_abandoned
+)
+CHARGE_JOB_SECONDS = Histogram(
+    "payment_service_charge_job_seconds",
+    "Time from enqueue to charge result",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads: list[threading.Thread] = []
+_client = traced_client(httpx.Client(timeout=5.0))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def notify_enqueued():
+    """Wake an idle worker instead of waiting for the next poll."""
+    _wakeup.set()
+
+
+def _claim() -> int | None:
+    with SessionLocal() as db:
+        job = db.execute(
+            select(ChargeJob)
+            .where(ChargeJob.status.in_(("QUEUED", "CHARGED")), ChargeJob.available_at <= _now())
+            .order_by(ChargeJob.available_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            return None
+        # Compare-and-set on the lease as well, for backends without SKIP LOCKED
+        now = _now()
+        taken = db.execute(
+            update(ChargeJob)
+            .where(ChargeJob.job_id == job.job_id, ChargeJob.available_at <= now)
+            .values(available_at=now + timedelta(seconds=PAYMENT_JOB_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return job.job_id if taken else None
+
+
+def _process(job_id: int):
+    with SessionLocal() as db:
+        job = db.get(ChargeJob, job_id)
+
+        if job.status == "QUEUED":
+            # Record the attempt before charging; a retry reuses the reference
+            if job.reference is None:
+                job.reference = provider.new_reference()
+            amount, method, reference = job.amount, job.method, job.reference
+            db.commit()
+
+            status = provider.charge(amount, method, reference)
+            db.refresh(job, with_for_update=True)
+            if job.status != "QUEUED":
+                db.commit()  # our lease ran out and another worker finished the job
+                return
+            pay = Payment(
+                order_id=job.order_id,
+                amount=amount,
+                method=method,
+                status=status,
+                reference=reference,
+            )
+            db.add(pay)
+            db.flush()
+            job.payment_id, job.result_status = pay.payment_id, status
+            job.status = "CHARGED" if job.callback_url else "DONE"
+            job.available_at = _now()
+            db.commit()
+            CHARGE_JOBS.labels(status).inc()
+            if job.created_at is not None:
+                created = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
+                CHARGE_JOB_SECONDS.observe((_now() - created).total_seconds())
+
+        if job.status == "CHARGED":
+            try:
+                r = _client.post(job.callback_url, json={
+                    "job_id": job.job_id,
+                    "payment_id": job.payment_id,
+                    "status": job.result_status,
+                    "reference": job.reference,
+                })
+                r.raise_for_status()
+                job.status = "DONE"
+                CHARGE_JOBS.labels("callback_ok").inc()
+            except httpx.HTTPError as exc:
+                job.attempts += 1
+                if job.attempts >= PAYMENT_CALLBACK_MAX_ATTEMPTS:
+                    log.warning("Giving up callback for job %s: %s", job.job_id, exc)
+                    job.status = "DONE"
+                    CHARGE_JOBS.labels("callback_abandoned").inc()
+                else:
+                    job.available_at = _now() + timedelta(seconds=min(2 ** job.attempts, 300))
+                    CHARGE_JOBS.labels("callback_retry").inc()
+            db.commit()
+
+
+def _run():
+    while not _stop.is_set():
+        try:
+            job_id = _claim()
+            if job_id is None:
+                _wakeup.wait(PAYMENT_WORKER_POLL_SECONDS)
+                _wakeup.clear()
+                continue
+            _process(job_id)
+        except Exception:
+            log.exception("Charge worker error")
+            _stop.wait(PAYMENT_WORKER_POLL_SECONDS)
+
+
+def start_workers():
+    _stop.clear()
+    for i in range(PAYMENT_WORKERS):
+        t = threading.Thread(target=_run, name=f"charge-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop_workers():
+    _stop.set()
+    _wakeup.set()
+    for t in _threads:
+        t.join(timeout=5)
+    _threads.clear()
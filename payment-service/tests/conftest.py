@@ -0,0 +1,68 @@
+# payment-service/tests/conftest.py
+# Runs the app against a throwaway SQLite file with a zero-latency provider.
+# Startup is skipped (its sequence repair is Postgres-only): tables are
+# created here and the charge workers are driven directly by the tests.
+# Run from payment-service/: python -m pytest tests
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="payment-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/payments.db"
+os.environ["DATABASE_READ_URL"] = ""
+os.environ["TRACING_EXPORTER"] = "none"
+os.environ["PAYMENT_WORKERS"] = "0"
+os.environ["PAYMENT_PROVIDER_LATENCY_MS"] = "0"
+os.environ["PAYMENT_PROVIDER_SUCCESS_RATE"] = "1"
+
+import pytest
+from fastapi.testclient import TestClient
+from app import provider
+from app.database import engine
+from app.main import app
+from app.models import Base
+
+
+class ProviderSpy:
+    """
+    Wraps provider.charge: records each reference, and can fail after N calls
+    or crash right after the provider has charged.
+    """
+
+    def __init__(self):
+        self.references: list[str] = []
+        self.fail_after: int | None = None
+        self.crash_after_charge = False
+        self._charge = provider.charge
+
+    def __call__(self, amount: float, method: str, reference: str) -> str:
+        if self.fail_after is not None and len(self.references) >= self.fail_after:
+            raise RuntimeError("provider connection lost")
+        self.references.append(reference)
+        status = self._charge(amount, method, reference)
+        if self.crash_after_charge:
+            raise RuntimeError("worker died after the charge")
+        return status
+
+
+@pytest.fixture
+def provider_spy(monkeypatch):
+    spy = ProviderSpy()
+    monkeypatch.setattr(provider, "charge", spy)
+    return spy
+
+
+@pytest.fixture
+def client():
+    # No context manager: startup would run the Postgres sequence repair
+    return TestClient(app, raise_server_exceptions=False)
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    Base.metadata.create_all(bind=engine)
+    provider._outcomes.clear()
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
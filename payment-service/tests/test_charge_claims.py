@@ -0,0 +1,102 @@
+# payment-service/tests/test_charge_claims.py
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from app.database import SessionLocal
+from app.models import IdempotencyKey, Payment
+from app.routers import payments
+
+
+def _charge(order_id: int, key: str | None = None) -> dict:
+    return {"idempotency_key": key or f"k{order_id}", "order_id": order_id, "amount": 100.0, "method": "CARD"}
+
+
+def _batch(client, *charges):
+    return client.post("/v1/payments/charge:batch", json={"charges": list(charges)})
+
+
+def _sync(client, key: str, order_id: int):
+    return client.post("/v1/payments/charge", headers={"Idempotency-Key": key},
+                       json={"order_id": order_id, "amount": 100.0, "method": "CARD"})
+
+
+def _payments() -> list[Payment]:
+    with SessionLocal() as db:
+        return db.execute(select(Payment).order_by(Payment.order_id)).scalars().all()
+
+
+def _expire_claims():
+    with SessionLocal() as db:
+        db.execute(update(IdempotencyKey).values(
+            claimed_until=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+
+
+def test_sync_charge_replays(client, provider_spy):
+    first = _sync(client, "s1", 1)
+    assert first.status_code == 200
+    again = _sync(client, "s1", 1)
+    assert again.json() == first.json()
+    assert len(provider_spy.references) == 1
+    assert [p.reference for p in _payments()] == [first.json()["reference"]]
+
+
+def test_batch_failure_releases_its_claims(client, provider_spy):
+    provider_spy.fail_after = 1
+    r = _batch(client, _charge(1), _charge(2), _charge(3))
+    assert r.status_code == 500
+    assert _payments() == []
+    charged = set(provider_spy.references)
+
+    # The retry takes the released claims over at once and reuses their
+    # references, so the charge that did reach the provider isn't repeated
+    provider_spy.fail_after = None
+    r = _batch(client, _charge(1), _charge(2), _charge(3))
+    assert r.status_code == 200
+    assert [c["replayed"] for c in r.json()] == [False] * 3
+    assert len(_payments()) == 3
+    assert charged <= {p.reference for p in _payments()}
+
+
+def test_claims_of_a_dead_batch_lapse(client, provider_spy, monkeypatch):
+    # The process dies mid-batch: nothing releases its claims
+    monkeypatch.setattr(payments, "_release_claims", lambda db, pairs, lease: None)
+    monkeypatch.setattr(payments, "PAYMENT_BATCH_WAIT_SECONDS", 0.1)
+    provider_spy.fail_after = 1
+    assert _batch(client, _charge(1), _charge(2)).status_code == 500
+    first_reference = provider_spy.references[0]
+
+    provider_spy.fail_after = None
+    assert _batch(client, _charge(1), _charge(2)).status_code == 409
+    assert _sync(client, "k1", 1).status_code == 409
+
+    _expire_claims()
+    r = _batch(client, _charge(1), _charge(2))
+    assert r.status_code == 200
+    assert first_reference in {c["reference"] for c in r.json()}
+    assert len(_payments()) == 2
+
+
+def test_sync_charge_joins_the_claim_protocol(client, provider_spy):
+    # A batch holds the claim for this key: the sync charge must not charge too
+    with SessionLocal() as db:
+        lease = datetime.now(timezone.utc) + timedelta(seconds=60)
+        pair = ("k1", payments._hash({"order_id": 1, "amount": 100.0, "method": "CARD"}))
+        payments._claim_keys(db, [pair], lease)
+        db.commit()
+    assert _sync(client, "k1", 1).status_code == 409
+    assert provider_spy.references == []
+
+    _expire_claims()
+    r = _sync(client, "k1", 1)
+    assert r.status_code == 200
+    assert _batch(client, _charge(1)).json()[0] == {**r.json(), "idempotency_key": "k1", "replayed": True}
+
+
+def test_failed_charge_is_stored(client, monkeypatch):
+    monkeypatch.setattr(payments.provider, "PAYMENT_PROVIDER_SUCCESS_RATE", 0)
+    assert _sync(client, "s1", 1).status_code == 400
+    r = _sync(client, "s1", 1)
+    assert r.status_code == 200
+    assert r.json()["status"] == "FAILED"
+    assert len(_payments()) == 1
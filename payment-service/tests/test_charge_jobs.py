@@ -0,0 +1,62 @@
+# payment-service/tests/test_charge_jobs.py
+
+from sqlalchemy import select
+from app import worker
+from app.database import SessionLocal
+from app.models import ChargeJob, Payment
+
+
+def _enqueue(client, key="j1", order_id=1, amount=100.0):
+    return client.post("/v1/payments/charge:async", headers={"Idempotency-Key": key},
+                       json={"order_id": order_id, "amount": amount, "method": "CARD"})
+
+
+def _job(job_id: int) -> ChargeJob:
+    with SessionLocal() as db:
+        return db.get(ChargeJob, job_id)
+
+
+def _payments() -> list[Payment]:
+    with SessionLocal() as db:
+        return db.execute(select(Payment)).scalars().all()
+
+
+def test_job_is_charged_once(client, provider_spy):
+    job_id = _enqueue(client).json()["job_id"]
+    assert worker._claim() == job_id
+    worker._process(job_id)
+    job = _job(job_id)
+    assert (job.status, job.result_status) == ("DONE", "SUCCESS")
+    assert [p.reference for p in _payments()] == [job.reference] == provider_spy.references
+
+
+def test_crash_after_the_charge_is_not_charged_again(client, provider_spy):
+    job_id = _enqueue(client).json()["job_id"]
+    provider_spy.crash_after_charge = True
+    try:
+        worker._process(job_id)
+    except RuntimeError:
+        pass
+    job = _job(job_id)
+    assert job.status == "QUEUED"
+    assert job.reference == provider_spy.references[0]  # committed before the charge
+    assert _payments() == []
+
+    # The retry after the lease charges the same reference: the provider dedupes it
+    provider_spy.crash_after_charge = False
+    worker._process(job_id)
+    assert provider_spy.references == [job.reference, job.reference]
+    assert [p.reference for p in _payments()] == [job.reference]
+    assert _job(job_id).status == "DONE"
+
+
+def test_replayed_job_and_key_reuse(client):
+    first = _enqueue(client).json()
+    assert _enqueue(client).json() == first
+    assert _enqueue(client, amount=5.0).status_code == 422
+
+
+def test_job_lookup(client):
+    job_id = _enqueue(client).json()["job_id"]
+    assert client.get(f"/v1/payments/jobs/{job_id}").json()["status"] == "QUEUED"
+    assert client.get("/v1/payments/jobs/999").status_code == 404
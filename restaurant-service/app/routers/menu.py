@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
 from sqlalchemy import select, func
 from pydantic import BaseModel
-from app.database import SessionLocal
+from app.database import ReadSessionLocal
 from app.models import Restaurant, MenuItem
+from app.streaming import ndjson_response, wants_ndjson
 
 # IMPORTANT:
 # Do NOT call Base.metadata.create_all() here; do it in app/main.py at startup.
@@ -25,14 +26,23 @@ class MenuItemOut(BaseModel):
 @router.get("", response_model=dict)
 def list_menu(
     restaurant_id: int,
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
 ):
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         # 404 if restaurant doesn't exist
         if not db.get(Restaurant, restaurant_id):
             raise HTTPException(status_code=404, detail="Restaurant not found")
 
+        # Accept: application/x-ndjson -> the whole menu, streamed
+        if wants_ndjson(request):
+            return ndjson_response(
+                ReadSessionLocal,
+                select(MenuItem).where(MenuItem.restaurant_id == restaurant_id).order_by(MenuItem.item_id),
+                MenuItemOut,
+            )
+
         # total count (SQLAlchemy 2.x safe)
         total = db.scalar(
             select(func.count(MenuItem.item_id)).where(MenuItem.restaurant_id == restaurant_id)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
 from sqlalchemy import select, func
 from pydantic import BaseModel
-from app.database import SessionLocal, engine
+from app.database import SessionLocal, ReadSessionLocal, engine
 from app.models import Base, Restaurant
+from app.streaming import ndjson_response, wants_ndjson
 
 # IMPORTANT:
 # Don't call Base.metadata.create_all(bind=engine) at import time.
@@ -29,6 +30,7 @@ class RestaurantOut(BaseModel):
 # ---------- Endpoints ----------
 @router.get("", response_model=dict)
 def list_restaurants(
+    request: Request,
     city: str | None = None,
     cuisine: str | None = None,
     page: int = Query(1, ge=1),
@@ -40,14 +42,19 @@ def list_restaurants(
     SQLAlchemy 2.x: `Select.count()` was removed.
     Use `select(func.count()).select_from(stmt.subquery())` for an exact total that
     mirrors the same filters as the main query.
+    With `Accept: application/x-ndjson` all matching rows are streamed instead.
     """
-    with SessionLocal() as db:
-        # Build the main statement with optional filters
-        stmt = select(Restaurant)
-        if city:
-            stmt = stmt.where(Restaurant.city == city)
-        if cuisine:
-            stmt = stmt.where(Restaurant.cuisine == cuisine)
+    # Build the main statement with optional filters
+    stmt = select(Restaurant)
+    if city:
+        stmt = stmt.where(Restaurant.city == city)
+    if cuisine:
+        stmt = stmt.where(Restaurant.cuisine == cuisine)
+
+    if wants_ndjson(request):
+        return ndjson_response(ReadSessionLocal, stmt.order_by(Restaurant.restaurant_id), RestaurantOut)
+
+    with ReadSessionLocal() as db:
 
         # Accurate total using the same filters
         count_stmt = select(func.count()).select_from(stmt.subquery())
@@ -74,7 +81,7 @@ def list_restaurants(
 
 @router.get("/{restaurant_id}", response_model=RestaurantOut)
 def get_restaurant(restaurant_id: int):
-    with SessionLocal() as db:
+    with ReadSessionLocal() as db:
         r = db.get(Restaurant, restaurant_id)
         if not r:
             raise HTTPException(status_code=404, detail="Restaurant not found")
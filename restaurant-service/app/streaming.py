@@ -0,0 +1,41 @@
+# app/streaming.py
+# NDJSON bulk reads for internal consumers (full-table syncs in one request).
+#
+# List endpoints switch to this when the client sends
+# `Accept: application/x-ndjson`: no COUNT, no page cap, one JSON object per
+# line. Rows come from a server-side cursor (yield_per/stream_results) in
+# STREAM_BATCH_ROWS chunks and each chunk is written before the next is
+# fetched. The sync generator runs in the threadpool and only advances once
+# the previous chunk was handed to the socket, so a slow client holds the
+# cursor instead of piling rows up in memory.
+#
+#   STREAM_BATCH_ROWS   rows fetched (and written) per chunk
+
+import os
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "1000"))
+
+
+def wants_ndjson(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(part.split(";")[0].strip() == NDJSON_MEDIA_TYPE for part in accept.split(","))
+
+
+def _lines(session_factory, stmt, schema: type[BaseModel]):
+    with session_factory() as db:
+        result = db.execute(stmt.execution_options(yield_per=STREAM_BATCH_ROWS, stream_results=True))
+        for rows in result.scalars().partitions():
+            yield b"".join(schema.model_validate(r).model_dump_json().encode() + b"\n" for r in rows)
+
+
+def ndjson_response(session_factory, stmt, schema: type[BaseModel]) -> StreamingResponse:
+    """Stream every row of an ORM select as `schema` JSON lines."""
+    return StreamingResponse(
+        _lines(session_factory, stmt, schema),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Vary": "Accept"},
+    )
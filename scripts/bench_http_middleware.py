@@ -0,0 +1,96 @@
+"""
+Per-request overhead of the HTTP metrics middleware.
+
+Compares a bare FastAPI app, the previous @app.middleware("http") version and
+the pure-ASGI MetricsMiddleware (app/metrics.py, identical in every service)
+on an in-process ASGI transport, so no network or DB time is included.
+
+    pip install -r order-service/requirements.txt
+    python scripts/bench_http_middleware.py [requests]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "order-service"))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram  # noqa: E402
+from app.metrics import MetricsMiddleware, latency_buckets  # noqa: E402
+
+
+def _metrics():
+    reg = CollectorRegistry()
+    return (
+        Counter("bench_requests_total", "", ["method", "path", "status"], registry=reg),
+        Histogram("bench_latency_seconds", "", ["method", "path"], buckets=latency_buckets(), registry=reg),
+        Gauge("bench_in_flight", "", registry=reg),
+    )
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    return app
+
+
+def bare_app():
+    return _app()
+
+
+def legacy_app():
+    app = _app()
+    count, latency, _ = _metrics()
+
+    @app.middleware("http")
+    async def add_correlation_id(request: Request, call_next):
+        corr = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
+        start = time.time()
+        response = await call_next(request)
+        duration = time.time() - start
+        path = request.url.path
+        count.labels(request.method, path, str(response.status_code)).inc()
+        latency.labels(request.method, path).observe(duration)
+        response.headers["X-Correlation-ID"] = corr
+        return response
+
+    return app
+
+
+def asgi_app():
+    app = _app()
+    count, latency, in_flight = _metrics()
+    app.add_middleware(MetricsMiddleware, request_count=count, request_latency=latency, in_flight=in_flight)
+    return app
+
+
+async def _run(app, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(200):  # warm-up
+            await client.get(f"/v1/items/{i}")
+        start = time.perf_counter()
+        for i in range(n):
+            await client.get(f"/v1/items/{i}")
+        return (time.perf_counter() - start) / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    base = asyncio.run(_run(bare_app(), n))
+    print(f"{'variant':<22}{'us/request':>12}{'overhead us':>14}")
+    for name, factory in (("no middleware", bare_app), ("@app.middleware", legacy_app), ("MetricsMiddleware", asgi_app)):
+        per_req = asyncio.run(_run(factory(), n))
+        print(f"{name:<22}{per_req * 1e6:>12.1f}{(per_req - base) * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()